@@ -0,0 +1,168 @@
+import os
+import asyncio
+import inspect
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Callable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from temporal import parse_datetime, parse_day
+
+# Las horas de las citas se escriben en hora local del despacho
+CALENDAR_TIMEZONE = os.environ.get("CALENDAR_TIMEZONE", "Europe/Madrid")
+# Duración máxima de una cita: acota la ventana que recorre la búsqueda de solapes
+MAX_APPOINTMENT_MINUTES = 24 * 60
+MAX_APPOINTMENT_SPAN = timedelta(minutes=MAX_APPOINTMENT_MINUTES)
+# Rango máximo de /api/calendar
+MAX_CALENDAR_DAYS = int(os.environ.get("MAX_CALENDAR_DAYS", "92"))
+# Un documento por día local con reservas en curso: serializa comprobación de solapes + escritura entre workers
+CALENDAR_LOCKS_COLLECTION = "calendar_locks"
+# Si el proceso que retiene un día muere, el día se libera solo pasado este tiempo
+CALENDAR_LOCK_SECONDS = 10
+# Lo que espera una reserva a que otra termine con el mismo día antes de rendirse
+CALENDAR_LOCK_WAIT_SECONDS = 5
+
+try:
+    CALENDAR_TZ = ZoneInfo(CALENDAR_TIMEZONE)
+except ZoneInfoNotFoundError:  # sin base de datos tz (p. ej. Windows sin tzdata)
+    CALENDAR_TZ = timezone.utc
+
+_TIME_FORMATS = ("%H:%M", "%H:%M:%S")
+
+
+def parse_time(value: Any) -> Optional[time]:
+    if not isinstance(value, str):
+        return None
+    for fmt in _TIME_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), fmt).time()
+        except ValueError:
+            continue
+    return None
+
+
+def appointment_window(appointment_date: Any, appointment_time: Any,
+                       duration_minutes: Any) -> Optional[Tuple[datetime, datetime]]:
+    """Return the `(starts_at, ends_at)` UTC instants of an appointment.
+
+    Date and time are read as wall-clock time in CALENDAR_TIMEZONE. Returns
+    None when either does not parse.
+    """
+    day = parse_day(appointment_date)
+    at = parse_time(appointment_time)
+    if day is None or at is None:
+        return None
+    starts_at = datetime.combine(day.date(), at, tzinfo=CALENDAR_TZ).astimezone(timezone.utc)
+    minutes = min(max(int(duration_minutes or 0), 0), MAX_APPOINTMENT_MINUTES)
+    return starts_at, starts_at + timedelta(minutes=minutes)
+
+
+def calendar_bound(value: str) -> Optional[datetime]:
+    """Parse a `from`/`to` bound; a bare date means local midnight."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None
+    if "T" not in value and " " not in value.strip():
+        return datetime.combine(parsed.date(), time.min, tzinfo=CALENDAR_TZ).astimezone(timezone.utc)
+    return parsed
+
+
+def overlap_query(start: datetime, end: datetime) -> dict:
+    """Filter for appointments overlapping `[start, end)`.
+
+    Appointments never last longer than MAX_APPOINTMENT_SPAN, so anything
+    overlapping the range starts inside `(start - span, end)`: the
+    `starts_at` bounds keep the index scan on (starts_at, ends_at) short and
+    `ends_at` is checked from the same index keys.
+    """
+    return {
+        "starts_at": {"$gt": start - MAX_APPOINTMENT_SPAN, "$lt": end},
+        "ends_at": {"$gt": start},
+    }
+
+
+class CalendarBusy(Exception):
+    """A day of the slot stayed held by another booking for CALENDAR_LOCK_WAIT_SECONDS."""
+
+
+def lock_days(starts_at: datetime, ends_at: datetime) -> List[str]:
+    """Local days touched by `[starts_at, ends_at)`, in order.
+
+    Two overlapping appointments share an instant and so share the day of
+    that instant: holding every day of a slot is enough to serialize all
+    bookings that could conflict with it.
+    """
+    first = starts_at.astimezone(CALENDAR_TZ).date()
+    last = max(ends_at - timedelta(microseconds=1), starts_at).astimezone(CALENDAR_TZ).date()
+    days = []
+    while first <= last:
+        days.append(first.isoformat())
+        first += timedelta(days=1)
+    return days
+
+
+@asynccontextmanager
+async def calendar_guard(locks, starts_at: datetime, ends_at: datetime,
+                         wait_seconds: float = CALENDAR_LOCK_WAIT_SECONDS):
+    """Hold the days of a slot across processes while its conflicts are checked and written.
+
+    Each day is taken with a conditional upsert on its lock document: the
+    upsert only matches an expired lock, so a live one makes the insert fail
+    on `_id` and the caller retries until `wait_seconds` pass. Days are taken
+    in order so two bookings spanning midnight cannot deadlock.
+    """
+    holder = uuid.uuid4().hex
+    deadline = asyncio.get_running_loop().time() + wait_seconds
+    held = []
+    try:
+        for day in lock_days(starts_at, ends_at):
+            while True:
+                now = datetime.now(timezone.utc)
+                try:
+                    await locks.update_one(
+                        {"_id": day, "expires_at": {"$lte": now}},
+                        {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=CALENDAR_LOCK_SECONDS)}},
+                        upsert=True,
+                    )
+                    break
+                except DuplicateKeyError:
+                    if asyncio.get_running_loop().time() >= deadline:
+                        raise CalendarBusy(day)
+                    await asyncio.sleep(0.02)
+            held.append(day)
+        yield
+    finally:
+        for day in held:
+            await locks.delete_one({"_id": day, "holder": holder})
+
+
+async def backfill_windows(collection, batch_size: int = 1000,
+                           on_progress: Optional[Callable[[int], Any]] = None) -> dict:
+    """Compute starts_at / ends_at for appointments written before they existed."""
+    updated = skipped = 0
+    ops = []
+    projection = {"_id": 1, "appointment_date": 1, "appointment_time": 1, "duration_minutes": 1}
+    async for doc in collection.find({"starts_at": None}, projection).batch_size(batch_size):
+        window = appointment_window(doc.get("appointment_date"), doc.get("appointment_time"),
+                                    doc.get("duration_minutes", 60))
+        if window is None:
+            skipped += 1
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"starts_at": window[0], "ends_at": window[1]},
+                                                "$inc": {"version": 1}}))
+        if len(ops) >= batch_size:
+            await collection.bulk_write(ops, ordered=False)
+            updated += len(ops)
+            ops = []
+            if on_progress:
+                result = on_progress(updated)
+                if inspect.isawaitable(result):
+                    await result
+    if ops:
+        await collection.bulk_write(ops, ordered=False)
+        updated += len(ops)
+    return {"updated": updated, "skipped": skipped}
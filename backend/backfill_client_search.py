@@ -0,0 +1,38 @@
+import os
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from client_search import backfill_search_fields
+from collection_versions import bump_versions
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "legaldesk")
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
+
+
+async def main():
+    print(f"Connecting to MongoDB at {MONGO_URL}")
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+    clients = db.clients
+
+    total = await clients.estimated_document_count()
+    print(f"Rebuilding search keys for ~{total} clients in '{DB_NAME}' (batch size {BATCH_SIZE})")
+
+    started = time.perf_counter()
+    updated = await backfill_search_fields(
+        clients, BATCH_SIZE, on_progress=lambda n: print(f"  {n} clients checked")
+    )
+    if updated:
+        # Cached API reads of the clients must be re-validated
+        await bump_versions(db, "clients")
+
+    elapsed = time.perf_counter() - started
+    print(f"Done. {updated} clients updated in {elapsed:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
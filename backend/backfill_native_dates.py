@@ -0,0 +1,43 @@
+"""Convert dates stored as ISO text to native BSON dates.
+
+Safe to interrupt and re-run: only string values are visited. Once it
+reports nothing left to convert, set STRING_DATES_COMPAT=0 on the API.
+
+    MONGO_URL=... python backfill_native_dates.py
+"""
+import os
+import asyncio
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from collection_versions import bump_versions
+from temporal import backfill_dates
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "legaldesk")
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
+
+
+async def main():
+    print(f"Connecting to MongoDB at {MONGO_URL}")
+    client = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+    db = client[DB_NAME]
+
+    print(f"Converting text dates in '{DB_NAME}' (batch size {BATCH_SIZE})")
+    started = time.perf_counter()
+    summary = await backfill_dates(
+        db, BATCH_SIZE, on_progress=lambda name, n: print(f"  {name}: {n} values converted")
+    )
+
+    # Cached API reads of the converted collections must be re-validated
+    await bump_versions(db, *(name for name, counts in summary.items() if counts["converted"]))
+    elapsed = time.perf_counter() - started
+    for name, counts in summary.items():
+        print(f"  {name}: {counts['converted']} converted, {counts['skipped']} unparseable values left as text")
+    print(f"Done in {elapsed:.1f}s")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,144 @@
+"""Benchmark: client portal dashboard, sequential reads vs. concurrent projected reads.
+
+Seeds a throwaway database with clients and their cases, updates,
+appointments and documents, then times the previous sequential
+implementation against the current `get_client_dashboard` handler.
+
+    MONGO_URL=mongodb://localhost:27017 python bench_client_portal.py
+"""
+import os
+import random
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from starlette.requests import Request
+
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "legaldesk_bench_portal")
+# server.py reads DB_NAME at import time
+os.environ["DB_NAME"] = BENCH_DB_NAME
+
+import server  # noqa: E402
+from server import db, Client, Case, CaseUpdate, Appointment  # noqa: E402
+
+BENCH_CLIENTS = int(os.getenv("BENCH_CLIENTS", "2000"))
+REPEAT = int(os.getenv("REPEAT", "200"))
+
+
+def _now_iso(days: int = 0) -> str:
+    return (datetime.now(timezone.utc) + timedelta(days=days)).isoformat()
+
+
+async def seed():
+    if await db.clients.estimated_document_count() >= BENCH_CLIENTS:
+        return
+    for name in ("clients", "cases", "case_updates", "appointments", "documents"):
+        await db[name].drop()
+    print(f"Seeding {BENCH_CLIENTS} clients into '{BENCH_DB_NAME}'...")
+    clients, cases, updates, appointments, documents = [], [], [], [], []
+    for i in range(BENCH_CLIENTS):
+        client_id = str(uuid.uuid4())
+        clients.append({
+            "id": client_id, "first_name": "Cliente", "last_name": str(i), "email": f"c{i}@example.com",
+            "phone": str(600000000 + i), "address": "Calle Mayor 1", "city": "Madrid", "state": "Madrid",
+            "postal_code": "28001", "status": "active", "created_at": _now_iso(), "updated_at": _now_iso(),
+        })
+        for c in range(random.randint(1, 4)):
+            case_id = str(uuid.uuid4())
+            cases.append({
+                "id": case_id, "client_id": client_id, "title": f"Caso {c}", "case_number": f"{i}-{c}",
+                "case_type": "civil", "status": random.choice(["active", "pending", "closed"]),
+                "description": "Descripción " * 20, "start_date": "2024-01-01", "created_at": _now_iso(-c),
+                "updated_at": _now_iso(),
+            })
+            for u in range(random.randint(2, 8)):
+                updates.append({
+                    "id": str(uuid.uuid4()), "case_id": case_id, "client_id": client_id, "title": f"Avance {u}",
+                    "description": "Detalle " * 30, "update_type": "progress", "is_visible_to_client": True,
+                    "created_at": _now_iso(-u), "created_by": "lawyer",
+                })
+            for a in range(random.randint(0, 3)):
+                appointments.append({
+                    "id": str(uuid.uuid4()), "client_id": client_id, "case_id": case_id, "title": f"Cita {a}",
+                    "appointment_date": _now_iso(a * 7)[:10], "appointment_time": "10:00",
+                    "duration_minutes": 60, "is_completed": False, "created_at": _now_iso(),
+                })
+            for d in range(random.randint(0, 5)):
+                documents.append({
+                    "id": str(uuid.uuid4()), "client_id": client_id, "case_id": case_id,
+                    "filename": f"{uuid.uuid4()}.pdf", "original_filename": f"doc{d}.pdf", "file_path": "",
+                    "file_size": 1000, "content_type": "application/pdf", "uploaded_at": _now_iso(),
+                })
+    for name, rows in (("clients", clients), ("cases", cases), ("case_updates", updates),
+                       ("appointments", appointments), ("documents", documents)):
+        if rows:
+            await db[name].insert_many(rows, ordered=False)
+    await db.cases.create_index([("client_id", 1), ("created_at", -1), ("id", -1)])
+    await db.case_updates.create_index([("client_id", 1), ("created_at", -1), ("id", -1)])
+    await db.appointments.create_index([("client_id", 1), ("appointment_date", 1), ("id", 1)])
+    await db.documents.create_index([("client_id", 1)])
+
+
+async def sequential_dashboard(client_id: str) -> bytes:
+    """The previous implementation: five round trips in a row, full documents, Pydantic models"""
+    client = await db.clients.find_one({"id": client_id})
+    active_cases = await db.cases.find({
+        "client_id": client_id, "status": {"$in": ["active", "pending"]}
+    }).sort("created_at", -1).to_list(100)
+    recent_updates = await db.case_updates.find({
+        "client_id": client_id, "is_visible_to_client": True
+    }).sort("created_at", -1).limit(10).to_list(10)
+    today = datetime.now(timezone.utc).date().isoformat()
+    upcoming = await db.appointments.find({
+        "client_id": client_id, "appointment_date": {"$gte": today}, "is_completed": False
+    }).sort("appointment_date", 1).limit(5).to_list(5)
+    total_documents = await db.documents.count_documents({"client_id": client_id})
+    parts = [Client(**client).model_dump_json()]
+    parts += [Case(**c).model_dump_json() for c in active_cases]
+    parts += [CaseUpdate(**u).model_dump_json() for u in recent_updates]
+    parts += [Appointment(**a).model_dump_json() for a in upcoming]
+    parts.append(str(total_documents))
+    return ",".join(parts).encode()
+
+
+async def concurrent_dashboard(client_id: str) -> bytes:
+    path = f"/api/client/dashboard/{client_id}"
+    request = Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+    response = await server.get_client_dashboard(request, client_id)
+    return response.body
+
+
+async def measure(fn, client_ids):
+    samples = []
+    for client_id in client_ids:
+        started = time.perf_counter()
+        await fn(client_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[int(len(samples) * 0.95) - 1],
+        "p99": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+async def main():
+    await seed()
+    client_ids = [doc["id"] async for doc in db.clients.aggregate([
+        {"$sample": {"size": REPEAT}}, {"$project": {"_id": 0, "id": 1}}
+    ])]
+    # Warm up connections and caches for both paths
+    await measure(sequential_dashboard, client_ids[:10])
+    await measure(concurrent_dashboard, client_ids[:10])
+
+    print(f"{'path':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, fn in (("sequential", sequential_dashboard), ("concurrent", concurrent_dashboard)):
+        stats = await measure(fn, client_ids)
+        print(f"{label:<12}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+    server.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""Benchmark: indexed client search vs. the legacy case-insensitive $regex path.
+
+Seeds a throwaway database with synthetic clients (Spanish names, accents
+included), then times both query paths and reports docs examined per query.
+
+    MONGO_URL=mongodb://localhost:27017 BENCH_CLIENTS=100000 python bench_client_search.py
+"""
+import os
+import re
+import random
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from client_search import build_search_fields, build_search_tiers, search_clients
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+BENCH_DB_NAME = os.getenv("BENCH_DB_NAME", "legaldesk_bench_search")
+BENCH_CLIENTS = int(os.getenv("BENCH_CLIENTS", "100000"))
+REPEAT = int(os.getenv("REPEAT", "20"))
+LIMIT = 20
+CANDIDATES = 500
+
+FIRST_NAMES = ["María", "José", "Juan", "Ana", "Lucía", "Sofía", "Martín", "Andrés", "Ramón", "Inés",
+               "Carmen", "Jesús", "Raúl", "Begoña", "Íñigo", "Pilar", "Álvaro", "Nuria", "Óscar", "Elena"]
+LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Fernández", "Rodríguez",
+              "Díaz", "Muñoz", "Álvarez", "Romero", "Núñez", "Ibáñez", "Castaño", "Peña", "Ortiz", "Rubio"]
+TERMS = ["maria", "García", "lopez", "nun", "ibañez", "ma", "612", "jose.per", "alvaro romero"]
+
+
+def synthetic_client(i: int) -> dict:
+    first = random.choice(FIRST_NAMES)
+    last = f"{random.choice(LAST_NAMES)} {random.choice(LAST_NAMES)}"
+    email_user = f"{first}.{last.split()[0]}{i}".lower()
+    doc = {
+        "id": str(uuid.uuid4()),
+        "first_name": first,
+        "last_name": last,
+        "email": f"{email_user}@example.com",
+        "phone": f"6{random.randint(10000000, 99999999)}",
+        "status": "active",
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    doc.update(build_search_fields(doc))
+    return doc
+
+
+def regex_filter(term: str) -> dict:
+    return {"$or": [
+        {"first_name": {"$regex": term, "$options": "i"}},
+        {"last_name": {"$regex": term, "$options": "i"}},
+        {"email": {"$regex": term, "$options": "i"}},
+        {"phone": {"$regex": term, "$options": "i"}},
+    ]}
+
+
+async def seed(coll):
+    if await coll.estimated_document_count() >= BENCH_CLIENTS:
+        return
+    await coll.drop()
+    print(f"Seeding {BENCH_CLIENTS} clients into '{BENCH_DB_NAME}'...")
+    batch = []
+    for i in range(BENCH_CLIENTS):
+        batch.append(synthetic_client(i))
+        if len(batch) == 5000:
+            await coll.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await coll.insert_many(batch, ordered=False)
+    await coll.create_index([("search_tokens", 1), ("created_at", -1), ("id", -1)],
+                            name="clients_search_tokens_created_idx")
+    await coll.create_index([("search_grams", 1)], name="clients_search_grams_idx")
+
+
+async def regex_search(coll, term):
+    return await coll.find(regex_filter(re.escape(term))).sort("created_at", -1).limit(LIMIT).to_list(LIMIT)
+
+
+async def indexed_search(coll, term):
+    ranked, _ = await search_clients(coll, {}, term, LIMIT, CANDIDATES)
+    return ranked
+
+
+async def timed(fn, coll, term):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        await fn(coll, term)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def docs_examined(coll, query):
+    plan = await coll.find(query).limit(CANDIDATES).explain()
+    return plan["executionStats"]["totalDocsExamined"]
+
+
+async def main():
+    client = AsyncIOMotorClient(MONGO_URL)
+    coll = client[BENCH_DB_NAME].clients
+    await seed(coll)
+
+    print(f"{'term':<16}{'regex ms':>10}{'index ms':>10}{'regex docs':>12}{'index docs':>12}")
+    for term in TERMS:
+        regex_ms = await timed(regex_search, coll, term)
+        index_ms = await timed(indexed_search, coll, term)
+        regex_docs = await docs_examined(coll, regex_filter(re.escape(term)))
+        # Cota superior: todos los niveles, aunque la búsqueda puede parar antes
+        index_docs = sum([await docs_examined(coll, tier) for tier, _ in build_search_tiers(term)[0]])
+        print(f"{term:<16}{regex_ms:>10.2f}{index_ms:>10.2f}{regex_docs:>12}{index_docs:>12}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
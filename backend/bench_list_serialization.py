@@ -0,0 +1,102 @@
+"""Microbenchmark: list endpoint serialization, before and after the fast path.
+
+Times only the CPU work a list handler does after Mongo returns rows, at
+1k and 10k rows per page:
+
+  before  Client(**doc) per row, Page(...), then FastAPI's response_model
+          validation + jsonable_encoder + json.dumps (what the handlers did);
+  after   projected rows validated once and dumped by pydantic-core
+          (`validated_response`);
+  trusted projected rows rendered by orjson with no validation at all
+          (`TrustedJSONResponse`, used for the portal).
+
+No database is needed; rows are generated in memory.
+
+    python bench_list_serialization.py
+    ROWS=1000,10000,50000 REPEAT=20 python bench_list_serialization.py
+"""
+import os
+import asyncio
+import statistics
+import time
+import uuid
+from datetime import datetime, timezone
+
+# server.py builds a Motor client at import time; it connects lazily
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+from bson import ObjectId  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+import server  # noqa: E402
+from server import Client, Page, TrustedJSONResponse, projection_for, validated_response  # noqa: E402
+from client_search import build_search_fields  # noqa: E402
+
+ROWS = [int(n) for n in os.getenv("ROWS", "1000,10000").split(",")]
+REPEAT = int(os.getenv("REPEAT", "20"))
+
+
+def make_rows(n: int):
+    """Rows as Mongo returns them without a projection (with `_id` and search keys)."""
+    now = datetime.now(timezone.utc).isoformat()
+    rows = []
+    for i in range(n):
+        row = {
+            "_id": ObjectId(), "id": str(uuid.uuid4()), "first_name": f"Nombre{i}", "last_name": f"Apellido{i}",
+            "email": f"cliente{i}@example.com", "phone": str(600000000 + i), "address": "Calle Mayor 1",
+            "city": "Madrid", "state": "Madrid", "postal_code": "28001", "date_of_birth": None, "occupation": None,
+            "emergency_contact": None, "emergency_phone": None, "notes": "Notas del cliente " * 5,
+            "status": "active", "created_at": now, "updated_at": now,
+        }
+        row.update(build_search_fields(row))
+        rows.append(row)
+    return rows
+
+
+def project(rows, projection):
+    keep = [field for field, flag in projection.items() if flag and field != "_id"]
+    return [{field: row[field] for field in keep if field in row} for row in rows]
+
+
+async def before(rows, field):
+    page = Page(items=[Client(**row) for row in rows], limit=len(rows))
+    content = await serialize_response(field=field, response_content=page, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def after(rows, field):
+    return validated_response(Page[Client], {"items": rows, "limit": len(rows)}).body
+
+
+async def trusted(rows, field):
+    return TrustedJSONResponse({"items": rows, "limit": len(rows)}).body
+
+
+async def _timed(fn, rows, field):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        body = await fn(rows, field)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples), len(body)
+
+
+async def main():
+    field = create_model_field(name="Response_get_clients", type_=Page[Client], mode="serialization")
+    encoder = "orjson" if server.orjson is not None else "json (orjson not installed)"
+    print(f"Serializing Page[Client], median of {REPEAT} runs; trusted renderer: {encoder}")
+    print(f"{'rows':>7} {'path':<8} {'median':>10} {'body':>10} {'speedup':>8}")
+    for n in ROWS:
+        raw = make_rows(n)
+        projected = project(raw, projection_for(Client))
+        baseline = None
+        for name, fn, rows in (("before", before, raw), ("after", after, projected), ("trusted", trusted, projected)):
+            elapsed, size = await _timed(fn, rows, field)
+            baseline = baseline or elapsed
+            print(f"{n:>7} {name:<8} {elapsed * 1000:>8.1f}ms {size / 1024:>8.0f}KB {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,283 @@
+"""Load-test suite: drives the API against a local mongod seeded with synthetic data.
+
+For each dataset size (clients, see synthetic_data.py) it seeds or reuses
+`legaldesk_bench_<size>`, then fires REQUESTS requests per scenario with
+CONCURRENCY workers and reports throughput and p50/p95/p99 latency.
+
+  BENCH_MODE=asgi  (default) the app runs in-process through httpx's ASGI
+                   transport: no network, measures the handler stack;
+  BENCH_MODE=http  requests go to BENCH_URL, a server started separately on
+                   the same database (DB_NAME=legaldesk_bench_<size>).
+
+Results are written as JSON (BENCH_OUTPUT, by default
+bench_results/<size>-<mode>-<commit>-<time>.json); BENCH_COMPARE=<file.json>
+prints the change against an earlier run.
+
+    MONGO_URL=mongodb://localhost:27017 BENCH_SIZES=1000,100000 python bench_suite.py
+    BENCH_MODE=http BENCH_URL=http://localhost:8000 BENCH_SIZES=100000 python bench_suite.py
+    BENCH_SCENARIOS=get_clients_search,upload_document REQUESTS=2000 python bench_suite.py
+
+Requires httpx (`pip install httpx`).
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import platform
+import subprocess
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import synthetic_data
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+BENCH_MODE = os.getenv("BENCH_MODE", "asgi")
+BENCH_URL = os.getenv("BENCH_URL", "http://localhost:8000")
+BENCH_SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "1000").split(",")]
+BENCH_SEED = int(os.getenv("BENCH_SEED", "42"))
+REQUESTS = int(os.getenv("REQUESTS", "500"))
+CONCURRENCY = int(os.getenv("CONCURRENCY", "8"))
+WARMUP = int(os.getenv("WARMUP", "20"))
+UPLOAD_BYTES = int(os.getenv("UPLOAD_BYTES", str(256 * 1024)))
+SEARCH_TERMS = ["maria", "García", "lopez", "nun", "ibañez", "ma", "612", "jose.per", "alvaro romero", "peña"]
+RESULTS_DIR = Path(__file__).parent / "bench_results"
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+
+class Fixtures:
+    """Ids sampled from the seeded data, so requests hit real documents"""
+
+    def __init__(self, pairs: List[Tuple[str, str]], credentials: Dict[str, Dict[str, str]], today: datetime,
+                 rng: random.Random):
+        self.pairs = pairs
+        self.credentials = credentials
+        self.today = today
+        self.rng = rng
+        self.uploaded: List[str] = []
+        # client_id -> token de sesión del portal, rellenado por login_clients
+        self.tokens: Dict[str, str] = {}
+
+    def pair(self) -> Tuple[str, str]:
+        return self.rng.choice(self.pairs)
+
+    def portal_pair(self) -> Tuple[Tuple[str, str], Dict[str, str]]:
+        client_id, case_id = self.pair()
+        return (client_id, case_id), {"Authorization": f"Bearer {self.tokens.get(client_id, '')}"}
+
+
+def _upload(fx: Fixtures) -> RequestSpec:
+    client_id, case_id = fx.pair()
+    # Contenido distinto en cada subida: mide escritura real también con DOCUMENT_STORAGE=content
+    body = fx.rng.randbytes(UPLOAD_BYTES)
+    return "POST", "/api/documents/upload", {
+        "data": {"client_id": client_id, "case_id": case_id, "category": "bench"},
+        "files": {"file": ("bench.pdf", body, "application/pdf")},
+    }
+
+
+def _client_dashboard(fx: Fixtures) -> RequestSpec:
+    (client_id, _), headers = fx.portal_pair()
+    return "GET", f"/api/client/dashboard/{client_id}", {"headers": headers}
+
+
+def _case_timeline(fx: Fixtures) -> RequestSpec:
+    (client_id, case_id), headers = fx.portal_pair()
+    return "GET", f"/api/client/{client_id}/case-timeline/{case_id}", {"headers": headers}
+
+
+def _calendar_week(fx: Fixtures) -> RequestSpec:
+    start = fx.today + timedelta(days=fx.rng.randint(-30, 30))
+    return "GET", "/api/calendar", {"params": {"from": start.date().isoformat(),
+                                               "to": (start + timedelta(days=7)).date().isoformat()}}
+
+
+SCENARIOS: Dict[str, Callable[[Fixtures], RequestSpec]] = {
+    "get_clients": lambda fx: ("GET", "/api/clients", {"params": {"limit": 100}}),
+    "get_clients_search": lambda fx: ("GET", "/api/clients",
+                                      {"params": {"search": fx.rng.choice(SEARCH_TERMS), "limit": 20}}),
+    "get_dashboard_stats": lambda fx: ("GET", "/api/dashboard/stats", {}),
+    "get_client_dashboard": _client_dashboard,
+    "get_case_timeline": _case_timeline,
+    "get_cases_by_client": lambda fx: ("GET", "/api/cases", {"params": {"client_id": fx.pair()[0]}}),
+    "get_appointments_upcoming": lambda fx: ("GET", "/api/appointments", {"params": {"upcoming": "true"}}),
+    "get_calendar_week": _calendar_week,
+    "upload_document": _upload,
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted samples"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, max(0, int(round(q / 100 * len(samples))) - 1))]
+
+
+async def run_scenario(http: httpx.AsyncClient, build: Callable[[Fixtures], RequestSpec], fx: Fixtures,
+                       requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            method, url, kwargs = build(fx)
+            started = time.perf_counter()
+            try:
+                response = await http.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response is None or response.status_code >= 400:
+                errors[status] = errors.get(status, 0) + 1
+            elif method == "POST" and url == "/api/documents/upload":
+                fx.uploaded.append(response.json()["document"]["id"])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+async def load_fixtures(db, rng: random.Random) -> Fixtures:
+    pairs = [(doc["client_id"], doc["id"]) async for doc in db.cases.aggregate([
+        {"$sample": {"size": 1000}}, {"$project": {"_id": 0, "id": 1, "client_id": 1}}
+    ])]
+    if not pairs:
+        raise RuntimeError("Seeded database has no cases; increase BENCH_SIZES")
+    credentials = {doc["id"]: {"email": doc["email"], "phone": doc["phone"]} async for doc in db.clients.find(
+        {"id": {"$in": list({client_id for client_id, _ in pairs})}}, {"_id": 0, "id": 1, "email": 1, "phone": 1}
+    )}
+    return Fixtures(pairs, credentials, datetime.now(timezone.utc), rng)
+
+
+async def login_clients(http: httpx.AsyncClient, fx: Fixtures):
+    """Open a portal session for every sampled client (not timed)"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def login(client_id: str, credentials: Dict[str, str]):
+        async with semaphore:
+            response = await http.post("/api/client/login", json=credentials)
+        if response.status_code == 200:
+            fx.tokens[client_id] = response.json()["token"]
+
+    await asyncio.gather(*(login(client_id, creds) for client_id, creds in fx.credentials.items()))
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def http_client(db_name: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    if BENCH_MODE == "http":
+        return httpx.AsyncClient(base_url=BENCH_URL, timeout=60, limits=limits)
+    # server.py lee DB_NAME al importarse
+    os.environ["DB_NAME"] = db_name
+    import server
+    if server.db_name != db_name:
+        raise RuntimeError("BENCH_MODE=asgi runs one dataset size per process")
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", timeout=60)
+
+
+def print_results(results: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]]):
+    header = f"{'scenario':<27}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    print(header + ("   Δp95    Δreq/s" if baseline else ""))
+    for name, r in results.items():
+        line = (f"{name:<27}{r['throughput_rps']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+                f"{r['p99_ms']:>9.2f}{sum(r['errors'].values()):>8}")
+        before = (baseline or {}).get(name)
+        if before and before["p95_ms"] and before["throughput_rps"]:
+            line += (f"{(r['p95_ms'] / before['p95_ms'] - 1) * 100:>+7.1f}%"
+                     f"{(r['throughput_rps'] / before['throughput_rps'] - 1) * 100:>+9.1f}%")
+        print(line)
+
+
+async def bench_size(mongo, size: int, scenarios: List[str], baseline: Optional[dict]) -> Dict[str, Any]:
+    db_name = f"legaldesk_bench_{size}"
+    db = mongo[db_name]
+    started = time.perf_counter()
+    counts = await synthetic_data.seed(db, size, BENCH_SEED,
+                                       on_progress=lambda done, _: print(f"  seeding {done}/{size} clients"))
+    print(f"\n[{db_name}] {', '.join(f'{k}={v}' for k, v in counts.items())} "
+          f"(ready in {time.perf_counter() - started:.1f}s)")
+    fx = await load_fixtures(db, random.Random(BENCH_SEED))
+    results = {}
+    async with http_client(db_name) as http:
+        if {"get_client_dashboard", "get_case_timeline"} & set(scenarios):
+            await login_clients(http, fx)
+        for name in scenarios:
+            await run_scenario(http, SCENARIOS[name], fx, WARMUP, min(CONCURRENCY, WARMUP) or 1)
+            results[name] = await run_scenario(http, SCENARIOS[name], fx, REQUESTS, CONCURRENCY)
+        # Las subidas se borran por la API para que también se liberen sus ficheros
+        for document_id in fx.uploaded:
+            await http.delete(f"/api/documents/{document_id}")
+    print_results(results, (baseline or {}).get("results") if baseline and baseline.get("size") == size else None)
+    return {"size": size, "counts": counts, "results": results}
+
+
+async def main():
+    scenarios = os.getenv("BENCH_SCENARIOS", ",".join(SCENARIOS)).split(",")
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(unknown)}; available: {', '.join(SCENARIOS)}")
+        return 1
+    if BENCH_MODE == "asgi" and len(BENCH_SIZES) > 1:
+        print("BENCH_MODE=asgi runs one dataset size per process; pass a single BENCH_SIZES value")
+        return 1
+    compare = os.getenv("BENCH_COMPARE")
+    baseline = json.loads(Path(compare).read_text()) if compare else None
+
+    commit = _git_commit()
+    mongo = AsyncIOMotorClient(MONGO_URL, tz_aware=True)
+    try:
+        for size in BENCH_SIZES:
+            run = await bench_size(mongo, size, scenarios, baseline)
+            report = {
+                "commit": commit,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+                "mode": BENCH_MODE,
+                "url": BENCH_URL if BENCH_MODE == "http" else None,
+                "requests": REQUESTS,
+                "concurrency": CONCURRENCY,
+                "seed": BENCH_SEED,
+                "python": platform.python_version(),
+                **run,
+            }
+            output = os.getenv("BENCH_OUTPUT")
+            if output:
+                path = Path(output)
+            else:
+                stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+                path = RESULTS_DIR / f"{size}-{BENCH_MODE}-{commit}-{stamp}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+            print(f"Results written to {path}")
+    finally:
+        mongo.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,78 @@
+import inspect
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from document_storage import BLOBS_COLLECTION, remove_document_files
+from time_ledger import TIME_ENTRIES, delete_time_entries
+
+# Colecciones dependientes de cada padre y la clave indexada que las une.
+# Los documentos van primero: son los únicos con ficheros detrás.
+DEPENDENTS = {
+    "clients": [
+        ("documents", "client_id"),
+        ("appointments", "client_id"),
+        ("case_updates", "client_id"),
+        (TIME_ENTRIES, "client_id"),
+        ("cases", "client_id"),
+    ],
+    "cases": [
+        ("documents", "case_id"),
+        ("appointments", "case_id"),
+        ("case_updates", "case_id"),
+        (TIME_ENTRIES, "case_id"),
+    ],
+}
+DEFAULT_BATCH_SIZE = 500
+DOCUMENT_FILE_FIELDS = {"_id": 0, "id": 1, "filename": 1, "blob_id": 1}
+
+
+async def delete_documents(db, uploads_dir: Path, filter_query: dict,
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           on_progress: Optional[Callable[[int], Any]] = None) -> int:
+    """Delete matching document records and their files, one batch at a time.
+
+    Records go first so a retry never releases the same blob twice; files
+    left behind by a crash between the two steps are reclaimed by the
+    orphan sweeper.
+    """
+    deleted = 0
+    while True:
+        batch = await db.documents.find(filter_query, DOCUMENT_FILE_FIELDS).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return deleted
+        result = await db.documents.delete_many({"id": {"$in": [doc["id"] for doc in batch]}})
+        await remove_document_files(db[BLOBS_COLLECTION], uploads_dir, batch)
+        deleted += result.deleted_count
+        if on_progress:
+            progress = on_progress(deleted)
+            if inspect.isawaitable(progress):
+                await progress
+
+
+async def delete_dependents(db, uploads_dir: Path, parent: str, parent_id: str,
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """Delete every record hanging off `parent_id`; returns counts per collection."""
+    counts = {}
+    for collection, key in DEPENDENTS[parent]:
+        if collection == "documents":
+            counts[collection] = await delete_documents(db, uploads_dir, {key: parent_id}, batch_size)
+        elif collection == TIME_ENTRIES:
+            # Las entradas también descuentan de los totales por abogado
+            counts[collection] = await delete_time_entries(db, {key: parent_id}, batch_size)
+        else:
+            result = await db[collection].delete_many({key: parent_id})
+            counts[collection] = result.deleted_count
+    return counts
+
+
+async def cascade_delete(db, uploads_dir: Path, parent: str, parent_id: str,
+                         batch_size: int = DEFAULT_BATCH_SIZE):
+    """Delete a client or case together with everything that depends on it.
+
+    Dependents are removed before the parent, so an interrupted run leaves
+    the parent in place and can simply be repeated. Returns the deleted
+    parent (or None if it did not exist) and the dependent counts.
+    """
+    counts = await delete_dependents(db, uploads_dir, parent, parent_id, batch_size)
+    deleted = await db[parent].find_one_and_delete({"id": parent_id}, projection={"_id": 0, "id": 1, "status": 1})
+    return deleted, counts
@@ -0,0 +1,250 @@
+"""Revenue and workload analytics materialized into rollup collections.
+
+Two levels, both written server-side with `$merge`:
+
+  analytics_case_facts  one row per case: its dimensions (case_type, status,
+                        client_id, month) and measures (billed hours, billed
+                        amount = hours x rate, case value);
+  analytics_rollups     one row per (dimension, key) summing the facts.
+
+`refresh` only looks at cases whose `updated_at` moved since the last run:
+their facts are re-merged and just the rollup groups they left or joined
+are re-aggregated from the (indexed) facts. `rebuild` recomputes everything
+and is the fallback after writes that bypass `updated_at`. API reports read
+only `analytics_rollups`, a few dozen rows per dimension at most except per
+client.
+
+    MONGO_URL=... python case_analytics.py            # incremental refresh
+    MONGO_URL=... python case_analytics.py rebuild
+"""
+import os
+import sys
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from temporal import date_range
+
+logger = logging.getLogger(__name__)
+
+FACTS_COLLECTION = "analytics_case_facts"
+ROLLUPS_COLLECTION = "analytics_rollups"
+STATE_COLLECTION = "analytics_state"
+DIMENSIONS = ("case_type", "status", "client_id", "month")
+OPEN_STATUSES = ["active", "pending", "on_hold"]
+# Se reprocesan los casos de los últimos minutos anteriores a la marca: absorbe
+# relojes desfasados entre workers; re-mezclar un hecho es idempotente
+REFRESH_OVERLAP = timedelta(minutes=5)
+# Más cambios que esto en una pasada incremental: sale más barato reconstruir
+REBUILD_THRESHOLD = int(os.environ.get("ANALYTICS_REBUILD_THRESHOLD", "50000"))
+# Refresco periódico dentro del servidor (0 lo desactiva)
+REFRESH_SECONDS = float(os.environ.get("ANALYTICS_REFRESH_SECONDS", "300"))
+
+
+def _number(field: str) -> dict:
+    return {"$convert": {"input": f"${field}", "to": "double", "onError": 0.0, "onNull": 0.0}}
+
+
+def _month(field: str) -> dict:
+    return {"$switch": {"branches": [
+        {"case": {"$eq": [{"$type": f"${field}"}, "date"]},
+         "then": {"$dateToString": {"format": "%Y-%m", "date": f"${field}"}}},
+        # Fechas heredadas en texto ISO
+        {"case": {"$eq": [{"$type": f"${field}"}, "string"]}, "then": {"$substrCP": [f"${field}", 0, 7]}},
+    ], "default": None}}
+
+
+def fact_pipeline(now: datetime) -> List[dict]:
+    """Stages turning case documents into fact rows"""
+    return [
+        {"$set": {"_hours": _number("total_hours"), "_rate": _number("hourly_rate")}},
+        {"$project": {
+            "_id": "$id",
+            "case_type": {"$ifNull": ["$case_type", "unknown"]},
+            "status": {"$ifNull": ["$status", "unknown"]},
+            "client_id": {"$ifNull": ["$client_id", "unknown"]},
+            # Mes de apertura: start_date, o created_at si falta
+            "month": {"$ifNull": [_month("start_date"), _month("created_at"), "unknown"]},
+            "billed_hours": "$_hours",
+            # Contador del libro de horas; horas x tarifa en casos que aún no lo tienen
+            "billed_amount": {"$ifNull": ["$billed_amount", {"$multiply": ["$_hours", "$_rate"]}]},
+            "case_value": _number("case_value"),
+            "refreshed_at": {"$literal": now},
+        }},
+        {"$merge": {"into": FACTS_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def rollup_pipeline(dimension: str, keys: Optional[Iterable[str]], now: datetime) -> List[dict]:
+    """Aggregate facts into rollup rows for one dimension (only `keys` if given)"""
+    match = [{"$match": {dimension: {"$in": list(keys)}}}] if keys is not None else []
+    return match + [
+        {"$group": {
+            "_id": f"${dimension}",
+            "cases": {"$sum": 1},
+            "open_cases": {"$sum": {"$cond": [{"$in": ["$status", OPEN_STATUSES]}, 1, 0]}},
+            "billed_hours": {"$sum": "$billed_hours"},
+            "revenue": {"$sum": "$billed_amount"},
+            "case_value": {"$sum": "$case_value"},
+        }},
+        {"$project": {
+            "_id": {"$concat": [f"{dimension}:", "$_id"]},
+            "dimension": {"$literal": dimension},
+            "key": "$_id",
+            "cases": 1,
+            "open_cases": 1,
+            "billed_hours": {"$round": ["$billed_hours", 2]},
+            "revenue": {"$round": ["$revenue", 2]},
+            "case_value": {"$round": ["$case_value", 2]},
+            "refreshed_at": {"$literal": now},
+        }},
+        {"$merge": {"into": ROLLUPS_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def _touched(facts: Iterable[Dict[str, Any]], touched: Optional[Dict[str, Set[str]]] = None) -> Dict[str, Set[str]]:
+    touched = touched if touched is not None else {dimension: set() for dimension in DIMENSIONS}
+    for fact in facts:
+        for dimension in DIMENSIONS:
+            if fact.get(dimension) is not None:
+                touched[dimension].add(fact[dimension])
+    return touched
+
+
+async def _recompute(db, touched: Optional[Dict[str, Set[str]]], now: datetime):
+    """Re-aggregate the given rollup groups (all of them when `touched` is None)"""
+    rollups = db[ROLLUPS_COLLECTION]
+    for dimension in DIMENSIONS:
+        keys = None if touched is None else touched[dimension]
+        if keys is not None and not keys:
+            continue
+        await db[FACTS_COLLECTION].aggregate(rollup_pipeline(dimension, keys, now)).to_list(None)
+        # Grupos que no ha vuelto a producir la agregación se han quedado vacíos
+        stale = {"dimension": dimension, "refreshed_at": {"$lt": now}}
+        if keys is not None:
+            stale["key"] = {"$in": list(keys)}
+        await rollups.delete_many(stale)
+
+
+async def _save_state(db, now: datetime, mode: str, cases: int):
+    await db[STATE_COLLECTION].update_one(
+        {"_id": "cases"}, {"$set": {"watermark": now, "mode": mode, "cases": cases}}, upsert=True
+    )
+
+
+async def rebuild(db) -> Dict[str, Any]:
+    """Recompute every fact and rollup from the cases collection"""
+    now = datetime.now(timezone.utc)
+    await db.cases.aggregate(fact_pipeline(now)).to_list(None)
+    removed = await db[FACTS_COLLECTION].delete_many({"refreshed_at": {"$lt": now}})
+    await _recompute(db, None, now)
+    cases = await db[FACTS_COLLECTION].count_documents({})
+    await _save_state(db, now, "rebuild", cases)
+    return {"mode": "rebuild", "cases": cases, "removed": removed.deleted_count}
+
+
+async def _stale_facts(db, batch_size: int) -> List[Dict[str, Any]]:
+    """Facts whose case no longer exists: each batch of fact ids is checked with `$in` on the unique cases.id index"""
+    stale = []
+    batch: List[Dict[str, Any]] = []
+
+    async def check(batch):
+        existing = {doc["id"] async for doc in db.cases.find(
+            {"id": {"$in": [fact["_id"] for fact in batch]}}, {"_id": 0, "id": 1}
+        )}
+        stale.extend(fact for fact in batch if fact["_id"] not in existing)
+
+    async for fact in db[FACTS_COLLECTION].find({}, {dimension: 1 for dimension in DIMENSIONS}).batch_size(batch_size):
+        batch.append(fact)
+        if len(batch) >= batch_size:
+            await check(batch)
+            batch = []
+    if batch:
+        await check(batch)
+    return stale
+
+
+async def refresh(db, batch_size: int = 1000) -> Dict[str, Any]:
+    """Fold cases changed since the last run into facts and rollups"""
+    state = await db[STATE_COLLECTION].find_one({"_id": "cases"})
+    if not state or not state.get("watermark"):
+        return await rebuild(db)
+    now = datetime.now(timezone.utc)
+    since = state["watermark"]
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    changed = date_range("updated_at", gte=since - REFRESH_OVERLAP)
+    if await db.cases.count_documents(changed, limit=REBUILD_THRESHOLD + 1) > REBUILD_THRESHOLD:
+        return await rebuild(db)
+
+    touched = {dimension: set() for dimension in DIMENSIONS}
+    ids: List[str] = []
+    updated = 0
+
+    async def flush():
+        nonlocal ids, updated
+        # Grupos que el caso abandona (hecho anterior) y a los que se une (hecho nuevo)
+        _touched(await db[FACTS_COLLECTION].find({"_id": {"$in": ids}}).to_list(None), touched)
+        await db.cases.aggregate([{"$match": {"id": {"$in": ids}}}, *fact_pipeline(now)]).to_list(None)
+        _touched(await db[FACTS_COLLECTION].find({"_id": {"$in": ids}}).to_list(None), touched)
+        updated += len(ids)
+        ids = []
+
+    async for doc in db.cases.find(changed, {"_id": 0, "id": 1}).batch_size(batch_size):
+        ids.append(doc["id"])
+        if len(ids) >= batch_size:
+            await flush()
+    if ids:
+        await flush()
+
+    # Borrados que no pasaron por forget_cases (bulk-delete, barrido de huérfanos, shell). Se buscan en cada
+    # pasada: comparar cuántos hechos y casos hay no basta si entre medias también se crearon casos
+    stale = await _stale_facts(db, batch_size)
+    if stale:
+        _touched(stale, touched)
+        await db[FACTS_COLLECTION].delete_many({"_id": {"$in": [fact["_id"] for fact in stale]}})
+    await _recompute(db, touched, now)
+    await _save_state(db, now, "incremental", updated)
+    return {"mode": "incremental", "cases": updated, "removed": len(stale)}
+
+
+async def forget_cases(db, fact_filter: Dict[str, Any]) -> int:
+    """Drop the facts matching `fact_filter` (e.g. `{"client_id": ...}`) after their cases were deleted"""
+    facts = await db[FACTS_COLLECTION].find(fact_filter).to_list(None)
+    if not facts:
+        return 0
+    await db[FACTS_COLLECTION].delete_many({"_id": {"$in": [fact["_id"] for fact in facts]}})
+    await _recompute(db, _touched(facts), datetime.now(timezone.utc))
+    return len(facts)
+
+
+async def refresh_periodically(db, interval: float = REFRESH_SECONDS, on_refresh=None):
+    """Background loop for the server's lifespan"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await refresh(db)
+            if on_refresh and (result["cases"] or result["removed"]):
+                await on_refresh(result)
+        except Exception as e:
+            logger.warning("Analytics refresh failed: %s", e)
+
+
+async def main(mode: str):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from collection_versions import bump_versions
+
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+    db_name = os.getenv("DB_NAME", "legaldesk")
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    db = client[db_name]
+    result = await (rebuild(db) if mode == "rebuild" else refresh(db))
+    await bump_versions(db, ROLLUPS_COLLECTION)
+    print(f"Analytics {result['mode']} on '{db_name}': {result['cases']} cases folded, "
+          f"{result['removed']} deleted cases dropped")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else "refresh"))
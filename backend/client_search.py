@@ -0,0 +1,211 @@
+import re
+import inspect
+import unicodedata
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+# Campos de búsqueda precalculados que se guardan junto a cada cliente
+SEARCH_TOKENS_FIELD = "search_tokens"
+SEARCH_GRAMS_FIELD = "search_grams"
+GRAM_SIZE = 3
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_PHONE_LIKE = re.compile(r"[\d\s()+.\-]+")
+
+
+def normalize_text(value: Any) -> str:
+    """Lower-case, strip accents and collapse punctuation to single spaces."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    folded = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", folded.lower()).strip()
+
+
+def phone_digits(value: Any) -> str:
+    return re.sub(r"\D", "", str(value or ""))
+
+
+def grams(token: str) -> List[str]:
+    if len(token) < GRAM_SIZE:
+        return []
+    return [token[i:i + GRAM_SIZE] for i in range(len(token) - GRAM_SIZE + 1)]
+
+
+def build_search_fields(client: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Build the indexed search keys for a client document.
+
+    `search_tokens` holds normalized words (names, email parts, phone digits)
+    and serves anchored prefix lookups; `search_grams` holds their trigrams
+    and serves substring lookups. Both are multikey-indexed.
+    """
+    tokens = set()
+    for field in ("first_name", "last_name", "email"):
+        tokens.update(normalize_text(client.get(field)).split())
+    digits = phone_digits(client.get("phone"))
+    if digits:
+        tokens.add(digits)
+
+    all_grams = set()
+    for token in tokens:
+        all_grams.update(grams(token))
+
+    return {
+        SEARCH_TOKENS_FIELD: sorted(tokens),
+        SEARCH_GRAMS_FIELD: sorted(all_grams),
+    }
+
+
+def query_tokens(term: str) -> List[str]:
+    """Split a raw search term into normalized query tokens."""
+    if _PHONE_LIKE.fullmatch(term.strip() or "x"):
+        digits = phone_digits(term)
+        return [digits] if digits else []
+    return normalize_text(term).split()
+
+
+def build_search_query(term: str) -> Tuple[Dict[str, Any], List[str]]:
+    """Build an index-backed Mongo filter for `term`.
+
+    Every query token must match: short tokens as an anchored prefix on
+    `search_tokens`, longer ones through all of their trigrams on
+    `search_grams`. Returns the filter and the query tokens used for ranking.
+    """
+    tokens = query_tokens(term)
+    clauses = []
+    for token in tokens:
+        token_grams = grams(token)
+        if token_grams:
+            clauses.append({SEARCH_GRAMS_FIELD: {"$all": token_grams}})
+        else:
+            clauses.append({SEARCH_TOKENS_FIELD: {"$regex": "^" + re.escape(token)}})
+    if not clauses:
+        return {}, []
+    return _match_all(clauses), tokens
+
+
+def _match_all(clauses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def build_search_tiers(term: str) -> Tuple[List[Tuple[Dict[str, Any], int]], List[str]]:
+    """Split the search for `term` into filters of decreasing match quality.
+
+    Each tier is `(filter, best score)`: every query token equal to a word,
+    every query token a word prefix, then the full `build_search_query`
+    filter. The score is the highest `match_score` a client first found in
+    that tier can reach (clients from earlier tiers are excluded), so the
+    caller can stop once its results already beat the next tier.
+    """
+    query, tokens = build_search_query(term)
+    if not tokens:
+        return [], []
+    n = len(tokens)
+    prefix = _match_all([{SEARCH_TOKENS_FIELD: {"$regex": "^" + re.escape(token)}} for token in tokens])
+    tiers = [({SEARCH_TOKENS_FIELD: {"$all": tokens}}, 3 * n), (prefix, 3 * n - 1)]
+    # Con todos los tokens cortos la consulta completa ya es la de prefijos
+    if query != prefix:
+        tiers.append((query, 3 * n - 2))
+    return tiers, tokens
+
+
+def _token_score(query_token: str, doc_tokens: List[str]) -> int:
+    best = 0
+    for token in doc_tokens:
+        if token == query_token:
+            return 3
+        if token.startswith(query_token):
+            best = max(best, 2)
+        elif query_token in token:
+            best = max(best, 1)
+    return best
+
+
+def match_score(doc: Dict[str, Any], tokens: List[str]) -> int:
+    """Sum of per-token scores, 0 when some token matches no single word"""
+    doc_tokens = doc.get(SEARCH_TOKENS_FIELD, [])
+    scores = [_token_score(token, doc_tokens) for token in tokens]
+    return sum(scores) if all(scores) else 0
+
+
+def rank_matches(docs: List[Dict[str, Any]], tokens: List[str], limit: int) -> List[Dict[str, Any]]:
+    """Rank candidates by match quality (exact > prefix > substring).
+
+    Candidates whose trigrams matched across different words are dropped,
+    since no single word actually contains the query token. Ties keep the
+    most recently created client first.
+    """
+    scored = []
+    for doc in docs:
+        score = match_score(doc, tokens)
+        if score:
+            scored.append((score, str(doc.get("created_at", "")), doc))
+    scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+    return [doc for _, _, doc in scored[:limit]]
+
+
+async def search_clients(collection, filter_query: Dict[str, Any], term: str, limit: int,
+                         candidate_limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+    """Best `limit` clients for `term`, reading exact, then prefix, then substring matches.
+
+    Each tier reads at most `candidate_limit` clients, newest first, and
+    later tiers are skipped once they cannot outrank the results so far.
+    Returns the ranked clients and whether some tier hit the cap.
+    """
+    tiers, tokens = build_search_tiers(term)
+    candidates: List[Dict[str, Any]] = []
+    seen: List[str] = []
+    for index, (tier, _) in enumerate(tiers):
+        query = {**filter_query, **tier}
+        if seen:
+            query = {"$and": [query, {"id": {"$nin": seen}}]}
+        docs = await collection.find(query, {"_id": 0, SEARCH_GRAMS_FIELD: 0}).sort(
+            [("created_at", -1), ("id", -1)]
+        ).limit(candidate_limit).to_list(candidate_limit)
+        candidates += docs
+        ranked = rank_matches(candidates, tokens, limit)
+        if len(docs) >= candidate_limit:
+            return ranked, True
+        seen += [doc["id"] for doc in docs]
+        # Ningún cliente de los niveles siguientes puede superar al último de la página
+        if index + 1 < len(tiers) and len(ranked) == limit and match_score(ranked[-1], tokens) > tiers[index + 1][1]:
+            break
+    return rank_matches(candidates, tokens, limit), False
+
+
+# Se leen los campos que alimentan las claves de búsqueda y las claves guardadas, para no reescribir las que ya cuadran
+BACKFILL_PROJECTION = {"_id": 1, "first_name": 1, "last_name": 1, "email": 1, "phone": 1,
+                       SEARCH_TOKENS_FIELD: 1, SEARCH_GRAMS_FIELD: 1}
+
+
+async def backfill_search_fields(collection, batch_size: int = 1000,
+                                 on_progress: Optional[Callable[[int], Any]] = None) -> int:
+    """Recompute search keys for every client with unordered bulk updates.
+
+    Only clients whose stored keys differ are written, and each write bumps
+    the record `version` so cached reads of the client revalidate. The
+    update is conditional on the old keys, so a client edited meanwhile
+    (which rebuilt its own keys) is left alone. `on_progress` receives the
+    clients visited; the return value is the clients updated.
+    """
+    updated = visited = 0
+    ops = []
+    async for doc in collection.find({}, BACKFILL_PROJECTION).batch_size(batch_size):
+        visited += 1
+        fields = build_search_fields(doc)
+        stored = {name: doc.get(name) for name in fields}
+        if stored != fields:
+            ops.append(UpdateOne({"_id": doc["_id"], **stored}, {"$set": fields, "$inc": {"version": 1}}))
+        if len(ops) >= batch_size:
+            result = await collection.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+            ops = []
+        if on_progress and visited % batch_size == 0:
+            result = on_progress(visited)
+            if inspect.isawaitable(result):
+                await result
+    if ops:
+        result = await collection.bulk_write(ops, ordered=False)
+        updated += result.modified_count
+    return updated
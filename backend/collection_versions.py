@@ -0,0 +1,54 @@
+"""Per-collection version stamps backing ETag / Last-Modified on reads.
+
+Every write path bumps the stamp of the collections it touched *after*
+the write completes; read handlers load the stamps *before* querying, so
+a response can only ever be labelled with an older version than the data
+it holds, never a newer one.
+
+Writes made outside the API (mongo shell, restores) should bump too:
+
+    MONGO_URL=... python collection_versions.py              # bump every collection
+    MONGO_URL=... python collection_versions.py clients cases
+"""
+import os
+import sys
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Iterable
+
+from pymongo import UpdateOne
+
+VERSIONS_COLLECTION = "collection_versions"
+VERSIONED_COLLECTIONS = ("clients", "cases", "documents", "appointments", "case_updates", "time_entries")
+
+
+async def bump_versions(db, *names: str):
+    """Increment the stamp of each named collection"""
+    now = datetime.now(timezone.utc)
+    ops = [
+        UpdateOne({"_id": name}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+        for name in dict.fromkeys(names)
+    ]
+    if ops:
+        await db[VERSIONS_COLLECTION].bulk_write(ops, ordered=False)
+
+
+async def read_versions(db, names: Iterable[str]) -> Dict[str, dict]:
+    """Return `{name: {"version", "updated_at"}}`; never-bumped collections are absent"""
+    cursor = db[VERSIONS_COLLECTION].find({"_id": {"$in": list(names)}})
+    return {doc["_id"]: doc async for doc in cursor}
+
+
+async def main(names):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+    db_name = os.getenv("DB_NAME", "legaldesk")
+    client = AsyncIOMotorClient(mongo_url)
+    await bump_versions(client[db_name], *names)
+    print(f"Bumped version stamps in '{db_name}': {', '.join(names)}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:] or VERSIONED_COLLECTIONS))
@@ -0,0 +1,176 @@
+import os
+import uuid
+import shutil
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+# Colección con un registro por contenido almacenado (clave: SHA-256)
+BLOBS_COLLECTION = "document_blobs"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def blob_filename(sha256: str, extension: str = "") -> str:
+    return f"{sha256}.{extension}" if extension else sha256
+
+
+def hash_file(path: Path) -> Tuple[int, str]:
+    """Return `(size, sha256)` of a file on disk. Blocking; run it in a thread."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(HASH_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+async def acquire_blob(blobs, sha256: str, filename: str, size: int) -> dict:
+    """Take a reference on the blob for `sha256`, creating it if needed.
+
+    The reference is taken before the file is placed on disk so a concurrent
+    release of the last reference never unlinks a file that is being reused.
+    """
+    now = datetime.now(timezone.utc)
+    return await blobs.find_one_and_update(
+        {"_id": sha256},
+        {
+            "$inc": {"ref_count": 1},
+            # acquired_at lets the orphan sweeper leave in-flight uploads alone
+            "$set": {"acquired_at": now},
+            "$setOnInsert": {
+                "filename": filename,
+                "size": size,
+                "created_at": now,
+            },
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def place_blob(source: Path, destination: Path):
+    """Move a freshly written file into its content-addressed location.
+
+    The file always replaces whatever is there (same hash, same bytes): an
+    existing copy may be the one a concurrent `release_blob` is removing.
+    """
+    await asyncio.to_thread(os.replace, source, destination)
+
+
+def _link_or_copy(source: Path, destination: Path):
+    staging = destination.with_name(f".link-{uuid.uuid4().hex}")
+    try:
+        try:
+            os.link(source, staging)
+        except OSError:
+            # Sistemas de ficheros sin enlaces duros
+            shutil.copyfile(source, staging)
+        os.replace(staging, destination)
+    finally:
+        # rename() entre dos enlaces al mismo archivo no hace nada y deja `staging`
+        staging.unlink(missing_ok=True)
+
+
+async def copy_blob(source: Path, destination: Path):
+    """Like `place_blob`, but `source` stays where it is.
+
+    For callers that must record the new location before the old one may
+    go: a hard link where the file system allows it, a copy otherwise.
+    """
+    await asyncio.to_thread(_link_or_copy, source, destination)
+
+
+def _move_if_exists(source: Path, destination: Path) -> bool:
+    try:
+        os.replace(source, destination)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+async def remove_blob(blobs, guard: dict, uploads_dir: Path, filename: str) -> bool:
+    """Delete the blob record matching `guard` and then its file.
+
+    The file is moved aside before the record goes: an upload that takes a
+    new reference afterwards places its own copy, which this call no longer
+    touches. Returns True if the record was deleted.
+    """
+    path = uploads_dir / filename
+    tombstone = uploads_dir / f".release-{guard['_id']}-{uuid.uuid4().hex}"
+    moved = await asyncio.to_thread(_move_if_exists, path, tombstone)
+    result = await blobs.delete_one(guard)
+    if not result.deleted_count:
+        # El registro cambió entre medias (nueva referencia): devolver el archivo a su sitio
+        if moved:
+            await asyncio.to_thread(os.replace, tombstone, path)
+        return False
+    if moved:
+        await asyncio.to_thread(tombstone.unlink, missing_ok=True)
+    return True
+
+
+async def release_blob(blobs, sha256: str, uploads_dir: Path) -> bool:
+    """Drop one reference; unlink the file when the last one is gone.
+
+    Returns True if the blob was removed.
+    """
+    blob = await blobs.find_one_and_update(
+        {"_id": sha256},
+        {"$inc": {"ref_count": -1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not blob or blob["ref_count"] > 0:
+        return False
+    # Only the caller that removes the zero-ref record may touch the file
+    return await remove_blob(blobs, {"_id": sha256, "ref_count": {"$lte": 0}}, uploads_dir, blob["filename"])
+
+
+async def remove_document_files(blobs, uploads_dir: Path, documents: List[dict]):
+    """Remove the files behind deleted document records.
+
+    Shared blobs are only unlinked when no other document uses them; legacy
+    per-upload files are unlinked directly, in one worker-thread call.
+    """
+    legacy_paths = []
+    for document in documents:
+        if document.get("blob_id"):
+            await release_blob(blobs, document["blob_id"], uploads_dir)
+        elif document.get("filename"):
+            legacy_paths.append(uploads_dir / document["filename"])
+
+    def unlink_all():
+        for path in legacy_paths:
+            path.unlink(missing_ok=True)
+
+    if legacy_paths:
+        await asyncio.to_thread(unlink_all)
+
+
+async def recount_references(db) -> Dict[str, int]:
+    """Set every blob's ref_count to the number of documents pointing at it.
+
+    Blobs no document points at are set to 0, so the orphan sweeper can
+    reclaim them. Returns the recomputed counts; blobs absent from the
+    result have no referencing documents left.
+    """
+    counts = {}
+    async for row in db.documents.aggregate([
+        {"$match": {"blob_id": {"$ne": None}}},
+        {"$group": {"_id": "$blob_id", "refs": {"$sum": 1}}},
+    ]):
+        counts[row["_id"]] = row["refs"]
+    ops = [UpdateOne({"_id": blob_id}, {"$set": {"ref_count": refs}}) for blob_id, refs in counts.items()]
+    if ops:
+        await db[BLOBS_COLLECTION].bulk_write(ops, ordered=False)
+    await db[BLOBS_COLLECTION].update_many(
+        {"_id": {"$nin": list(counts)}, "ref_count": {"$ne": 0}}, {"$set": {"ref_count": 0}}
+    )
+    return counts
@@ -0,0 +1,86 @@
+"""Liveness / readiness probes.
+
+`/healthz` only proves the process answers. `/readyz` also checks that Mongo
+responds to `ping`, that the uploads directory accepts writes and that its
+disk keeps MIN_FREE_BYTES of headroom. Results are cached for at most
+`max_age` seconds and concurrent probes share one in-flight check, so
+platform probes cost at most one ping per `max_age` however often they come.
+"""
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Antigüedad máxima de un resultado de /readyz antes de volver a comprobar
+READY_CACHE_SECONDS = float(os.environ.get("READY_CACHE_SECONDS", "10"))
+READY_PING_TIMEOUT = float(os.environ.get("READY_PING_TIMEOUT", "2"))
+# Espacio libre mínimo en el disco de uploads para aceptar tráfico
+MIN_FREE_BYTES = int(float(os.environ.get("READY_MIN_FREE_MB", "100")) * 1024 * 1024)
+
+
+def _check_uploads(uploads_dir: Path, min_free_bytes: int) -> Dict[str, Any]:
+    try:
+        with tempfile.NamedTemporaryFile(dir=uploads_dir, prefix=".readyz-"):
+            pass
+        free = shutil.disk_usage(uploads_dir).free
+    except OSError as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e.strerror or e}"}
+    result = {"ok": free >= min_free_bytes, "free_mb": free // (1024 * 1024)}
+    if not result["ok"]:
+        result["error"] = f"less than {min_free_bytes // (1024 * 1024)} MB free"
+    return result
+
+
+class ReadinessProbe:
+    """Cached dependency checks behind /readyz"""
+
+    def __init__(self, db, uploads_dir: Path, max_age: float = READY_CACHE_SECONDS,
+                 ping_timeout: float = READY_PING_TIMEOUT, min_free_bytes: int = MIN_FREE_BYTES):
+        self.db = db
+        self.uploads_dir = uploads_dir
+        self.max_age = max_age
+        self.ping_timeout = ping_timeout
+        self.min_free_bytes = min_free_bytes
+        self.started_at = time.monotonic()
+        self._result: Optional[Dict[str, Dict[str, Any]]] = None
+        self._checked_at = 0.0
+        self._pending: Optional[asyncio.Task] = None
+
+    async def _check_mongo(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.db.command("ping"), self.ping_timeout)
+        except asyncio.TimeoutError:
+            return {"ok": False, "error": f"ping timed out after {self.ping_timeout:g}s"}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        return {"ok": True, "ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def _check(self) -> Dict[str, Dict[str, Any]]:
+        mongo, uploads = await asyncio.gather(
+            self._check_mongo(),
+            asyncio.to_thread(_check_uploads, self.uploads_dir, self.min_free_bytes),
+        )
+        self._result = {"mongo": mongo, "uploads": uploads}
+        self._checked_at = time.monotonic()
+        return self._result
+
+    async def checks(self) -> Tuple[Dict[str, Dict[str, Any]], float]:
+        """Return `(checks, age_seconds)`, re-running them once the cached result is too old"""
+        if self._result is None or time.monotonic() - self._checked_at >= self.max_age:
+            if self._pending is None or self._pending.done():
+                self._pending = asyncio.ensure_future(self._check())
+            # shield: un sondeo que se cancela no aborta la comprobación que esperan los demás
+            await asyncio.shield(self._pending)
+        return self._result, time.monotonic() - self._checked_at
+
+    async def status(self) -> Tuple[bool, Dict[str, Any]]:
+        checks, age = await self.checks()
+        ready = all(check["ok"] for check in checks.values())
+        return ready, {"status": "ready" if ready else "unavailable", "age_s": round(age, 1), "checks": checks}
+
+    def uptime(self) -> float:
+        return time.monotonic() - self.started_at
@@ -0,0 +1,152 @@
+import time
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobContext:
+    """Handle passed to a running job for reporting progress."""
+
+    # Progress is persisted at most this often to keep Mongo writes cheap
+    PROGRESS_INTERVAL = 1.0
+
+    def __init__(self, runner: "JobRunner", job_id: str, params: Dict[str, Any]):
+        self.runner = runner
+        self.job_id = job_id
+        self.params = params
+        self._last_write = 0.0
+
+    async def progress(self, done: int, total: Optional[int] = None, message: Optional[str] = None,
+                       force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_write < self.PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        await self.runner.collection.update_one(
+            {"id": self.job_id},
+            {"$set": {"progress": {"done": done, "total": total, "message": message}, "updated_at": _now()}},
+        )
+
+
+JobHandler = Callable[[JobContext], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobRunner:
+    """In-process async job runner persisted in a Mongo collection.
+
+    Jobs are tasks on the server's event loop; at most `max_concurrency` run
+    at once and the rest wait as `queued`. Handlers are expected to await
+    between batches so interactive requests keep getting scheduled.
+    """
+
+    def __init__(self, collection, max_concurrency: int = 2):
+        self.collection = collection
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    @property
+    def kinds(self) -> List[str]:
+        return sorted(self._handlers)
+
+    async def submit(self, kind: str, params: Optional[Dict[str, Any]] = None) -> dict:
+        if kind not in self._handlers:
+            raise KeyError(kind)
+        job = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "params": params or {},
+            "status": QUEUED,
+            "progress": None,
+            "result": None,
+            "error": None,
+            "created_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "updated_at": _now(),
+        }
+        await self.collection.insert_one(dict(job))
+        self._tasks[job["id"]] = asyncio.create_task(self._run(job["id"], kind, job["params"]))
+        return job
+
+    async def _set(self, job_id: str, **fields):
+        fields["updated_at"] = _now()
+        await self.collection.update_one({"id": job_id}, {"$set": fields})
+
+    async def _run(self, job_id: str, kind: str, params: Dict[str, Any]):
+        try:
+            async with self._semaphore:
+                await self._set(job_id, status=RUNNING, started_at=_now())
+                result = await self._handlers[kind](JobContext(self, job_id, params))
+            await self._set(job_id, status=SUCCEEDED, result=result, finished_at=_now())
+        except asyncio.CancelledError:
+            await asyncio.shield(self._set(job_id, status=CANCELLED, finished_at=_now()))
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job_id, kind)
+            await self._set(job_id, status=FAILED, error=str(e), finished_at=_now())
+        finally:
+            self._tasks.pop(job_id, None)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0})
+
+    async def list(self, limit: int = 50, status: Optional[str] = None) -> List[dict]:
+        query = {"status": status} if status else {}
+        return await self.collection.find(query, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """Cancel a queued or running job of this process; returns the job, or None if unknown"""
+        task = self._tasks.get(job_id)
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            return await self.get(job_id)
+        # Not running here (e.g. left over from a previous process): only mark it
+        return await self.collection.find_one_and_update(
+            {"id": job_id, "status": {"$in": [QUEUED, RUNNING]}},
+            {"$set": {"status": CANCELLED, "finished_at": _now(), "updated_at": _now()}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        ) or await self.get(job_id)
+
+    async def recover(self, stale_after: float = 300):
+        """Fail unfinished jobs nobody has touched for `stale_after` seconds.
+
+        Those were left behind by a previous process and are not resumed
+        automatically; recently updated ones may belong to another worker.
+        """
+        cutoff = datetime.fromtimestamp(time.time() - stale_after, timezone.utc)
+        await self.collection.update_many(
+            {"status": {"$in": [QUEUED, RUNNING]}, "updated_at": {"$lt": cutoff}},
+            {"$set": {"status": FAILED, "error": "Interrupted by server restart",
+                      "finished_at": _now(), "updated_at": _now()}},
+        )
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,297 @@
+"""Process metrics in the Prometheus text format, without extra dependencies.
+
+- `MetricsMiddleware` times every request by route template and tracks
+  in-flight requests; requests slower than SLOW_REQUEST_MS are logged with
+  their Mongo command breakdown.
+- `MongoCommandMetrics` is a pymongo command listener: per-collection and
+  per-command timings and returned/affected document counts.
+- `phase()` times the other suspects (serialization, upload I/O) so a slow
+  request can be attributed to Mongo, Pydantic or the filesystem.
+
+Values are per process: with several workers, scrape each one.
+"""
+import os
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+# Umbral a partir del cual una petición se registra en el log con su desglose
+SLOW_REQUEST_SECONDS = float(os.environ.get("SLOW_REQUEST_MS", "500")) / 1000
+PREFIX = "legaldesk_"
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        # pymongo listeners run in Motor's executor threads
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> Iterator[Tuple[str, Sequence[str], Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labelnames, values, value in self.samples():
+            lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, self.labelnames, key, value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [recuentos por bucket (+Inf al final), suma, total]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", names, key + (le,), cumulative
+            yield f"{self.name}_sum", self.labelnames, key, total
+            yield f"{self.name}_count", self.labelnames, key, count
+
+
+HTTP_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route template.",
+                          ("method", "route", "status"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.", ("method", "route"))
+UPLOAD_BYTES = Counter("upload_bytes_total", "Bytes received in document uploads.")
+UPLOADS = Counter("uploads_total", "Document uploads by outcome.", ("outcome",))
+PHASE_DURATION = Histogram("phase_duration_seconds", "Time spent outside Mongo, by phase.", ("phase",))
+MONGO_DURATION = Histogram("mongo_command_duration_seconds", "Mongo command latency.",
+                           ("collection", "command"), buckets=MONGO_BUCKETS)
+MONGO_DOCUMENTS = Counter("mongo_command_documents_total",
+                          "Documents returned (reads) or affected (writes) by Mongo commands.",
+                          ("collection", "command"))
+MONGO_FAILURES = Counter("mongo_command_failures_total", "Failed Mongo commands.", ("collection", "command"))
+
+
+def render() -> bytes:
+    return ("\n".join(metric.render() for metric in REGISTRY) + "\n").encode()
+
+
+class RequestStats:
+    """Mongo commands and phases seen while serving one request."""
+
+    def __init__(self):
+        self.commands: Dict[Tuple[str, str], List[float]] = {}
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def command(self, collection: str, command: str, seconds: float, documents: int):
+        with self._lock:
+            entry = self.commands.setdefault((collection, command), [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += documents
+
+    def phase(self, name: str, seconds: float):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def summary(self) -> str:
+        with self._lock:
+            commands = sorted(self.commands.items(), key=lambda item: -item[1][1])
+            phases = dict(self.phases)
+        mongo = sum(seconds for _, seconds, _ in (entry for _, entry in commands))
+        parts = [f"mongo {mongo * 1000:.1f}ms in {sum(int(entry[0]) for _, entry in commands)} commands"]
+        parts += [f"{collection}.{command} x{count} {seconds * 1000:.1f}ms docs={documents}"
+                  for (collection, command), (count, seconds, documents) in commands]
+        parts += [f"{name} {seconds * 1000:.1f}ms" for name, seconds in sorted(phases.items())]
+        return "; ".join(parts)
+
+
+# Motor copia el contexto al ejecutar en su pool de hilos, así que los listeners lo ven
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a non-Mongo phase of the current request (`serialization`, `upload_io`, ...)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        PHASE_DURATION.observe(elapsed, phase=name)
+        stats = _current.get()
+        if stats is not None:
+            stats.phase(name, elapsed)
+
+
+def _documents(command: str, reply) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if command == "findAndModify":
+        return 1 if reply.get("value") else 0
+    if command in ("insert", "update", "delete", "count"):
+        return int(reply.get("n", 0))
+    return 0
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-collection/per-command timings; pass in `event_listeners` when creating the client."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[object, int], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def _finish(self, event) -> Tuple[str, float]:
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        seconds = event.duration_micros / 1e6
+        MONGO_DURATION.observe(seconds, collection=collection, command=event.command_name)
+        return collection, seconds
+
+    def succeeded(self, event):
+        collection, seconds = self._finish(event)
+        documents = _documents(event.command_name, event.reply)
+        if documents:
+            MONGO_DOCUMENTS.inc(documents, collection=collection, command=event.command_name)
+        stats = _current.get()
+        if stats is not None:
+            stats.command(collection, event.command_name, seconds, documents)
+
+    def failed(self, event):
+        collection, seconds = self._finish(event)
+        MONGO_FAILURES.inc(collection=collection, command=event.command_name)
+        stats = _current.get()
+        if stats is not None:
+            stats.command(collection, event.command_name, seconds, 0)
+
+
+def route_template(scope) -> str:
+    """The matched route's path template, so ids do not explode label cardinality"""
+    app = scope.get("app")
+    partial = None
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            # Ruta correcta con otro método (p. ej. preflight OPTIONS de CORS)
+            partial = route.path
+    return partial or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency histogram, in-flight gauge and slow-request log"""
+
+    def __init__(self, app, slow_request_seconds: float = SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = route_template(scope)
+        status = 500
+        event_stream = False
+
+        async def send_with_status(message):
+            nonlocal status, event_stream
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                event_stream = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                   for name, value in message.get("headers", ()))
+            await send(message)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        HTTP_IN_FLIGHT.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current.reset(token)
+            HTTP_IN_FLIGHT.dec(method=method, route=route)
+            HTTP_DURATION.observe(elapsed, method=method, route=route, status=status)
+            # Los flujos SSE duran lo que dure la conexión: no son peticiones lentas
+            if elapsed >= self.slow_request_seconds and not event_stream:
+                logger.warning("Slow request %s %s -> %s in %.1fms: %s", method, scope["path"], status,
+                               elapsed * 1000, stats.summary())
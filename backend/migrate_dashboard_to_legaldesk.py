@@ -1,36 +1,25 @@
 import os
 import asyncio
-from typing import List
+import json
 from motor.motor_asyncio import AsyncIOMotorClient
 
+import migration_engine
+
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
 SOURCE_DB = os.getenv("SOURCE_DB", "dashboard_etica")
 TARGET_DB = os.getenv("TARGET_DB", "legaldesk")
+# migrate | dry-run | verify
+MODE = os.getenv("MODE", "migrate")
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", str(migration_engine.DEFAULT_BATCH_SIZE)))
+CONCURRENCY = int(os.getenv("CONCURRENCY", "3"))
+# RESUME=0 ignora checkpoints previos y empieza desde el principio
+RESUME = os.getenv("RESUME", "1") not in ("0", "false")
+
 
-COLLECTIONS: List[str] = [
-    "clients",
-    "cases",
-    "documents",
-    "appointments",
-    "case_updates",
-]
+def print_progress(name: str, migrated: int, elapsed: float):
+    rate = migrated / elapsed if elapsed > 0 else 0
+    print(f"  [{name}] {migrated} docs ({rate:,.0f} docs/s)")
 
-async def migrate_collection(src_col, tgt_col, key_fields: List[str]):
-    migrated = 0
-    # Use a batched cursor to avoid loading all docs in memory
-    async for doc in src_col.find({}):
-        # Build an upsert filter using first present key_field, fallback to _id
-        filter_doc = None
-        for k in key_fields:
-            if k in doc:
-                filter_doc = {k: doc[k]}
-                break
-        if filter_doc is None:
-            filter_doc = {"_id": doc.get("_id")}
-        # Upsert complete document
-        await tgt_col.replace_one(filter_doc, doc, upsert=True)
-        migrated += 1
-    return migrated
 
 async def main():
     print(f"Connecting to MongoDB at {MONGO_URL}")
@@ -38,27 +27,25 @@ async def main():
     src = client[SOURCE_DB]
     tgt = client[TARGET_DB]
 
-    print(f"Migrating from '{SOURCE_DB}' to '{TARGET_DB}'...")
-
-    total_migrated = 0
-    for name in COLLECTIONS:
-        src_col = src[name]
-        tgt_col = tgt[name]
-        src_count = await src_col.count_documents({})
-        print(f"- Collection '{name}': {src_count} documents to process")
-        # Prefer business id fields when present
-        key_fields = ["id"]  # our models include 'id' field
-        migrated = await migrate_collection(src_col, tgt_col, key_fields)
-        tgt_count = await tgt_col.count_documents({})
-        print(f"  Migrated: {migrated} docs | Target count now: {tgt_count}")
-        total_migrated += migrated
-
-    print(f"Done. Total migrated documents: {total_migrated}")
-    # Optional: show per-collection counts in target
-    print("Target database counts:")
-    for name in COLLECTIONS:
-        tgt_count = await tgt[name].count_documents({})
-        print(f"  {name}: {tgt_count}")
+    print(f"{MODE} from '{SOURCE_DB}' to '{TARGET_DB}' (batch size {BATCH_SIZE}, concurrency {CONCURRENCY})...")
+    summary = await migration_engine.run(
+        src,
+        tgt,
+        mode=MODE,
+        batch_size=BATCH_SIZE,
+        concurrency=CONCURRENCY,
+        resume=RESUME,
+        on_progress=print_progress,
+    )
+
+    for name, result in summary["collections"].items():
+        print(f"- {name}: {json.dumps(result)}")
+    if MODE == "migrate":
+        print(f"Done. Total migrated documents: {summary['migrated']} "
+              f"in {summary['seconds']}s ({summary['docs_per_sec']} docs/s)")
+    elif MODE == "verify":
+        print("Source and target match." if summary["match"] else "MISMATCH between source and target.")
+    client.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
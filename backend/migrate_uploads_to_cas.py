@@ -0,0 +1,114 @@
+"""Move existing uploads/ files to content-addressed storage.
+
+Every document without a `blob_id` is hashed; identical files collapse into
+a single `<sha256>.<ext>` blob and the duplicates are deleted. A document's
+original file is only removed once the document points at its blob, and
+reference counts are recomputed from the documents at the end, so the
+script can be re-run safely after an interruption.
+
+    MONGO_URL=... python migrate_uploads_to_cas.py            # migrate
+    MONGO_URL=... DRY_RUN=1 python migrate_uploads_to_cas.py  # only report
+"""
+import os
+import asyncio
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from document_storage import BLOBS_COLLECTION, blob_filename, hash_file, acquire_blob, copy_blob, recount_references
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "legaldesk")
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", Path(__file__).parent / "uploads"))
+DRY_RUN = os.getenv("DRY_RUN", "") not in ("", "0", "false")
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+async def point_at_blob(db, document_id: str, filename: str, sha256: str):
+    await db.documents.update_one(
+        {"id": document_id},
+        {"$set": {
+            "filename": filename,
+            "file_path": str(UPLOADS_DIR / filename),
+            "sha256": sha256,
+            "blob_id": sha256,
+        }},
+    )
+
+
+async def link_placed_blob(db, doc: dict) -> bool:
+    """Point a document whose file is gone at the blob holding its recorded hash, if that blob is on disk"""
+    if not doc.get("sha256"):
+        return False
+    blob = await db[BLOBS_COLLECTION].find_one({"_id": doc["sha256"]}, {"filename": 1})
+    if not blob or not await asyncio.to_thread((UPLOADS_DIR / blob["filename"]).exists):
+        return False
+    await point_at_blob(db, doc["id"], blob["filename"], doc["sha256"])
+    return True
+
+
+async def main():
+    print(f"Connecting to MongoDB at {MONGO_URL}")
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+    blobs = db[BLOBS_COLLECTION]
+
+    print(f"Migrating '{UPLOADS_DIR}' to content-addressed storage{' (dry run)' if DRY_RUN else ''}...")
+
+    migrated = missing = 0
+    reclaimed = 0
+    seen_hashes = set()
+    cursor = db.documents.find(
+        {"blob_id": None},
+        {"_id": 0, "id": 1, "filename": 1, "sha256": 1},
+    )
+    async for doc in cursor:
+        path = UPLOADS_DIR / doc["filename"]
+        if not await asyncio.to_thread(path.exists):
+            # Una versión anterior del script movía el archivo antes de actualizar el documento
+            if not DRY_RUN and await link_placed_blob(db, doc):
+                print(f"  [FIX] document {doc['id']} linked to its already placed blob")
+                migrated += 1
+                continue
+            print(f"  [WARN] missing file for document {doc['id']}: {path.name}")
+            missing += 1
+            continue
+
+        size, sha256 = await asyncio.to_thread(hash_file, path)
+        extension = doc["filename"].split('.')[-1] if '.' in doc["filename"] else ''
+
+        if DRY_RUN:
+            if sha256 in seen_hashes or await blobs.count_documents({"_id": sha256}, limit=1):
+                reclaimed += size
+            seen_hashes.add(sha256)
+            migrated += 1
+            continue
+
+        blob = await acquire_blob(blobs, sha256, blob_filename(sha256, extension), size)
+        destination = UPLOADS_DIR / blob["filename"]
+        if await asyncio.to_thread(destination.exists):
+            reclaimed += size
+        # Copia (o enlace) primero, documento después y original al final: un corte deja el original en su sitio
+        await copy_blob(path, destination)
+        await point_at_blob(db, doc["id"], blob["filename"], sha256)
+        if path != destination:
+            await asyncio.to_thread(path.unlink, missing_ok=True)
+        migrated += 1
+
+    if not DRY_RUN:
+        fixed = await recount_references(db)
+        print(f"Reference counts recomputed for {len(fixed)} blobs")
+
+    verb = "Would reclaim" if DRY_RUN else "Reclaimed"
+    print(f"Done. {migrated} documents processed, {missing} missing files. {verb} {format_bytes(reclaimed)}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
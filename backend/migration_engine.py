@@ -0,0 +1,193 @@
+import time
+import asyncio
+import hashlib
+import inspect
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import bson
+from pymongo import ReplaceOne
+
+from collection_versions import bump_versions
+
+COLLECTIONS: List[str] = [
+    "clients",
+    "cases",
+    "documents",
+    "appointments",
+    "case_updates",
+]
+
+# Progreso por colección, guardado en la base destino para poder reanudar
+CHECKPOINTS_COLLECTION = "migration_checkpoints"
+DEFAULT_BATCH_SIZE = 1000
+
+ProgressCallback = Optional[Callable[[str, int, float], Any]]
+
+
+def _checkpoint_id(src_db, name: str) -> str:
+    return f"{src_db.name}:{name}"
+
+
+def _replace_op(doc: dict, key_fields: List[str]) -> ReplaceOne:
+    # Prefer business id fields when present, fallback to _id
+    for k in key_fields:
+        if k in doc:
+            return ReplaceOne({k: doc[k]}, doc, upsert=True)
+    return ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+
+
+async def migrate_collection(
+    src_db,
+    tgt_db,
+    name: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    resume: bool = True,
+    key_fields: Optional[List[str]] = None,
+    on_progress: ProgressCallback = None,
+) -> Dict[str, Any]:
+    """Copy one collection with unordered bulk upserts, checkpointing by `_id`.
+
+    Documents are read in `_id` order; after every flushed batch the last
+    `_id` is saved, so an interrupted run resumes after it. A finished run
+    marks the checkpoint completed and the next run starts from scratch.
+    """
+    key_fields = key_fields or ["id"]
+    checkpoints = tgt_db[CHECKPOINTS_COLLECTION]
+    checkpoint_id = _checkpoint_id(src_db, name)
+
+    query: Dict[str, Any] = {}
+    checkpoint = await checkpoints.find_one({"_id": checkpoint_id}) if resume else None
+    resumed_from = None
+    if checkpoint and not checkpoint.get("completed") and checkpoint.get("last_id") is not None:
+        resumed_from = checkpoint["last_id"]
+        query = {"_id": {"$gt": resumed_from}}
+
+    started = time.perf_counter()
+    migrated = 0
+    ops: List[ReplaceOne] = []
+    last_id = resumed_from
+
+    async def flush():
+        nonlocal ops, migrated
+        if not ops:
+            return
+        await tgt_db[name].bulk_write(ops, ordered=False)
+        migrated += len(ops)
+        ops = []
+        await checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "completed": False, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        if on_progress:
+            await _maybe_await(on_progress(name, migrated, time.perf_counter() - started))
+
+    async for doc in src_db[name].find(query).sort("_id", 1).batch_size(batch_size):
+        ops.append(_replace_op(doc, key_fields))
+        last_id = doc["_id"]
+        if len(ops) >= batch_size:
+            await flush()
+    await flush()
+
+    await checkpoints.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"completed": True, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
+    elapsed = time.perf_counter() - started
+    return {
+        "migrated": migrated,
+        "resumed": resumed_from is not None,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(migrated / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        await value
+
+
+async def dry_run_collection(src_db, tgt_db, name: str, resume: bool = True, **_) -> Dict[str, Any]:
+    """Report what a migration would copy, without writing anything."""
+    query: Dict[str, Any] = {}
+    checkpoint = await tgt_db[CHECKPOINTS_COLLECTION].find_one({"_id": _checkpoint_id(src_db, name)}) if resume else None
+    if checkpoint and not checkpoint.get("completed") and checkpoint.get("last_id") is not None:
+        query = {"_id": {"$gt": checkpoint["last_id"]}}
+    source_count, pending = await asyncio.gather(
+        src_db[name].count_documents({}),
+        src_db[name].count_documents(query),
+    )
+    return {"source_count": source_count, "pending": pending, "resumed": bool(query)}
+
+
+async def collection_digest(collection, batch_size: int = DEFAULT_BATCH_SIZE) -> str:
+    """SHA-256 over every document's BSON in `_id` order."""
+    digest = hashlib.sha256()
+    async for doc in collection.find({}).sort("_id", 1).batch_size(batch_size):
+        digest.update(bson.encode(doc))
+    return digest.hexdigest()
+
+
+async def verify_collection(src_db, tgt_db, name: str, batch_size: int = DEFAULT_BATCH_SIZE, **_) -> Dict[str, Any]:
+    """Compare counts and content hashes between source and target."""
+    source_count, target_count, source_hash, target_hash = await asyncio.gather(
+        src_db[name].count_documents({}),
+        tgt_db[name].count_documents({}),
+        collection_digest(src_db[name], batch_size),
+        collection_digest(tgt_db[name], batch_size),
+    )
+    return {
+        "source_count": source_count,
+        "target_count": target_count,
+        "source_hash": source_hash,
+        "target_hash": target_hash,
+        "match": source_count == target_count and source_hash == target_hash,
+    }
+
+
+MODES = {
+    "migrate": migrate_collection,
+    "dry-run": dry_run_collection,
+    "verify": verify_collection,
+}
+
+
+async def run(
+    src_db,
+    tgt_db,
+    mode: str = "migrate",
+    collections: Optional[List[str]] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    concurrency: int = 3,
+    resume: bool = True,
+    on_progress: ProgressCallback = None,
+) -> Dict[str, Any]:
+    """Run `mode` over several collections concurrently (at most `concurrency` at once)."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown migration mode: {mode}")
+    handler = MODES[mode]
+    collections = collections or COLLECTIONS
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(name):
+        async with semaphore:
+            kwargs = {"batch_size": batch_size, "resume": resume}
+            if mode == "migrate":
+                kwargs["on_progress"] = on_progress
+            return name, await handler(src_db, tgt_db, name, **kwargs)
+
+    started = time.perf_counter()
+    results = dict(await asyncio.gather(*(one(name) for name in collections)))
+    elapsed = time.perf_counter() - started
+
+    summary: Dict[str, Any] = {"mode": mode, "collections": results, "seconds": round(elapsed, 3)}
+    if mode == "migrate":
+        total = sum(r["migrated"] for r in results.values())
+        await bump_versions(tgt_db, *collections)
+        summary["migrated"] = total
+        summary["docs_per_sec"] = round(total / elapsed, 1) if elapsed > 0 else None
+    elif mode == "verify":
+        summary["match"] = all(r["match"] for r in results.values())
+    return summary
@@ -0,0 +1,243 @@
+"""Find and reclaim records and files left behind by non-cascading deletes.
+
+    MONGO_URL=... DRY_RUN=1 python orphan_sweeper.py   # only report
+    MONGO_URL=... python orphan_sweeper.py             # delete orphans
+
+Three passes, each safe to re-run:
+  1. child records whose client_id / case_id points at a missing parent;
+  2. blobs whose ref_count disagrees with the documents that use them
+     (zero-reference blobs are deleted together with their file);
+  3. files in uploads/ that no document or blob references.
+
+Anything touched within GRACE_SECONDS is skipped so in-flight uploads are
+never mistaken for leaks.
+"""
+import os
+import asyncio
+import inspect
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from cascade_delete import delete_documents
+from collection_versions import bump_versions
+from document_storage import BLOBS_COLLECTION, remove_blob
+from temporal import date_range
+from time_ledger import TIME_ENTRIES, delete_time_entries
+
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+DB_NAME = os.getenv("DB_NAME", "legaldesk")
+UPLOADS_DIR = Path(os.getenv("UPLOADS_DIR", Path(__file__).parent / "uploads"))
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "1000"))
+GRACE_SECONDS = int(os.getenv("GRACE_SECONDS", "3600"))
+DRY_RUN = os.getenv("DRY_RUN", "") not in ("", "0", "false")
+
+# Hijo -> [(campo, colección padre)]. Los casos van primero: al borrar un
+# caso huérfano sus dependientes quedan huérfanos y caen en la misma pasada.
+PARENT_KEYS = [
+    ("cases", [("client_id", "clients")]),
+    ("documents", [("client_id", "clients"), ("case_id", "cases")]),
+    ("appointments", [("client_id", "clients"), ("case_id", "cases")]),
+    ("case_updates", [("client_id", "clients"), ("case_id", "cases")]),
+    (TIME_ENTRIES, [("client_id", "clients"), ("case_id", "cases")]),
+]
+KEEP_FILES = {".gitkeep"}
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+async def _report(on_progress, message: str):
+    if on_progress:
+        result = on_progress(message)
+        if inspect.isawaitable(result):
+            await result
+
+
+async def _existing_ids(collection, ids: List[str]) -> set:
+    cursor = collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})
+    return {doc["id"] async for doc in cursor}
+
+
+async def find_orphans(db, child: str, keys, batch_size: int) -> List[str]:
+    """Return ids of `child` records whose parent no longer exists."""
+    projection = {"_id": 0, "id": 1, **{field: 1 for field, _ in keys}}
+    orphans = []
+    batch = []
+
+    async def check(batch):
+        for field, parent in keys:
+            parent_ids = list({doc[field] for doc in batch if doc.get(field)})
+            if not parent_ids:
+                continue
+            existing = await _existing_ids(db[parent], parent_ids)
+            orphans.extend(doc["id"] for doc in batch if doc.get(field) and doc[field] not in existing)
+
+    async for doc in db[child].find({}, projection).batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await check(batch)
+            batch = []
+    if batch:
+        await check(batch)
+    return list(dict.fromkeys(orphans))
+
+
+async def sweep_records(db, uploads_dir: Path, dry_run: bool, batch_size: int, on_progress=None) -> Dict[str, int]:
+    counts = {}
+    for child, keys in PARENT_KEYS:
+        orphans = await find_orphans(db, child, keys, batch_size)
+        if not dry_run:
+            for start in range(0, len(orphans), batch_size):
+                chunk = {"id": {"$in": orphans[start:start + batch_size]}}
+                if child == "documents":
+                    await delete_documents(db, uploads_dir, chunk, batch_size)
+                elif child == TIME_ENTRIES:
+                    await delete_time_entries(db, chunk, batch_size)
+                else:
+                    await db[child].delete_many(chunk)
+        counts[child] = len(orphans)
+        await _report(on_progress, f"{child}: {len(orphans)} orphaned")
+    return counts
+
+
+async def _reference_counts(db, blob_ids: List[str]) -> Dict[str, int]:
+    counts = {blob_id: 0 for blob_id in blob_ids}
+    async for row in db.documents.aggregate([
+        {"$match": {"blob_id": {"$in": blob_ids}}},
+        {"$group": {"_id": "$blob_id", "refs": {"$sum": 1}}},
+    ]):
+        counts[row["_id"]] = row["refs"]
+    return counts
+
+
+async def sweep_blobs(db, uploads_dir: Path, dry_run: bool, batch_size: int, cutoff: datetime) -> Dict[str, int]:
+    """Fix drifted ref_counts and drop blobs nothing references.
+
+    Every write is conditional on the ref_count that was read, so a
+    concurrent upload or delete makes the sweeper skip that blob.
+    """
+    blobs = db[BLOBS_COLLECTION]
+    fixed = removed = reclaimed = 0
+    query = {"$or": [date_range("acquired_at", lt=cutoff),
+                     {"$and": [{"acquired_at": None}, date_range("created_at", lt=cutoff)]}]}
+    cursor = blobs.find(query, {"_id": 1, "ref_count": 1, "filename": 1, "size": 1}).batch_size(batch_size)
+    batch = []
+
+    async def check(batch):
+        nonlocal fixed, removed, reclaimed
+        refs = await _reference_counts(db, [blob["_id"] for blob in batch])
+        for blob in batch:
+            actual = refs[blob["_id"]]
+            # Un blob sin referencias se borra aunque su ref_count ya diga 0
+            if actual == blob.get("ref_count") and actual > 0:
+                continue
+            guard = {"_id": blob["_id"], "ref_count": blob.get("ref_count")}
+            if actual == 0:
+                if not dry_run:
+                    if not await remove_blob(blobs, guard, uploads_dir, blob["filename"]):
+                        continue
+                removed += 1
+                reclaimed += blob.get("size", 0)
+            else:
+                if not dry_run:
+                    result = await blobs.update_one(guard, {"$set": {"ref_count": actual}})
+                    if not result.modified_count:
+                        continue
+                fixed += 1
+
+    async for blob in cursor:
+        batch.append(blob)
+        if len(batch) >= batch_size:
+            await check(batch)
+            batch = []
+    if batch:
+        await check(batch)
+    return {"fixed": fixed, "removed": removed, "bytes": reclaimed}
+
+
+def _stale_files(uploads_dir: Path, cutoff_ts: float) -> List[Tuple[str, int]]:
+    """List `(name, size)` of files older than the cutoff. Blocking; run it in a thread."""
+    if not uploads_dir.is_dir():
+        return []
+    stale = []
+    with os.scandir(uploads_dir) as entries:
+        for entry in entries:
+            if entry.name in KEEP_FILES or not entry.is_file():
+                continue
+            stat = entry.stat()
+            if stat.st_mtime < cutoff_ts:
+                stale.append((entry.name, stat.st_size))
+    return stale
+
+
+def _remove_files(uploads_dir: Path, names: List[str]):
+    for name in names:
+        (uploads_dir / name).unlink(missing_ok=True)
+
+
+async def sweep_files(db, uploads_dir: Path, dry_run: bool, batch_size: int, cutoff_ts: float) -> Dict[str, int]:
+    """Delete files in uploads/ that neither a document nor a blob references."""
+    stale = await asyncio.to_thread(_stale_files, uploads_dir, cutoff_ts)
+    removed = reclaimed = 0
+    for start in range(0, len(stale), batch_size):
+        chunk = stale[start:start + batch_size]
+        names = [name for name, _ in chunk]
+        referenced = {doc["filename"] async for doc in db.documents.find(
+            {"filename": {"$in": names}}, {"_id": 0, "filename": 1})}
+        referenced.update([blob["filename"] async for blob in db[BLOBS_COLLECTION].find(
+            {"filename": {"$in": names}}, {"_id": 0, "filename": 1})])
+        unreferenced = [(name, size) for name, size in chunk if name not in referenced]
+        if not dry_run:
+            await asyncio.to_thread(_remove_files, uploads_dir, [name for name, _ in unreferenced])
+        removed += len(unreferenced)
+        reclaimed += sum(size for _, size in unreferenced)
+    return {"removed": removed, "bytes": reclaimed}
+
+
+async def sweep(db, uploads_dir: Path, dry_run: bool = False, batch_size: int = BATCH_SIZE,
+                grace_seconds: int = GRACE_SECONDS,
+                on_progress: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+    """Run every pass and return what was (or would be) reclaimed."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    records = await sweep_records(db, uploads_dir, dry_run, batch_size, on_progress)
+    blobs = await sweep_blobs(db, uploads_dir, dry_run, batch_size, cutoff)
+    await _report(on_progress, f"blobs: {blobs['removed']} unreferenced, {blobs['fixed']} recounted")
+    files = await sweep_files(db, uploads_dir, dry_run, batch_size, cutoff.timestamp())
+    await _report(on_progress, f"files: {files['removed']} unreferenced")
+    if not dry_run:
+        await bump_versions(db, *(name for name, count in records.items() if count))
+    return {
+        "dry_run": dry_run,
+        "records": records,
+        "blobs": blobs,
+        "files": files,
+        "bytes_reclaimed": blobs["bytes"] + files["bytes"],
+    }
+
+
+async def main():
+    print(f"Connecting to MongoDB at {MONGO_URL}")
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    print(f"Sweeping orphans in '{DB_NAME}' and '{UPLOADS_DIR}'{' (dry run)' if DRY_RUN else ''}...")
+    started = time.perf_counter()
+    summary = await sweep(db, UPLOADS_DIR, DRY_RUN, BATCH_SIZE, GRACE_SECONDS, on_progress=lambda m: print(f"  {m}"))
+
+    elapsed = time.perf_counter() - started
+    verb = "Would reclaim" if DRY_RUN else "Reclaimed"
+    print(f"Done in {elapsed:.1f}s. {verb} {format_bytes(summary['bytes_reclaimed'])}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,276 @@
+"""Live portal events: server-sent events per client, fed by an in-process broker.
+
+Write handlers publish small invalidation hints (`{"action", "id", "case_id"}`)
+for case updates and appointments; the portal refetches its dashboard, so
+nothing the client is not allowed to read travels over the stream.
+
+With several workers, set PORTAL_EVENTS_SOURCE=changestream: each worker then
+feeds its broker from a MongoDB change stream (replica set required) instead
+of from its own handlers, so every worker sees every write.
+
+    python portal_events.py        # check the change-stream source against MONGO_URL
+"""
+import os
+import sys
+import json
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# "local": los handlers publican en el broker del proceso; "changestream": lo alimenta Mongo
+PORTAL_EVENTS_SOURCE = os.environ.get("PORTAL_EVENTS_SOURCE", "local")
+# Conexiones SSE abiertas como máximo por proceso y por cliente
+MAX_CONNECTIONS = int(os.environ.get("PORTAL_EVENTS_MAX_CONNECTIONS", "1000"))
+MAX_CONNECTIONS_PER_CLIENT = int(os.environ.get("PORTAL_EVENTS_MAX_PER_CLIENT", "5"))
+# Eventos pendientes por conexión antes de descartarlos y pedir un "resync"
+BUFFER_SIZE = int(os.environ.get("PORTAL_EVENTS_BUFFER", "32"))
+# Comentario SSE periódico para que proxies y balanceadores no corten la conexión
+HEARTBEAT_SECONDS = float(os.environ.get("PORTAL_EVENTS_HEARTBEAT", "15"))
+# Espera sugerida al navegador antes de reconectar
+RETRY_MS = 5000
+
+# Colecciones observadas y nombre del evento SSE que genera cada una
+EVENT_NAMES = {"case_updates": "case_update", "appointments": "appointment"}
+_ACTIONS = {"insert": "created", "update": "updated", "replace": "updated", "delete": "deleted"}
+_ROUTING_FIELDS = ("id", "client_id", "case_id", "is_visible_to_client")
+# Código de Mongo cuando el resume token ya no está en el oplog
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+_CLOSED = object()
+
+
+class ConnectionLimitReached(Exception):
+    pass
+
+
+class Subscription:
+    """One open event stream; holds at most BUFFER_SIZE pending events."""
+
+    def __init__(self, broker: "EventBroker", client_id: str, buffer_size: int):
+        self.broker = broker
+        self.client_id = client_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = 0
+        self.closed = False
+
+    def push(self, item):
+        """Queue an event; a slow reader loses its backlog and gets a single `resync`"""
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(("resync", {"dropped": self.dropped}))
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker._remove(self)
+
+
+class EventBroker:
+    """In-process pub/sub keyed by client_id, with a connection cap."""
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS,
+                 max_per_client: int = MAX_CONNECTIONS_PER_CLIENT, buffer_size: int = BUFFER_SIZE):
+        self.max_connections = max_connections
+        self.max_per_client = max_per_client
+        self.buffer_size = buffer_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.connections = 0
+
+    def subscribe(self, client_id: str) -> Subscription:
+        if self.connections >= self.max_connections:
+            raise ConnectionLimitReached("Too many open event streams")
+        subscribers = self._subscribers.setdefault(client_id, set())
+        if len(subscribers) >= self.max_per_client:
+            raise ConnectionLimitReached("Too many open event streams for this client")
+        subscription = Subscription(self, client_id, self.buffer_size)
+        subscribers.add(subscription)
+        self.connections += 1
+        return subscription
+
+    def _remove(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.client_id)
+        if subscribers and subscription in subscribers:
+            subscribers.discard(subscription)
+            self.connections -= 1
+            if not subscribers:
+                del self._subscribers[subscription.client_id]
+
+    def publish(self, client_id: str, event: str, data: Dict[str, Any]) -> int:
+        """Deliver an event to every open stream of the client; returns how many got it"""
+        subscribers = self._subscribers.get(client_id, ())
+        for subscription in subscribers:
+            subscription.push((event, data))
+        return len(subscribers)
+
+    def resync_all(self):
+        """Ask every open stream to refetch, e.g. after events may have been missed"""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.push(("resync", {}))
+
+    def close(self):
+        """End every open stream (shutdown)"""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.queue.put_nowait(_CLOSED)
+                subscription.close()
+
+
+def format_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+async def stream(subscription: Subscription, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[bytes]:
+    """Render a subscription as a `text/event-stream` body"""
+    try:
+        yield f"retry: {RETRY_MS}\n".encode() + format_event("ready", {"client_id": subscription.client_id})
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield b": ping\n\n"
+                continue
+            if item is _CLOSED:
+                return
+            yield format_event(*item)
+    finally:
+        subscription.close()
+
+
+def routing(collection: str, action: str, doc: Optional[Dict[str, Any]]):
+    """Return `(client_id, event, data)` for a written document, or None if the portal does not show it"""
+    if not doc or not doc.get("client_id") or collection not in EVENT_NAMES:
+        return None
+    if collection == "case_updates" and action == "created" and not doc.get("is_visible_to_client", True):
+        return None
+    return doc["client_id"], EVENT_NAMES[collection], {"action": action, "id": doc.get("id"),
+                                                       "case_id": doc.get("case_id")}
+
+
+class ChangeStreamSource:
+    """Feed a broker from a database change stream on the watched collections.
+
+    Needs a replica set (a single-node one is enough). Deletes are routed
+    through pre-images, so they are only pushed for collections created or
+    modified with `changeStreamPreAndPostImages` (MongoDB 6.0+); otherwise
+    the portal catches up on its next event or reload.
+    """
+
+    def __init__(self, db, broker: EventBroker, max_backoff: float = 30.0):
+        self.db = db
+        self.broker = broker
+        self.max_backoff = max_backoff
+        self.resume_token = None
+        self._task: Optional[asyncio.Task] = None
+        self.ready = asyncio.Event()
+
+    @staticmethod
+    def pipeline():
+        keep = {f"{side}.{field}": 1 for side in ("fullDocument", "fullDocumentBeforeChange")
+                for field in _ROUTING_FIELDS}
+        return [
+            {"$match": {"ns.coll": {"$in": list(EVENT_NAMES)}, "operationType": {"$in": list(_ACTIONS)}}},
+            {"$project": {"operationType": 1, "ns": 1, **keep}},
+        ]
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def dispatch(self, change: Dict[str, Any]):
+        action = _ACTIONS[change["operationType"]]
+        doc = change.get("fullDocument") or change.get("fullDocumentBeforeChange")
+        routed = routing(change["ns"]["coll"], action, doc)
+        if routed:
+            self.broker.publish(*routed)
+
+    async def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                async with self.db.watch(self.pipeline(), full_document="updateLookup",
+                                         full_document_before_change="whenAvailable",
+                                         resume_after=self.resume_token) as changes:
+                    self.ready.set()
+                    delay = 1.0
+                    async for change in changes:
+                        self.dispatch(change)
+                        self.resume_token = changes.resume_token
+            except OperationFailure as e:
+                if e.code == _CHANGE_STREAM_HISTORY_LOST:
+                    # El token ya no está en el oplog: empezar de nuevo y refrescar a todos
+                    self.resume_token = None
+                    self.broker.resync_all()
+                logger.warning("Portal change stream failed: %s", e)
+            except PyMongoError as e:
+                logger.warning("Portal change stream interrupted: %s", e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+
+async def main():
+    """Round trip through a change stream on a scratch database of the configured server"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/?replicaSet=rs0")
+    timeout = float(os.getenv("TIMEOUT", "10"))
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[f"portal_events_check_{uuid.uuid4().hex[:8]}"]
+    broker = EventBroker()
+    source = ChangeStreamSource(db, broker)
+    subscription = broker.subscribe("check-client")
+    try:
+        source.start()
+        await asyncio.wait_for(source.ready.wait(), timeout)
+        now = datetime.now(timezone.utc)
+        await db.case_updates.insert_one({"id": "hidden", "client_id": "check-client", "case_id": "c1",
+                                          "is_visible_to_client": False, "created_at": now})
+        await db.case_updates.insert_one({"id": "visible", "client_id": "check-client", "case_id": "c1",
+                                          "is_visible_to_client": True, "created_at": now})
+        await db.appointments.insert_one({"id": "a1", "client_id": "check-client", "case_id": "c1"})
+        await db.appointments.update_one({"id": "a1"}, {"$set": {"is_completed": True}})
+        received = []
+        for _ in range(3):
+            received.append(await asyncio.wait_for(subscription.queue.get(), timeout))
+        for event, data in received:
+            print(f"{event:<12} {data}")
+        expected = [("case_update", "visible", "created"), ("appointment", "a1", "created"),
+                    ("appointment", "a1", "updated")]
+        if [(event, data["id"], data["action"]) for event, data in received] != expected:
+            print("Unexpected events")
+            return 1
+        print("Change-stream source OK")
+        return 0
+    except asyncio.TimeoutError:
+        print("Timed out waiting for change events; is MONGO_URL a replica set?")
+        return 1
+    finally:
+        subscription.close()
+        await source.stop()
+        await client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
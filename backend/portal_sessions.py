@@ -0,0 +1,219 @@
+"""Signed, stateless sessions for the client portal.
+
+Login issues `<payload>.<signature>`: the URL-safe base64 of a small JSON
+payload (client id, session id, issue and expiry times) and its HMAC-SHA256
+under PORTAL_SESSION_SECRET. Checking a token is one HMAC, a constant-time
+compare and a dict lookup, with no database access, so portal requests pay
+microseconds for authentication.
+
+EventSource cannot send headers, so the live stream takes a token in its
+URL, where access logs keep it. That one is a stream token: signed the same
+way but marked for that sole purpose, tied to the session it came from and
+valid for PORTAL_STREAM_TOKEN_TTL seconds, so a logged URL is useless soon
+after and never works as a session.
+
+Logging out revokes one session, deleting a client revokes all of theirs.
+Revocations live in an in-memory list whose entries expire together with
+the tokens they cancel. They are also written to `portal_revocations`
+(TTL-indexed), and each process pulls new ones every
+PORTAL_REVOCATION_SYNC_SECONDS, so with several workers a revoked token
+stops working everywhere within that delay.
+"""
+import os
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import logging
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REVOCATIONS_COLLECTION = "portal_revocations"
+# Vida de un token de sesión del portal
+SESSION_TTL_SECONDS = int(os.environ.get("PORTAL_SESSION_TTL", str(8 * 3600)))
+# Vida de un token de flujo SSE: solo tiene que durar hasta abrir la conexión
+STREAM_TOKEN_TTL_SECONDS = int(os.environ.get("PORTAL_STREAM_TOKEN_TTL", "60"))
+STREAM_PURPOSE = "stream"
+REVOCATION_SYNC_SECONDS = float(os.environ.get("PORTAL_REVOCATION_SYNC_SECONDS", "15"))
+# Margen al leer revocaciones nuevas: absorbe relojes desfasados entre workers
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class InvalidSession(Exception):
+    """Token missing, malformed, badly signed, expired or revoked"""
+
+
+@dataclass(frozen=True)
+class PortalSession:
+    client_id: str
+    session_id: str
+    issued_at: int
+    expires_at: int
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _load_secret() -> bytes:
+    secret = os.environ.get("PORTAL_SESSION_SECRET")
+    if secret:
+        return secret.encode()
+    logger.warning("PORTAL_SESSION_SECRET is not set: portal sessions will not survive a restart "
+                   "nor be shared between workers")
+    return secrets.token_bytes(32)
+
+
+class RevocationList:
+    """Revoked sessions and clients, each forgotten once the tokens it cancels have expired"""
+
+    def __init__(self):
+        self._sessions: Dict[str, int] = {}
+        # cliente -> (tokens emitidos antes de este instante no valen, caducidad de la entrada)
+        self._clients: Dict[str, Tuple[int, int]] = {}
+        self._next_prune = 0.0
+
+    def revoke_session(self, session_id: str, expires_at: int):
+        self._sessions[session_id] = expires_at
+
+    def revoke_client(self, client_id: str, issued_before: int, expires_at: int):
+        previous = self._clients.get(client_id)
+        if previous is None or previous[0] < issued_before:
+            self._clients[client_id] = (issued_before, expires_at)
+
+    def is_revoked(self, session: PortalSession) -> bool:
+        if session.session_id in self._sessions:
+            return True
+        revoked = self._clients.get(session.client_id)
+        return revoked is not None and session.issued_at <= revoked[0]
+
+    def prune(self, now: float):
+        if now < self._next_prune:
+            return
+        self._next_prune = now + 60
+        self._sessions = {sid: exp for sid, exp in self._sessions.items() if exp > now}
+        self._clients = {cid: entry for cid, entry in self._clients.items() if entry[1] > now}
+
+    def __len__(self) -> int:
+        return len(self._sessions) + len(self._clients)
+
+
+class SessionManager:
+    """Issues and checks portal tokens; revocations are shared through Mongo"""
+
+    def __init__(self, db, secret: Optional[bytes] = None, ttl: int = SESSION_TTL_SECONDS,
+                 clock: Callable[[], float] = time.time):
+        self.db = db
+        self.secret = secret if secret is not None else _load_secret()
+        self.ttl = ttl
+        self.clock = clock
+        self.revocations = RevocationList()
+        self._synced_at: Optional[datetime] = None
+
+    def _sign(self, body: str) -> str:
+        return _b64encode(hmac.new(self.secret, body.encode(), hashlib.sha256).digest())
+
+    def _encode(self, payload: dict) -> str:
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        return f"{body}.{self._sign(body)}"
+
+    def issue(self, client_id: str) -> Tuple[str, PortalSession]:
+        now = int(self.clock())
+        session = PortalSession(client_id, secrets.token_urlsafe(12), now, now + self.ttl)
+        payload = {"sub": client_id, "sid": session.session_id, "iat": now, "exp": session.expires_at}
+        return self._encode(payload), session
+
+    def issue_stream(self, session: PortalSession, ttl: int = STREAM_TOKEN_TTL_SECONDS) -> Tuple[str, int]:
+        """Short-lived token that only opens the SSE stream; revoked along with `session`"""
+        now = int(self.clock())
+        expires_at = min(now + ttl, session.expires_at)
+        payload = {"sub": session.client_id, "sid": session.session_id, "iat": now, "exp": expires_at,
+                   "pur": STREAM_PURPOSE}
+        return self._encode(payload), expires_at - now
+
+    def authenticate(self, token: Optional[str], purpose: Optional[str] = None) -> PortalSession:
+        """Verify signature, purpose, expiry and revocation; no I/O"""
+        if not token:
+            raise InvalidSession("Missing portal session token")
+        # Un token válido es base64 URL-safe; compare_digest sobre str lanza TypeError con lo que no es ASCII
+        if not token.isascii():
+            raise InvalidSession("Invalid portal session token")
+        body, _, signature = token.partition(".")
+        if not body or not signature or not hmac.compare_digest(signature.encode(), self._sign(body).encode()):
+            raise InvalidSession("Invalid portal session token")
+        try:
+            payload = json.loads(_b64decode(body))
+            session = PortalSession(str(payload["sub"]), str(payload["sid"]), int(payload["iat"]), int(payload["exp"]))
+        except (ValueError, KeyError, TypeError):
+            raise InvalidSession("Invalid portal session token")
+        # Un token de flujo no vale como sesión ni al revés
+        if payload.get("pur") != purpose:
+            raise InvalidSession("Invalid portal session token")
+        now = self.clock()
+        if session.expires_at <= now:
+            raise InvalidSession("Portal session expired")
+        self.revocations.prune(now)
+        if self.revocations.is_revoked(session):
+            raise InvalidSession("Portal session revoked")
+        return session
+
+    async def _record(self, key: str, doc: dict):
+        try:
+            await self.db[REVOCATIONS_COLLECTION].update_one({"_id": key}, {"$set": doc}, upsert=True)
+        except Exception as e:
+            # La revocación local ya se aplicó; los demás workers no la verán
+            logger.warning("Could not persist portal revocation %s: %s", key, e)
+
+    async def revoke_session(self, session: PortalSession):
+        self.revocations.revoke_session(session.session_id, session.expires_at)
+        await self._record(f"session:{session.session_id}", {
+            "kind": "session", "key": session.session_id, "issued_before": None,
+            "revoked_at": datetime.fromtimestamp(self.clock(), timezone.utc),
+            "expires_at": datetime.fromtimestamp(session.expires_at, timezone.utc),
+        })
+
+    async def revoke_client(self, client_id: str):
+        """Invalidate every token issued to `client_id` so far"""
+        now = int(self.clock())
+        self.revocations.revoke_client(client_id, now, now + self.ttl)
+        await self._record(f"client:{client_id}", {
+            "kind": "client", "key": client_id, "issued_before": now,
+            "revoked_at": datetime.fromtimestamp(self.clock(), timezone.utc),
+            "expires_at": datetime.fromtimestamp(now + self.ttl, timezone.utc),
+        })
+
+    async def sync(self) -> int:
+        """Pull revocations recorded by other processes; returns how many were read"""
+        now = datetime.fromtimestamp(self.clock(), timezone.utc)
+        query = {"expires_at": {"$gt": now}}
+        if self._synced_at is not None:
+            query["revoked_at"] = {"$gte": self._synced_at - SYNC_OVERLAP}
+        count = 0
+        async for doc in self.db[REVOCATIONS_COLLECTION].find(query):
+            expires_at = int(doc["expires_at"].timestamp())
+            if doc["kind"] == "session":
+                self.revocations.revoke_session(doc["key"], expires_at)
+            else:
+                self.revocations.revoke_client(doc["key"], int(doc["issued_before"]), expires_at)
+            count += 1
+        self._synced_at = now
+        return count
+
+    async def sync_periodically(self, interval: float = REVOCATION_SYNC_SECONDS):
+        """Background loop for the server's lifespan"""
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Could not sync portal revocations: %s", e)
+            await asyncio.sleep(interval)
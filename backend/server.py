@@ -1,18 +1,68 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Form, File, UploadFile
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, APIRouter, HTTPException, Form, File, UploadFile, Query, Request, Body, Depends
+from fastapi.responses import StreamingResponse, FileResponse, Response, JSONResponse
+from starlette.background import BackgroundTask
+from starlette.datastructures import Headers
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
+import re
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import (
+    BaseModel, ConfigDict, Field, ValidationError, TypeAdapter, BeforeValidator, create_model, model_validator
+)
+from pydantic.fields import FieldInfo
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from typing import List, Optional, Generic, TypeVar, Dict, Any, Annotated, Tuple
 import uuid
-from datetime import datetime, timezone
-import shutil
+import json
+import base64
+import csv
+import io
+import codecs
+from datetime import datetime, timedelta, timezone
+from email.utils import formatdate, parsedate_to_datetime
+import time
+import hashlib
+import hmac
+import asyncio
 from enum import Enum
 from contextlib import asynccontextmanager
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+from client_search import (
+    build_search_fields, search_clients, backfill_search_fields
+)
+from document_storage import (
+    BLOBS_COLLECTION, blob_filename, acquire_blob, place_blob, release_blob, remove_document_files
+)
+import migration_engine
+from cascade_delete import DEPENDENTS, cascade_delete, delete_documents
+from appointment_calendar import (
+    CALENDAR_LOCKS_COLLECTION, MAX_APPOINTMENT_MINUTES, MAX_CALENDAR_DAYS, CalendarBusy, appointment_window,
+    backfill_windows, calendar_bound, calendar_guard, overlap_query
+)
+from jobs import JobRunner, JobContext
+from collection_versions import bump_versions, read_versions
+from temporal import (
+    backfill_dates, date_range, day_string, format_days, keyset_filter, parse_datetime, parse_day, start_of_today,
+    to_mongo_dates
+)
+import orphan_sweeper
+from portal_events import PORTAL_EVENTS_SOURCE, ChangeStreamSource, ConnectionLimitReached, EventBroker, routing
+import portal_events
+import metrics
+from metrics import MetricsMiddleware, MongoCommandMetrics
+from health import ReadinessProbe
+import case_analytics
+from case_analytics import ROLLUPS_COLLECTION, forget_cases
+import time_ledger
+from time_ledger import LAWYER_TOTALS, TIME_ENTRIES, entry_amount
+from portal_sessions import STREAM_PURPOSE, InvalidSession, PortalSession, SessionManager
 # hector etica v1
 
 ROOT_DIR = Path(__file__).parent
@@ -24,25 +74,50 @@ uploads_dir.mkdir(exist_ok=True)
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[MongoCommandMetrics()])
 # Preferir DB_NAME para claridad; default 'legaldesk' si no está definido
 db_name = os.environ.get('DB_NAME', 'legaldesk')
 db = client[db_name]
 
+# Eventos en vivo del portal: con varios workers, alimentados por un change stream
+portal_broker = EventBroker()
+portal_source = ChangeStreamSource(db, portal_broker) if PORTAL_EVENTS_SOURCE == "changestream" else None
+readiness = ReadinessProbe(db, uploads_dir)
+portal_sessions = SessionManager(db)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup logic (si se requiere) va antes del yield
+    try:
+        await job_runner.recover()
+    except Exception as e:
+        logger.warning("Could not recover background jobs: %s", e)
+    if portal_source:
+        portal_source.start()
+    revocations_task = asyncio.create_task(portal_sessions.sync_periodically())
+    analytics_task = None
+    if case_analytics.REFRESH_SECONDS > 0:
+        analytics_task = asyncio.create_task(case_analytics.refresh_periodically(
+            db, on_refresh=lambda result: bump_versions(db, ROLLUPS_COLLECTION)
+        ))
     try:
         yield
     finally:
         # Shutdown logic
+        if analytics_task:
+            analytics_task.cancel()
+        revocations_task.cancel()
+        portal_broker.close()
+        if portal_source:
+            await portal_source.stop()
+        await job_runner.shutdown()
         client.close()
 
 # Create the main app without a prefix, usando lifespan
 app = FastAPI(lifespan=lifespan)
 
-# Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
+# Los archivos subidos no se montan como estáticos: se sirven por /api/documents/{id}/download
+# y, para el portal, por /api/client/{client_id}/documents/{id}/download con su sesión
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -68,6 +143,13 @@ class ClientStatus(str, Enum):
     INACTIVE = "inactive"
     POTENTIAL = "potential"
 
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+# Calendar days are stored as BSON dates but exposed as "YYYY-MM-DD"
+DayString = Annotated[str, BeforeValidator(day_string)]
+
 # Models
 class Client(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -90,6 +172,7 @@ class Client(BaseModel):
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = 0  # bumped by every edit; PATCH checks it via If-Match
 
 class ClientCreate(BaseModel):
     first_name: str
@@ -115,18 +198,21 @@ class Case(BaseModel):
     case_type: CaseType
     status: CaseStatus = CaseStatus.ACTIVE
     description: Optional[str] = None
-    start_date: str
-    end_date: Optional[str] = None
-    next_hearing: Optional[str] = None
+    start_date: DayString
+    end_date: Optional[DayString] = None
+    next_hearing: Optional[DayString] = None
     court_name: Optional[str] = None
     judge_name: Optional[str] = None
     opposing_party: Optional[str] = None
     case_value: Optional[float] = None
     hourly_rate: Optional[float] = None
+    # Contadores del libro de horas (time_ledger.py): solo los mueven las entradas
     total_hours: Optional[float] = None
+    billed_amount: Optional[float] = None
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = 0
 
 class CaseCreate(BaseModel):
     client_id: str
@@ -143,9 +229,45 @@ class CaseCreate(BaseModel):
     opposing_party: Optional[str] = None
     case_value: Optional[float] = None
     hourly_rate: Optional[float] = None
-    total_hours: Optional[float] = None
+    total_hours: Optional[float] = None  # on create: opening entry; ignored on update
     notes: Optional[str] = None
 
+class TimeEntry(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    case_id: str
+    client_id: str
+    lawyer: str
+    work_date: DayString
+    hours: float
+    hourly_rate: Optional[float] = None
+    amount: float = 0  # hours x hourly_rate when billable
+    billable: bool = True
+    description: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class TimeEntryCreate(BaseModel):
+    case_id: str
+    lawyer: str = Field(min_length=1)
+    work_date: Optional[str] = None  # defaults to today
+    hours: float = Field(gt=0, le=24)
+    hourly_rate: Optional[float] = Field(None, ge=0)  # defaults to the case's rate
+    billable: bool = True
+    description: Optional[str] = None
+
+class CaseTimeSummary(BaseModel):
+    case_id: str
+    total_hours: float = 0
+    billed_amount: float = 0
+    hourly_rate: Optional[float] = None
+    updated_at: Optional[datetime] = None
+
+class LawyerTimeSummary(BaseModel):
+    lawyer: str
+    hours: float = 0
+    billed_amount: float = 0
+    entries: int = 0
+    updated_at: Optional[datetime] = None
+
 class Document(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     client_id: str
@@ -157,6 +279,8 @@ class Document(BaseModel):
     content_type: str
     description: Optional[str] = None
     category: Optional[str] = None
+    sha256: Optional[str] = None
+    blob_id: Optional[str] = None  # set when stored content-addressed
     uploaded_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class Appointment(BaseModel):
@@ -165,13 +289,25 @@ class Appointment(BaseModel):
     case_id: Optional[str] = None
     title: str
     description: Optional[str] = None
-    appointment_date: str
+    appointment_date: DayString
     appointment_time: str
     duration_minutes: int = 60
     location: Optional[str] = None
     is_completed: bool = False
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    # Computed UTC instants backing /calendar and conflict detection
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    version: int = 0
+
+    @model_validator(mode="after")
+    def fill_window(self):
+        if self.starts_at is None:
+            window = appointment_window(self.appointment_date, self.appointment_time, self.duration_minutes)
+            if window:
+                self.starts_at, self.ends_at = window
+        return self
 
 class AppointmentCreate(BaseModel):
     client_id: str
@@ -180,10 +316,56 @@ class AppointmentCreate(BaseModel):
     description: Optional[str] = None
     appointment_date: str
     appointment_time: str
-    duration_minutes: int = 60
+    duration_minutes: int = Field(60, ge=1, le=MAX_APPOINTMENT_MINUTES)
     location: Optional[str] = None
     notes: Optional[str] = None
 
+    @model_validator(mode="after")
+    def check_window(self):
+        if appointment_window(self.appointment_date, self.appointment_time, self.duration_minutes) is None:
+            raise ValueError("appointment_date must be a date and appointment_time a HH:MM time")
+        return self
+
+def partial_model(model, name: str, exclude=()):
+    """Copy of `model` for PATCH bodies: every field may be omitted.
+
+    An explicit `null` still has to be valid for the field, so required
+    fields cannot be cleared; unknown or excluded fields are rejected.
+    """
+    fields = {
+        field: (info.annotation, FieldInfo.merge_field_infos(info, default=None))
+        for field, info in model.model_fields.items() if field not in exclude
+    }
+    return create_model(name, __config__=ConfigDict(extra="forbid"), **fields)
+
+ClientPatch = partial_model(ClientCreate, "ClientPatch")
+# Las horas solo cambian con entradas del libro
+CasePatch = partial_model(CaseCreate, "CasePatch", exclude=("total_hours",))
+AppointmentPatch = partial_model(AppointmentCreate, "AppointmentPatch")
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ImportReport(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+
+class Job(BaseModel):
+    id: str
+    kind: str
+    params: Dict[str, Any] = {}
+    status: str
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
 class DashboardStats(BaseModel):
     total_clients: int
     active_clients: int
@@ -194,6 +376,29 @@ class DashboardStats(BaseModel):
     upcoming_appointments: int
     total_documents: int
 
+class AnalyticsRollup(BaseModel):
+    dimension: str  # "case_type", "status", "client_id" or "month" (YYYY-MM of start_date)
+    key: str
+    cases: int
+    open_cases: int
+    billed_hours: float
+    revenue: float  # billed_hours x hourly_rate
+    case_value: float
+    refreshed_at: datetime
+
+class AnalyticsTotals(BaseModel):
+    cases: int = 0
+    open_cases: int = 0
+    billed_hours: float = 0
+    revenue: float = 0
+    case_value: float = 0
+
+class AnalyticsSummary(BaseModel):
+    totals: AnalyticsTotals
+    by_status: List[AnalyticsRollup]
+    by_case_type: List[AnalyticsRollup]
+    refreshed_at: Optional[datetime] = None
+
 class CaseUpdate(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     case_id: str
@@ -216,23 +421,520 @@ class ClientLogin(BaseModel):
     email: str
     phone: str  # Using phone as simple password
 
+# Client portal views: only the fields the portal renders
+class PortalClient(BaseModel):
+    id: str
+    first_name: str
+    last_name: str
+    email: str
+    status: ClientStatus
+
+class PortalCase(BaseModel):
+    id: str
+    title: str
+    case_number: str
+    case_type: CaseType
+    status: CaseStatus
+    description: Optional[str] = None
+    start_date: DayString
+    next_hearing: Optional[DayString] = None
+    court_name: Optional[str] = None
+
+class PortalCaseUpdate(BaseModel):
+    id: str
+    case_id: str
+    title: str
+    description: str
+    update_type: str
+    created_at: datetime
+
+class PortalAppointment(BaseModel):
+    id: str
+    case_id: Optional[str] = None
+    title: str
+    description: Optional[str] = None
+    appointment_date: DayString
+    appointment_time: str
+    duration_minutes: int = 60
+    location: Optional[str] = None
+
 class ClientDashboard(BaseModel):
-    client_info: Client
-    active_cases: List[Case]
-    recent_updates: List[CaseUpdate]
-    upcoming_appointments: List[Appointment]
+    client_info: PortalClient
+    active_cases: List[PortalCase]
+    recent_updates: List[PortalCaseUpdate]
+    upcoming_appointments: List[PortalAppointment]
     total_documents: int
 
+def projection_for(model) -> dict:
+    """Mongo projection returning exactly the model's fields, without `_id`"""
+    projection = {field: 1 for field in model.model_fields}
+    projection["_id"] = 0
+    return projection
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    limit: int
+    next_cursor: Optional[str] = None
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+# Margen del cuerpo multipart sobre el fichero: límites, cabeceras de cada parte y campos del formulario
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+# "uuid": one file per upload (legacy); "content": one file per distinct SHA-256
+DOCUMENT_STORAGE = os.environ.get('DOCUMENT_STORAGE', 'uuid')
+
+DOCUMENT_CACHE_MAX_AGE = int(os.environ.get('DOCUMENT_CACHE_MAX_AGE', '86400'))
+
+# Search ranks at most this many index matches per match tier before applying `limit`
+SEARCH_CANDIDATE_LIMIT = int(os.environ.get('SEARCH_CANDIDATE_LIMIT', '500'))
+
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+MAX_EXPORT_BATCH_SIZE = 10000
+
 # Helper functions
 def prepare_for_mongo(data):
     """Prepare data for MongoDB storage"""
     if isinstance(data, dict):
-        # Convert datetime objects to strings
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
+        # Temporal fields are stored as native BSON dates
+        to_mongo_dates(data)
     return data
 
+def if_match_version(request: Request) -> Optional[int]:
+    """Record `version` required by the request's If-Match (None when absent or `*`)"""
+    header = request.headers.get("if-match")
+    if header is None or header.strip() == "*":
+        return None
+    tag = header.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match must be the record's version")
+
+def record_validators(record: dict) -> "ReadValidators":
+    """Validators for one record: its `version` is the ETag, the same value If-Match takes"""
+    return ReadValidators(f'"{record.get("version") or 0}"', None)
+
+def version_query(version: int) -> dict:
+    # Registros anteriores al campo version cuentan como versión 0
+    return {"version": version} if version else {"version": {"$in": [0, None]}}
+
+async def patch_record(collection, record_id: str, changes: dict, version: Optional[int] = None,
+                       expected: Optional[dict] = None, projection: Optional[dict] = None,
+                       not_found: str = "Record not found") -> dict:
+    """`$set` only `changes` on one record and return it updated, in a single round trip.
+
+    The write is conditional on `version` (from If-Match) and on `expected`,
+    the stored values that derived fields in `changes` were computed from.
+    A miss costs one more lookup to tell 404 from 412 (stale If-Match) and
+    409 (the inputs changed meanwhile; retry).
+    """
+    query = {"id": record_id, **(expected or {})}
+    if version is not None:
+        query.update(version_query(version))
+    updated = await collection.find_one_and_update(
+        query,
+        {"$set": changes, "$inc": {"version": 1}},
+        projection=projection,
+        return_document=ReturnDocument.AFTER,
+    )
+    if updated is not None:
+        return updated
+    current = await collection.find_one({"id": record_id}, {"_id": 0, "version": 1})
+    if current is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    if version is not None and current.get("version", 0) != version:
+        raise HTTPException(status_code=412, detail="Record was modified since it was read")
+    raise HTTPException(status_code=409, detail="Record changed while being updated; retry")
+
+def patch_changes(patch: BaseModel) -> dict:
+    """Fields sent in a PATCH body, ready for `$set`"""
+    changes = patch.dict(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    return prepare_for_mongo(changes)
+
+def encode_cursor(sort_value, doc_id: str) -> str:
+    """Encode a keyset position as an opaque URL-safe token"""
+    if isinstance(sort_value, datetime):
+        sort_value = {"$date": sort_value.isoformat()}
+    raw = json.dumps([sort_value, doc_id], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Decode a token produced by `encode_cursor`"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, doc_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["$date"])
+        return sort_value, doc_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_page(collection, filter_query: dict, sort_field: str, direction: int,
+                     limit: int, cursor: Optional[str] = None, projection: Optional[dict] = None):
+    """Fetch one keyset page ordered by (sort_field, id).
+
+    Returns the raw documents and the cursor for the next page (None on the
+    last page). One extra row is read to know whether another page exists.
+    """
+    if cursor:
+        sort_value, doc_id = decode_cursor(cursor)
+        keyset = keyset_filter(sort_field, direction, sort_value, doc_id)
+        filter_query = {"$and": [filter_query, keyset]} if filter_query else keyset
+
+    docs = await collection.find(filter_query, projection).sort(
+        [(sort_field, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["id"])
+    return docs, next_cursor
+
+def _write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+async def save_upload(upload: UploadFile, destination: Path):
+    """Stream an upload to disk in chunks without blocking the event loop.
+
+    Hashing and writing run in a worker thread. Returns `(size, sha256)`;
+    raises 413 once the upload exceeds MAX_UPLOAD_BYTES, leaving no partial
+    file behind.
+    """
+    if upload.size is not None and upload.size > MAX_UPLOAD_BYTES:
+        metrics.UPLOADS.inc(outcome="too_large")
+        raise HTTPException(status_code=413, detail="File too large")
+
+    digest = hashlib.sha256()
+    size = 0
+    with metrics.phase("upload_io"):
+        buffer = await asyncio.to_thread(open, destination, "wb")
+        try:
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    metrics.UPLOADS.inc(outcome="too_large")
+                    raise HTTPException(status_code=413, detail="File too large")
+                await asyncio.to_thread(_write_chunk, buffer, digest, chunk)
+        except BaseException:
+            await asyncio.to_thread(buffer.close)
+            await asyncio.to_thread(destination.unlink, missing_ok=True)
+            raise
+        await asyncio.to_thread(buffer.close)
+    metrics.UPLOADS.inc(outcome="stored")
+    metrics.UPLOAD_BYTES.inc(size)
+    return size, digest.hexdigest()
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware: refuse oversized upload bodies before the multipart parser spools them.
+
+    A declared Content-Length over the limit is answered 413 without reading
+    the body; a chunked body is cut off with 413 as soon as it passes the
+    limit. `save_upload` still enforces MAX_UPLOAD_BYTES on the file itself.
+    """
+
+    def __init__(self, app, paths=("/api/documents/upload",)):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        limit = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD
+        declared = Headers(scope=scope).get("content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            metrics.UPLOADS.inc(outcome="too_large")
+            await JSONResponse({"detail": "File too large"}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    metrics.UPLOADS.inc(outcome="too_large")
+                    # FastAPI re-raises HTTPException from body parsing as is
+                    raise HTTPException(status_code=413, detail="File too large")
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+class DocumentFileResponse(FileResponse):
+    """FileResponse for a stored document, read in 256 KiB chunks.
+
+    `If-Range` is resolved here against the document's own validators
+    (FileResponse only compares it with its mtime-based ETag); Range, 206
+    and 416 are FileResponse's own.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, path: Path, headers: Dict[str, str], **kwargs):
+        super().__init__(path, headers=headers, **kwargs)
+        self.validators = {headers.get("ETag"), headers.get("Last-Modified")} - {None}
+
+    def _resolve_if_range(self, scope) -> dict:
+        request_headers = Headers(scope=scope)
+        if "range" not in request_headers or "if-range" not in request_headers:
+            return scope
+        # Validador vigente: se atiende el rango; si no, el archivo completo
+        drop = b"if-range" if request_headers["if-range"] in self.validators else b"range"
+        return {**scope, "headers": [(key, value) for key, value in scope["headers"] if key.lower() != drop]}
+
+    async def __call__(self, scope, receive, send):
+        await super().__call__(self._resolve_if_range(scope), receive, send)
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against known validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+class ReadValidators:
+    """ETag / Last-Modified for a read, derived from collection version stamps
+    (or, for a single record, from its `version`: see `record_validators`).
+
+    Built before the query runs: on a match the handler answers 304 after a
+    single `_id` lookup on the stamps collection.
+    """
+
+    def __init__(self, etag: str, last_modified: Optional[datetime]):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if last_modified:
+            self.headers["Last-Modified"] = formatdate(last_modified.timestamp(), usegmt=True)
+
+    def matches(self, request: Request) -> bool:
+        return is_not_modified(request, self.etag, self.last_modified)
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+    def apply(self, response: Response) -> Response:
+        response.headers.update(self.headers)
+        return response
+
+async def read_validators(request: Request, *collections: str) -> ReadValidators:
+    """Validators for `request` over the given collections.
+
+    The key covers the URL (path and query) and today's date, since filters
+    such as `upcoming` depend on it.
+    """
+    stamps = await read_versions(db, collections)
+    key = [request.url.path, request.url.query, start_of_today().date().isoformat()]
+    key += [f"{name}:{stamps.get(name, {}).get('version', 0)}" for name in collections]
+    etag = '"' + hashlib.sha1("|".join(key).encode()).hexdigest() + '"'
+    times = [parse_datetime(stamp.get("updated_at")) for stamp in stamps.values()]
+    times = [t for t in times if t]
+    return ReadValidators(etag, max(times) if times else None)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def dump_json(content) -> bytes:
+    """Serialize to compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_json_default)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: same output as JSONResponse, rendered with orjson"""
+
+    def render(self, content) -> bytes:
+        with metrics.phase("serialization"):
+            return dump_json(content)
+
+class TrustedJSONResponse(FastJSONResponse):
+    """JSON response for documents this service wrote itself.
+
+    Handlers that return it skip `response_model` validation; the model is
+    kept on the route for the OpenAPI schema only.
+    """
+
+_type_adapters: Dict[Any, TypeAdapter] = {}
+
+def validated_response(model, content) -> Response:
+    """Validate raw Mongo documents against `model` once and serialize in the same pass.
+
+    Returning a Response bypasses FastAPI's second validation through
+    `response_model`; pydantic-core does both steps without building
+    intermediate JSON-able dicts.
+    """
+    adapter = _type_adapters.get(model)
+    if adapter is None:
+        adapter = _type_adapters[model] = TypeAdapter(model)
+    with metrics.phase("serialization"):
+        body = adapter.dump_json(adapter.validate_python(content))
+    return Response(body, media_type="application/json")
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+async def stream_export(collection, filter_query: dict, fields: List[str],
+                        fmt: ExportFormat, batch_size: int):
+    """Stream matching documents as NDJSON or CSV, one chunk per cursor batch.
+
+    Only `fields` are projected server-side and at most one batch is held in
+    memory, so memory use does not grow with the collection size.
+    """
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    cursor = collection.find(filter_query, projection).batch_size(batch_size)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == ExportFormat.CSV else None
+    if writer:
+        writer.writerow(fields)
+
+    rows = 0
+    async for doc in cursor:
+        format_days(doc)
+        if writer:
+            writer.writerow([_export_value(doc.get(field)) for field in fields])
+        else:
+            buffer.write(json.dumps({k: _export_value(v) for k, v in doc.items()}, ensure_ascii=False, default=str))
+            buffer.write("\n")
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def export_response(collection, filter_query: dict, fields: List[str], name: str,
+                    fmt: ExportFormat, batch_size: int) -> StreamingResponse:
+    media_type = "text/csv" if fmt == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        stream_export(collection, filter_query, fields, fmt, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt.value}"'},
+    )
+
+class DashboardStatsCache:
+    """In-process dashboard counters, refreshed at most every `max_age` seconds.
+
+    Write handlers adjust the counters in place via `incr` when the delta is
+    known, or call `invalidate` when it is not (e.g. a status change whose
+    previous value was not read). A refresh runs one aggregation per
+    collection, concurrently. A write that lands while a refresh is in
+    flight may or may not be in its result, so that result is served once
+    and not cached.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._stats: Optional[dict] = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        # Cuenta incr/invalidate: si cambia durante un refresco, su resultado no se reutiliza
+        self._generation = 0
+
+    def _is_fresh(self) -> bool:
+        return self._stats is not None and time.monotonic() - self._loaded_at < self.max_age
+
+    async def get(self) -> dict:
+        if self._is_fresh():
+            return self._stats
+        async with self._lock:
+            # Another request may have refreshed while we waited for the lock
+            if self._is_fresh():
+                return self._stats
+            generation = self._generation
+            stats = await compute_dashboard_stats()
+            if generation == self._generation:
+                self._stats, self._loaded_at = stats, time.monotonic()
+            return stats
+
+    def incr(self, field: str, delta: int = 1):
+        self._generation += 1
+        if self._stats is not None:
+            self._stats[field] = max(0, self._stats[field] + delta)
+
+    def invalidate(self):
+        self._generation += 1
+        self._stats = None
+
+async def _count_by_status(collection) -> dict:
+    """Count documents per `status` value in one covered index scan"""
+    pipeline = [
+        {"$sort": {"status": 1}},
+        {"$project": {"_id": 0, "status": 1}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]
+    return {row["_id"]: row["count"] async for row in collection.aggregate(pipeline)}
+
+async def compute_dashboard_stats() -> dict:
+    """Compute dashboard counters from MongoDB"""
+    clients_by_status, cases_by_status, upcoming_appointments, total_documents = await asyncio.gather(
+        _count_by_status(db.clients),
+        _count_by_status(db.cases),
+        db.appointments.count_documents({
+            **date_range("appointment_date", gte=start_of_today()),
+            "is_completed": False
+        }),
+        db.documents.estimated_document_count(),
+    )
+    return {
+        "total_clients": sum(clients_by_status.values()),
+        "active_clients": clients_by_status.get("active", 0),
+        "total_cases": sum(cases_by_status.values()),
+        "active_cases": cases_by_status.get("active", 0),
+        "pending_cases": cases_by_status.get("pending", 0),
+        "closed_cases": cases_by_status.get("closed", 0),
+        "upcoming_appointments": upcoming_appointments,
+        "total_documents": total_documents,
+    }
+
+CASE_STATUS_COUNTERS = {
+    CaseStatus.ACTIVE: "active_cases",
+    CaseStatus.PENDING: "pending_cases",
+    CaseStatus.CLOSED: "closed_cases",
+}
+
+def _is_upcoming(appointment_date, is_completed: bool = False) -> bool:
+    day = parse_day(appointment_date)
+    return not is_completed and day is not None and day >= start_of_today()
+
+dashboard_stats_cache = DashboardStatsCache(
+    max_age=float(os.environ.get('DASHBOARD_STATS_MAX_AGE', '30'))
+)
+
 # API Routes
 
 # Dashboard Stats
@@ -240,36 +942,7 @@ def prepare_for_mongo(data):
 async def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        # Count clients by status
-        total_clients = await db.clients.count_documents({})
-        active_clients = await db.clients.count_documents({"status": "active"})
-        
-        # Count cases by status
-        total_cases = await db.cases.count_documents({})
-        active_cases = await db.cases.count_documents({"status": "active"})
-        pending_cases = await db.cases.count_documents({"status": "pending"})
-        closed_cases = await db.cases.count_documents({"status": "closed"})
-        
-        # Count upcoming appointments (today and future)
-        today = datetime.now(timezone.utc).date().isoformat()
-        upcoming_appointments = await db.appointments.count_documents({
-            "appointment_date": {"$gte": today},
-            "is_completed": False
-        })
-        
-        # Count total documents
-        total_documents = await db.documents.count_documents({})
-        
-        return DashboardStats(
-            total_clients=total_clients,
-            active_clients=active_clients,
-            total_cases=total_cases,
-            active_cases=active_cases,
-            pending_cases=pending_cases,
-            closed_cases=closed_cases,
-            upcoming_appointments=upcoming_appointments,
-            total_documents=total_documents
-        )
+        return DashboardStats(**await dashboard_stats_cache.get())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -281,41 +954,63 @@ async def create_client(client: ClientCreate):
         client_dict = client.dict()
         client_obj = Client(**client_dict)
         client_data = prepare_for_mongo(client_obj.dict())
+        client_data.update(build_search_fields(client_data))
         await db.clients.insert_one(client_data)
+        await bump_versions(db, "clients")
+        dashboard_stats_cache.incr("total_clients")
+        if client_obj.status == ClientStatus.ACTIVE:
+            dashboard_stats_cache.incr("active_clients")
         return client_obj
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/clients", response_model=List[Client])
-async def get_clients(status: Optional[str] = None, search: Optional[str] = None):
-    """Get all clients with optional filtering"""
+@api_router.get("/clients", response_model=Page[Client])
+async def get_clients(request: Request, status: Optional[str] = None, search: Optional[str] = None,
+                      limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    """Get clients with optional filtering, one keyset page at a time.
+
+    With `search`, results are ranked by match quality and returned as a
+    single page of at most `limit` clients; `X-Search-Truncated` reports
+    when a match tier had more than SEARCH_CANDIDATE_LIMIT clients.
+    """
     try:
+        validators = await read_validators(request, "clients")
+        if validators.matches(request):
+            return validators.not_modified()
         filter_query = {}
         
         if status:
             filter_query["status"] = status
             
         if search:
-            filter_query["$or"] = [
-                {"first_name": {"$regex": search, "$options": "i"}},
-                {"last_name": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}},
-                {"phone": {"$regex": search, "$options": "i"}}
-            ]
+            ranked, truncated = await search_clients(db.clients, filter_query, search, limit, SEARCH_CANDIDATE_LIMIT)
+            response = validators.apply(validated_response(Page[Client], {"items": ranked, "limit": limit}))
+            if truncated:
+                response.headers["X-Search-Truncated"] = str(SEARCH_CANDIDATE_LIMIT)
+            return response
         
-        clients = await db.clients.find(filter_query).sort("created_at", -1).to_list(1000)
-        return [Client(**client) for client in clients]
+        clients, next_cursor = await fetch_page(
+            db.clients, filter_query, "created_at", -1, limit, cursor, projection_for(Client)
+        )
+        return validators.apply(
+            validated_response(Page[Client], {"items": clients, "limit": limit, "next_cursor": next_cursor})
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/clients/{client_id}", response_model=Client)
-async def get_client(client_id: str):
-    """Get a specific client"""
+async def get_client(request: Request, client_id: str):
+    """Get a specific client; its ETag is the version PATCH takes in If-Match"""
     try:
-        client = await db.clients.find_one({"id": client_id})
+        client = await db.clients.find_one({"id": client_id}, projection_for(Client))
         if not client:
             raise HTTPException(status_code=404, detail="Client not found")
-        return Client(**client)
+        validators = record_validators(client)
+        if validators.matches(request):
+            return validators.not_modified()
+        return validators.apply(validated_response(Client, client))
     except HTTPException:
         raise
     except Exception as e:
@@ -328,14 +1023,19 @@ async def update_client(client_id: str, client_update: ClientCreate):
         client_dict = client_update.dict()
         client_dict["updated_at"] = datetime.now(timezone.utc)
         client_data = prepare_for_mongo(client_dict)
+        client_data.update(build_search_fields(client_data))
         
         result = await db.clients.update_one(
             {"id": client_id},
-            {"$set": client_data}
+            {"$set": client_data, "$inc": {"version": 1}}
         )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Client not found")
+        if result.modified_count:
+            await bump_versions(db, "clients")
+            # Previous status is unknown here, so recount on next read
+            dashboard_stats_cache.invalidate()
             
         updated_client = await db.clients.find_one({"id": client_id})
         return Client(**updated_client)
@@ -344,19 +1044,63 @@ async def update_client(client_id: str, client_update: ClientCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Los tokens de búsqueda se derivan de estos campos
+SEARCH_SOURCE_FIELDS = ("first_name", "last_name", "email", "phone")
+
+@api_router.patch("/clients/{client_id}", response_model=Client)
+async def patch_client(request: Request, client_id: str, client_patch: ClientPatch):
+    """Update only the fields sent; `If-Match: <version>` turns a lost update into 412"""
+    try:
+        version = if_match_version(request)
+        changes = patch_changes(client_patch)
+        changes["updated_at"] = datetime.now(timezone.utc)
+        expected = None
+        if any(field in changes for field in SEARCH_SOURCE_FIELDS):
+            # Las claves de búsqueda necesitan también los campos que no se enviaron
+            current = await db.clients.find_one(
+                {"id": client_id}, {"_id": 0, **{field: 1 for field in SEARCH_SOURCE_FIELDS}}
+            )
+            if not current:
+                raise HTTPException(status_code=404, detail="Client not found")
+            expected = {field: current.get(field) for field in SEARCH_SOURCE_FIELDS}
+            changes.update(build_search_fields({**current, **changes}))
+        updated = await patch_record(db.clients, client_id, changes, version, expected,
+                                     projection_for(Client), "Client not found")
+        await bump_versions(db, "clients")
+        if "status" in changes:
+            dashboard_stats_cache.invalidate()
+        return record_validators(updated).apply(validated_response(Client, updated))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.delete("/clients/{client_id}")
 async def delete_client(client_id: str):
-    """Delete a client"""
+    """Delete a client with its cases, documents, appointments and updates"""
     try:
-        result = await db.clients.delete_one({"id": client_id})
-        if result.deleted_count == 0:
+        if not await db.clients.count_documents({"id": client_id}, limit=1):
             raise HTTPException(status_code=404, detail="Client not found")
-        return {"message": "Client deleted successfully"}
+        _, counts = await cascade_delete(db, uploads_dir, "clients", client_id)
+        await bump_versions(db, "clients", *counts)
+        await forget_analytics({"client_id": client_id})
+        await portal_sessions.revoke_client(client_id)
+        # Cases and appointments went with the client; recount on next read
+        dashboard_stats_cache.invalidate()
+        return {"message": "Client deleted successfully", "deleted": counts}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def forget_analytics(fact_filter: dict):
+    """Take deleted cases out of the rollups now; the next refresh would catch them anyway"""
+    try:
+        if await forget_cases(db, fact_filter):
+            await bump_versions(db, ROLLUPS_COLLECTION)
+    except Exception as e:
+        logger.warning("Could not update analytics rollups: %s", e)
+
 # Case CRUD
 @api_router.post("/cases", response_model=Case)
 async def create_case(case: CaseCreate):
@@ -368,19 +1112,33 @@ async def create_case(case: CaseCreate):
             raise HTTPException(status_code=404, detail="Client not found")
             
         case_dict = case.dict()
+        if case_dict.get("total_hours"):
+            case_dict["billed_amount"] = entry_amount(case_dict["total_hours"], case_dict.get("hourly_rate"))
         case_obj = Case(**case_dict)
         case_data = prepare_for_mongo(case_obj.dict())
         await db.cases.insert_one(case_data)
+        # Las horas iniciales entran al libro como apertura; los contadores ya las incluyen
+        if await time_ledger.open_cases(db, [case_data]):
+            await bump_versions(db, "cases", TIME_ENTRIES)
+        else:
+            await bump_versions(db, "cases")
+        dashboard_stats_cache.incr("total_cases")
+        if case_obj.status in CASE_STATUS_COUNTERS:
+            dashboard_stats_cache.incr(CASE_STATUS_COUNTERS[case_obj.status])
         return case_obj
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/cases", response_model=List[Case])
-async def get_cases(client_id: Optional[str] = None, status: Optional[str] = None):
-    """Get all cases with optional filtering"""
+@api_router.get("/cases", response_model=Page[Case])
+async def get_cases(request: Request, client_id: Optional[str] = None, status: Optional[str] = None,
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    """Get cases with optional filtering, one keyset page at a time"""
     try:
+        validators = await read_validators(request, "cases")
+        if validators.matches(request):
+            return validators.not_modified()
         filter_query = {}
         
         if client_id:
@@ -389,19 +1147,28 @@ async def get_cases(client_id: Optional[str] = None, status: Optional[str] = Non
         if status:
             filter_query["status"] = status
         
-        cases = await db.cases.find(filter_query).sort("created_at", -1).to_list(1000)
-        return [Case(**case) for case in cases]
+        cases, next_cursor = await fetch_page(
+            db.cases, filter_query, "created_at", -1, limit, cursor, projection_for(Case)
+        )
+        return validators.apply(
+            validated_response(Page[Case], {"items": cases, "limit": limit, "next_cursor": next_cursor})
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/cases/{case_id}", response_model=Case)
-async def get_case(case_id: str):
-    """Get a specific case"""
+async def get_case(request: Request, case_id: str):
+    """Get a specific case; its ETag is the version PATCH takes in If-Match"""
     try:
-        case = await db.cases.find_one({"id": case_id})
+        case = await db.cases.find_one({"id": case_id}, projection_for(Case))
         if not case:
             raise HTTPException(status_code=404, detail="Case not found")
-        return Case(**case)
+        validators = record_validators(case)
+        if validators.matches(request):
+            return validators.not_modified()
+        return validators.apply(validated_response(Case, case))
     except HTTPException:
         raise
     except Exception as e:
@@ -412,16 +1179,21 @@ async def update_case(case_id: str, case_update: CaseCreate):
     """Update a case"""
     try:
         case_dict = case_update.dict()
+        # Las horas solo cambian con entradas del libro (POST /time-entries)
+        case_dict.pop("total_hours", None)
         case_dict["updated_at"] = datetime.now(timezone.utc)
         case_data = prepare_for_mongo(case_dict)
         
         result = await db.cases.update_one(
             {"id": case_id},
-            {"$set": case_data}
+            {"$set": case_data, "$inc": {"version": 1}}
         )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Case not found")
+        if result.modified_count:
+            await bump_versions(db, "cases")
+            dashboard_stats_cache.invalidate()
             
         updated_case = await db.cases.find_one({"id": case_id})
         return Case(**updated_case)
@@ -430,14 +1202,161 @@ async def update_case(case_id: str, case_update: CaseCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.patch("/cases/{case_id}", response_model=Case)
+async def patch_case(request: Request, case_id: str, case_patch: CasePatch):
+    """Update only the fields sent; `If-Match: <version>` turns a lost update into 412"""
+    try:
+        version = if_match_version(request)
+        changes = patch_changes(case_patch)
+        changes["updated_at"] = datetime.now(timezone.utc)
+        if "client_id" in changes and not await db.clients.count_documents({"id": changes["client_id"]}, limit=1):
+            raise HTTPException(status_code=404, detail="Client not found")
+        updated = await patch_record(db.cases, case_id, changes, version,
+                                     projection=projection_for(Case), not_found="Case not found")
+        await bump_versions(db, "cases")
+        if "status" in changes:
+            dashboard_stats_cache.invalidate()
+        return record_validators(updated).apply(validated_response(Case, updated))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.delete("/cases/{case_id}")
 async def delete_case(case_id: str):
-    """Delete a case"""
+    """Delete a case with its documents, appointments and updates"""
+    try:
+        if not await db.cases.count_documents({"id": case_id}, limit=1):
+            raise HTTPException(status_code=404, detail="Case not found")
+        _, counts = await cascade_delete(db, uploads_dir, "cases", case_id)
+        await bump_versions(db, "cases", *counts)
+        await forget_analytics({"_id": case_id})
+        dashboard_stats_cache.invalidate()
+        return {"message": "Case deleted successfully", "deleted": counts}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Time entries (append-only ledger; case and lawyer totals are counters)
+@api_router.post("/time-entries", response_model=TimeEntry, status_code=201)
+async def create_time_entry(entry: TimeEntryCreate):
+    """Log hours against a case and add them to the case and lawyer totals"""
+    try:
+        case = await db.cases.find_one({"id": entry.case_id}, {"_id": 0, "client_id": 1, "hourly_rate": 1})
+        if not case:
+            raise HTTPException(status_code=404, detail="Case not found")
+        entry_dict = entry.dict()
+        entry_dict["hours"] = round(entry.hours, 2)
+        if entry_dict["work_date"] is None:
+            entry_dict["work_date"] = day_string(datetime.now(timezone.utc))
+        elif parse_day(entry_dict["work_date"]) is None:
+            raise HTTPException(status_code=400, detail="work_date must be a date")
+        if entry_dict["hourly_rate"] is None:
+            entry_dict["hourly_rate"] = case.get("hourly_rate")
+        entry_dict["amount"] = entry_amount(entry_dict["hours"], entry_dict["hourly_rate"], entry.billable)
+        entry_obj = TimeEntry(client_id=case["client_id"], **entry_dict)
+        await time_ledger.record_entry(db, prepare_for_mongo(entry_obj.dict()))
+        await bump_versions(db, TIME_ENTRIES, "cases")
+        return entry_obj
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/time-entries", response_model=Page[TimeEntry])
+async def get_time_entries(request: Request, case_id: Optional[str] = None, lawyer: Optional[str] = None,
+                           client_id: Optional[str] = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    """Get time entries, newest first, filtered by case, lawyer or client"""
+    try:
+        validators = await read_validators(request, TIME_ENTRIES)
+        if validators.matches(request):
+            return validators.not_modified()
+        filter_query = {}
+        if case_id:
+            filter_query["case_id"] = case_id
+        elif client_id:
+            filter_query["client_id"] = client_id
+        if lawyer:
+            filter_query["lawyer"] = lawyer
+        entries, next_cursor = await fetch_page(
+            db[TIME_ENTRIES], filter_query, "created_at", -1, limit, cursor, projection_for(TimeEntry)
+        )
+        return validators.apply(
+            validated_response(Page[TimeEntry], {"items": entries, "limit": limit, "next_cursor": next_cursor})
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.delete("/time-entries/{entry_id}")
+async def delete_time_entry(entry_id: str):
+    """Delete a time entry and take its hours off the case and lawyer totals"""
+    try:
+        entry = await time_ledger.remove_entry(db, entry_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Time entry not found")
+        await bump_versions(db, TIME_ENTRIES, "cases")
+        return {"message": "Time entry deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/cases/{case_id}/time-summary", response_model=CaseTimeSummary)
+async def get_case_time_summary(request: Request, case_id: str):
+    """Hours and billed amount of a case, read from its counters"""
     try:
-        result = await db.cases.delete_one({"id": case_id})
-        if result.deleted_count == 0:
+        validators = await read_validators(request, "cases")
+        if validators.matches(request):
+            return validators.not_modified()
+        case = await db.cases.find_one(
+            {"id": case_id}, {"_id": 0, "id": 1, "total_hours": 1, "billed_amount": 1, "hourly_rate": 1, "updated_at": 1}
+        )
+        if not case:
             raise HTTPException(status_code=404, detail="Case not found")
-        return {"message": "Case deleted successfully"}
+        return validators.apply(validated_response(CaseTimeSummary, {
+            "case_id": case["id"],
+            "total_hours": case.get("total_hours") or 0,
+            "billed_amount": case.get("billed_amount") or 0,
+            "hourly_rate": case.get("hourly_rate"),
+            "updated_at": case.get("updated_at"),
+        }))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/time-summary/lawyers", response_model=List[LawyerTimeSummary])
+async def get_lawyer_time_summaries(request: Request):
+    """Hours, billed amount and entry count per lawyer, highest billing first"""
+    try:
+        validators = await read_validators(request, TIME_ENTRIES)
+        if validators.matches(request):
+            return validators.not_modified()
+        rows = await db[LAWYER_TOTALS].find({}).sort([("billed_amount", -1), ("_id", 1)]).to_list(None)
+        return validators.apply(validated_response(
+            List[LawyerTimeSummary], [{"lawyer": row.pop("_id"), **row} for row in rows]
+        ))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/time-summary/lawyers/{lawyer}", response_model=LawyerTimeSummary)
+async def get_lawyer_time_summary(request: Request, lawyer: str):
+    """Hours, billed amount and entry count of one lawyer"""
+    try:
+        validators = await read_validators(request, TIME_ENTRIES)
+        if validators.matches(request):
+            return validators.not_modified()
+        row = await db[LAWYER_TOTALS].find_one({"_id": lawyer})
+        if not row:
+            raise HTTPException(status_code=404, detail="No time entries for this lawyer")
+        row.pop("_id")
+        return validators.apply(validated_response(LawyerTimeSummary, {"lawyer": lawyer, **row}))
     except HTTPException:
         raise
     except Exception as e:
@@ -459,14 +1378,32 @@ async def upload_document(
         if not client:
             raise HTTPException(status_code=404, detail="Client not found")
         
-        # Create unique filename
         file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
-        unique_filename = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
-        file_path = uploads_dir / unique_filename
-        
-        # Save file
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        blob_id = None
+        if DOCUMENT_STORAGE == "content":
+            # Stream to a temporary name, then keep a single copy per hash
+            tmp_path = uploads_dir / f".upload-{uuid.uuid4()}"
+            try:
+                file_size, sha256 = await save_upload(file, tmp_path)
+                blob = await acquire_blob(
+                    db[BLOBS_COLLECTION], sha256, blob_filename(sha256, file_extension), file_size
+                )
+                blob_id = sha256
+                unique_filename = blob["filename"]
+                file_path = uploads_dir / unique_filename
+                await place_blob(tmp_path, file_path)
+            except Exception:
+                if blob_id:
+                    await release_blob(db[BLOBS_COLLECTION], blob_id, uploads_dir)
+                raise
+            finally:
+                # Ya movido si todo fue bien; si no, que no quede en uploads/
+                await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+        else:
+            # Create unique filename
+            unique_filename = f"{uuid.uuid4()}.{file_extension}" if file_extension else str(uuid.uuid4())
+            file_path = uploads_dir / unique_filename
+            file_size, sha256 = await save_upload(file, file_path)
         
         # Create document record
         document = Document(
@@ -475,29 +1412,42 @@ async def upload_document(
             filename=unique_filename,
             original_filename=file.filename,
             file_path=str(file_path),
-            file_size=file_path.stat().st_size,
+            file_size=file_size,
             content_type=file.content_type,
             description=description,
-            category=category
+            category=category,
+            sha256=sha256,
+            blob_id=blob_id
         )
         
         document_data = prepare_for_mongo(document.dict())
-        await db.documents.insert_one(document_data)
+        try:
+            await db.documents.insert_one(document_data)
+        except Exception:
+            if blob_id:
+                await release_blob(db[BLOBS_COLLECTION], blob_id, uploads_dir)
+            raise
+        await bump_versions(db, "documents")
+        dashboard_stats_cache.incr("total_documents")
         
         return {
             "message": "Document uploaded successfully",
             "document": document,
-            "file_url": f"/uploads/{unique_filename}"
+            "file_url": f"/api/documents/{document.id}/download"
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/documents", response_model=List[Document])
-async def get_documents(client_id: Optional[str] = None, case_id: Optional[str] = None):
-    """Get documents with optional filtering"""
+@api_router.get("/documents", response_model=Page[Document])
+async def get_documents(request: Request, client_id: Optional[str] = None, case_id: Optional[str] = None,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    """Get documents with optional filtering, one keyset page at a time"""
     try:
+        validators = await read_validators(request, "documents")
+        if validators.matches(request):
+            return validators.not_modified()
         filter_query = {}
         
         if client_id:
@@ -506,8 +1456,65 @@ async def get_documents(client_id: Optional[str] = None, case_id: Optional[str]
         if case_id:
             filter_query["case_id"] = case_id
         
-        documents = await db.documents.find(filter_query).sort("uploaded_at", -1).to_list(1000)
-        return [Document(**doc) for doc in documents]
+        documents, next_cursor = await fetch_page(
+            db.documents, filter_query, "uploaded_at", -1, limit, cursor, projection_for(Document)
+        )
+        return validators.apply(
+            validated_response(Page[Document], {"items": documents, "limit": limit, "next_cursor": next_cursor})
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def serve_document(request: Request, query: dict, attachment: bool) -> Response:
+    """Serve the document matching `query` with ETag, conditional GET and Range support"""
+    document = await db.documents.find_one(
+        query,
+        {"_id": 0, "id": 1, "filename": 1, "original_filename": 1, "content_type": 1,
+         "file_size": 1, "sha256": 1, "uploaded_at": 1}
+    )
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # A document's bytes never change, so validators come from metadata only
+    if document.get("sha256"):
+        etag = f'"{document["sha256"]}"'
+    else:
+        etag = f'"{document["id"]}-{document.get("file_size", 0)}"'
+    last_modified = parse_datetime(document.get("uploaded_at"))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={DOCUMENT_CACHE_MAX_AGE}",
+    }
+    if last_modified:
+        headers["Last-Modified"] = formatdate(last_modified.timestamp(), usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    file_path = uploads_dir / document["filename"]
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    return DocumentFileResponse(
+        file_path,
+        headers=headers,
+        media_type=document.get("content_type") or None,
+        filename=document.get("original_filename") or document["filename"],
+        stat_result=stat_result,
+        content_disposition_type="attachment" if attachment else "inline",
+    )
+
+@api_router.get("/documents/{document_id}/download")
+async def download_document(request: Request, document_id: str, attachment: bool = False):
+    """Serve a stored document (staff view)"""
+    try:
+        return await serve_document(request, {"id": document_id}, attachment)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -519,13 +1526,14 @@ async def delete_document(document_id: str):
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        # Delete file from disk
-        file_path = Path(document["file_path"])
-        if file_path.exists():
-            file_path.unlink()
-        
         # Delete from database
-        await db.documents.delete_one({"id": document_id})
+        result = await db.documents.delete_one({"id": document_id})
+        if result.deleted_count:
+            await bump_versions(db, "documents")
+            dashboard_stats_cache.incr("total_documents", -1)
+        
+        if result.deleted_count:
+            await remove_document_files(db[BLOBS_COLLECTION], uploads_dir, [document])
         
         return {"message": "Document deleted successfully"}
     except HTTPException:
@@ -534,65 +1542,216 @@ async def delete_document(document_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Appointments CRUD
+def notify_portal(collection: str, action: str, doc: dict):
+    """Push a write to the client's open portal streams; the change stream does it when enabled"""
+    if portal_source is None:
+        routed = routing(collection, action, doc)
+        if routed:
+            portal_broker.publish(*routed)
+
+@asynccontextmanager
+async def calendar_slot(starts_at: datetime, ends_at: datetime):
+    """Serialize conflict check + write for the slot's days across every worker"""
+    try:
+        async with calendar_guard(db[CALENDAR_LOCKS_COLLECTION], starts_at, ends_at):
+            yield
+    except CalendarBusy:
+        raise HTTPException(status_code=503, detail="Calendar is busy, retry the booking",
+                            headers={"Retry-After": "1"})
+
+async def find_conflict(starts_at: datetime, ends_at: datetime, exclude_id: Optional[str] = None):
+    """Return one pending appointment overlapping the slot, using the (starts_at, ends_at) index"""
+    query = {**overlap_query(starts_at, ends_at), "is_completed": False}
+    if exclude_id:
+        query["id"] = {"$ne": exclude_id}
+    return await db.appointments.find_one(
+        query, {"_id": 0, "id": 1, "title": 1, "client_id": 1, "starts_at": 1, "ends_at": 1}
+    )
+
+def conflict_error(conflict: dict) -> HTTPException:
+    return HTTPException(status_code=409, detail={
+        "message": "Appointment overlaps an existing one",
+        "conflict": {
+            "id": conflict["id"],
+            "title": conflict.get("title"),
+            "client_id": conflict.get("client_id"),
+            "starts_at": conflict["starts_at"].isoformat(),
+            "ends_at": conflict["ends_at"].isoformat(),
+        },
+    })
+
 @api_router.post("/appointments", response_model=Appointment)
-async def create_appointment(appointment: AppointmentCreate):
-    """Create a new appointment"""
+async def create_appointment(appointment: AppointmentCreate, allow_overlap: bool = False):
+    """Create a new appointment; 409 if it overlaps a pending one unless `allow_overlap`"""
     try:
         # Verify client exists
-        client = await db.clients.find_one({"id": appointment.client_id})
+        client = await db.clients.find_one({"id": appointment.client_id}, {"_id": 1})
         if not client:
             raise HTTPException(status_code=404, detail="Client not found")
             
         appointment_dict = appointment.dict()
         appointment_obj = Appointment(**appointment_dict)
         appointment_data = prepare_for_mongo(appointment_obj.dict())
-        await db.appointments.insert_one(appointment_data)
+        async with calendar_slot(appointment_obj.starts_at, appointment_obj.ends_at):
+            if not allow_overlap:
+                conflict = await find_conflict(appointment_obj.starts_at, appointment_obj.ends_at)
+                if conflict:
+                    raise conflict_error(conflict)
+            await db.appointments.insert_one(appointment_data)
+        await bump_versions(db, "appointments")
+        notify_portal("appointments", "created", appointment_data)
+        if _is_upcoming(appointment_obj.appointment_date):
+            dashboard_stats_cache.incr("upcoming_appointments")
         return appointment_obj
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/appointments", response_model=List[Appointment])
-async def get_appointments(client_id: Optional[str] = None, upcoming: Optional[bool] = None):
-    """Get appointments with optional filtering"""
+@api_router.get("/appointments", response_model=Page[Appointment])
+async def get_appointments(request: Request, client_id: Optional[str] = None, upcoming: Optional[bool] = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    """Get appointments with optional filtering, one keyset page at a time"""
     try:
+        validators = await read_validators(request, "appointments")
+        if validators.matches(request):
+            return validators.not_modified()
         filter_query = {}
         
         if client_id:
             filter_query["client_id"] = client_id
             
         if upcoming:
-            today = datetime.now(timezone.utc).date().isoformat()
-            filter_query["appointment_date"] = {"$gte": today}
+            filter_query.update(date_range("appointment_date", gte=start_of_today()))
             filter_query["is_completed"] = False
         
-        appointments = await db.appointments.find(filter_query).sort("appointment_date", 1).to_list(1000)
-        return [Appointment(**appointment) for appointment in appointments]
+        appointments, next_cursor = await fetch_page(
+            db.appointments, filter_query, "appointment_date", 1, limit, cursor, projection_for(Appointment)
+        )
+        return validators.apply(validated_response(
+            Page[Appointment], {"items": appointments, "limit": limit, "next_cursor": next_cursor}
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.put("/appointments/{appointment_id}", response_model=Appointment)
-async def update_appointment(appointment_id: str, appointment_update: AppointmentCreate):
-    """Update an appointment"""
+@api_router.get("/calendar", response_model=List[Appointment])
+async def get_calendar(request: Request, start: str = Query(..., alias="from"), end: str = Query(..., alias="to"),
+                       client_id: Optional[str] = None, include_completed: bool = True,
+                       limit: int = Query(MAX_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Appointments overlapping [from, to), ordered by start; bare dates are local midnight"""
     try:
-        appointment_dict = appointment_update.dict()
+        range_start, range_end = calendar_bound(start), calendar_bound(end)
+        if range_start is None or range_end is None:
+            raise HTTPException(status_code=400, detail="from and to must be ISO dates or datetimes")
+        if range_end <= range_start:
+            raise HTTPException(status_code=400, detail="to must be after from")
+        if range_end - range_start > timedelta(days=MAX_CALENDAR_DAYS):
+            raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_CALENDAR_DAYS} days")
         
-        result = await db.appointments.update_one(
-            {"id": appointment_id},
-            {"$set": appointment_dict}
+        validators = await read_validators(request, "appointments")
+        if validators.matches(request):
+            return validators.not_modified()
+        
+        filter_query = overlap_query(range_start, range_end)
+        if client_id:
+            filter_query["client_id"] = client_id
+        if not include_completed:
+            filter_query["is_completed"] = False
+        
+        appointments = await db.appointments.find(
+            filter_query, projection_for(Appointment)
+        ).sort("starts_at", 1).limit(limit).to_list(limit)
+        return validators.apply(validated_response(List[Appointment], appointments))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.put("/appointments/{appointment_id}", response_model=Appointment)
+async def update_appointment(appointment_id: str, appointment_update: AppointmentCreate, allow_overlap: bool = False):
+    """Update an appointment; 409 if the new slot overlaps another pending one unless `allow_overlap`"""
+    try:
+        appointment_dict = prepare_for_mongo(appointment_update.dict())
+        starts_at, ends_at = appointment_window(
+            appointment_update.appointment_date, appointment_update.appointment_time,
+            appointment_update.duration_minutes
         )
+        appointment_dict.update(starts_at=starts_at, ends_at=ends_at)
+        
+        async with calendar_slot(starts_at, ends_at):
+            if not allow_overlap:
+                conflict = await find_conflict(starts_at, ends_at, exclude_id=appointment_id)
+                if conflict:
+                    raise conflict_error(conflict)
+            result = await db.appointments.update_one(
+                {"id": appointment_id},
+                {"$set": appointment_dict, "$inc": {"version": 1}}
+            )
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Appointment not found")
+        if result.modified_count:
+            await bump_versions(db, "appointments")
+            dashboard_stats_cache.invalidate()
             
         updated_appointment = await db.appointments.find_one({"id": appointment_id})
+        if result.modified_count:
+            notify_portal("appointments", "updated", updated_appointment)
         return Appointment(**updated_appointment)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+SCHEDULE_FIELDS = ("appointment_date", "appointment_time", "duration_minutes")
+
+@api_router.patch("/appointments/{appointment_id}", response_model=Appointment)
+async def patch_appointment(request: Request, appointment_id: str, appointment_patch: AppointmentPatch,
+                            allow_overlap: bool = False):
+    """Update only the fields sent; a new slot is checked for overlaps like PUT, `If-Match` like other PATCHes"""
+    try:
+        version = if_match_version(request)
+        sent = appointment_patch.dict(exclude_unset=True)
+        changes = patch_changes(appointment_patch)
+        projection = projection_for(Appointment)
+        if not any(field in changes for field in SCHEDULE_FIELDS):
+            updated = await patch_record(db.appointments, appointment_id, changes, version,
+                                         projection=projection, not_found="Appointment not found")
+        else:
+            # La franja se recalcula con los campos de horario que no se enviaron
+            current = await db.appointments.find_one(
+                {"id": appointment_id}, {"_id": 0, **{field: 1 for field in SCHEDULE_FIELDS}}
+            )
+            if not current:
+                raise HTTPException(status_code=404, detail="Appointment not found")
+            merged = {**current, **sent}
+            window = appointment_window(merged.get("appointment_date"), merged.get("appointment_time"),
+                                        merged.get("duration_minutes") or 60)
+            if window is None:
+                raise HTTPException(status_code=422,
+                                    detail="appointment_date must be a date and appointment_time a HH:MM time")
+            changes.update(starts_at=window[0], ends_at=window[1])
+            async with calendar_slot(*window):
+                if not allow_overlap:
+                    conflict = await find_conflict(*window, exclude_id=appointment_id)
+                    if conflict:
+                        raise conflict_error(conflict)
+                updated = await patch_record(
+                    db.appointments, appointment_id, changes, version,
+                    {field: current.get(field) for field in SCHEDULE_FIELDS}, projection, "Appointment not found"
+                )
+        await bump_versions(db, "appointments")
+        if "appointment_date" in changes:
+            dashboard_stats_cache.invalidate()
+        notify_portal("appointments", "updated", updated)
+        return record_validators(updated).apply(validated_response(Appointment, updated))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.put("/appointments/{appointment_id}/complete")
 async def complete_appointment(appointment_id: str, notes: Optional[str] = None):
     """Mark appointment as completed"""
@@ -601,13 +1760,18 @@ async def complete_appointment(appointment_id: str, notes: Optional[str] = None)
         if notes:
             update_data["notes"] = notes
             
-        result = await db.appointments.update_one(
+        previous = await db.appointments.find_one_and_update(
             {"id": appointment_id},
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection={"id": 1, "client_id": 1, "case_id": 1, "is_completed": 1, "notes": 1}
         )
         
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(status_code=404, detail="Appointment not found")
+        if any(previous.get(key) != value for key, value in update_data.items()):
+            await bump_versions(db, "appointments")
+            dashboard_stats_cache.invalidate()
+            notify_portal("appointments", "updated", previous)
             
         return {"message": "Appointment marked as completed"}
     except HTTPException:
@@ -619,9 +1783,16 @@ async def complete_appointment(appointment_id: str, notes: Optional[str] = None)
 async def delete_appointment(appointment_id: str):
     """Delete an appointment"""
     try:
-        result = await db.appointments.delete_one({"id": appointment_id})
-        if result.deleted_count == 0:
+        deleted = await db.appointments.find_one_and_delete(
+            {"id": appointment_id},
+            projection={"id": 1, "client_id": 1, "case_id": 1, "appointment_date": 1, "is_completed": 1}
+        )
+        if not deleted:
             raise HTTPException(status_code=404, detail="Appointment not found")
+        await bump_versions(db, "appointments")
+        notify_portal("appointments", "deleted", deleted)
+        if _is_upcoming(deleted.get("appointment_date", ""), deleted.get("is_completed", False)):
+            dashboard_stats_cache.incr("upcoming_appointments", -1)
         return {"message": "Appointment deleted successfully"}
     except HTTPException:
         raise
@@ -646,16 +1817,22 @@ async def create_case_update(update: CaseUpdateCreate):
         update_obj = CaseUpdate(**update_dict)
         update_data = prepare_for_mongo(update_obj.dict())
         await db.case_updates.insert_one(update_data)
+        await bump_versions(db, "case_updates")
+        notify_portal("case_updates", "created", update_data)
         return update_obj
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/case-updates", response_model=List[CaseUpdate])
-async def get_case_updates(case_id: Optional[str] = None, client_id: Optional[str] = None):
-    """Get case updates with optional filtering"""
+@api_router.get("/case-updates", response_model=Page[CaseUpdate])
+async def get_case_updates(request: Request, case_id: Optional[str] = None, client_id: Optional[str] = None,
+                           limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), cursor: Optional[str] = None):
+    """Get case updates with optional filtering, one keyset page at a time"""
     try:
+        validators = await read_validators(request, "case_updates")
+        if validators.matches(request):
+            return validators.not_modified()
         filter_query = {}
         
         if case_id:
@@ -664,8 +1841,14 @@ async def get_case_updates(case_id: Optional[str] = None, client_id: Optional[st
         if client_id:
             filter_query["client_id"] = client_id
         
-        updates = await db.case_updates.find(filter_query).sort("created_at", -1).to_list(1000)
-        return [CaseUpdate(**update) for update in updates]
+        updates, next_cursor = await fetch_page(
+            db.case_updates, filter_query, "created_at", -1, limit, cursor, projection_for(CaseUpdate)
+        )
+        return validators.apply(
+            validated_response(Page[CaseUpdate], {"items": updates, "limit": limit, "next_cursor": next_cursor})
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -673,9 +1856,13 @@ async def get_case_updates(case_id: Optional[str] = None, client_id: Optional[st
 async def delete_case_update(update_id: str):
     """Delete a case update"""
     try:
-        result = await db.case_updates.delete_one({"id": update_id})
-        if result.deleted_count == 0:
+        deleted = await db.case_updates.find_one_and_delete(
+            {"id": update_id}, projection={"id": 1, "client_id": 1, "case_id": 1}
+        )
+        if not deleted:
             raise HTTPException(status_code=404, detail="Case update not found")
+        await bump_versions(db, "case_updates")
+        notify_portal("case_updates", "deleted", deleted)
         return {"message": "Case update deleted successfully"}
     except HTTPException:
         raise
@@ -683,156 +1870,702 @@ async def delete_case_update(update_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Client Portal APIs
+def portal_token(request: Request) -> Optional[str]:
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    return credentials.strip() if scheme.lower() == "bearer" and credentials.strip() else None
+
+def authorize_portal(token: Optional[str], client_id: Optional[str] = None,
+                     purpose: Optional[str] = None) -> PortalSession:
+    """Check a portal token (signature, expiry, revocation) without touching the database"""
+    try:
+        session = portal_sessions.authenticate(token, purpose)
+    except InvalidSession as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    if client_id is not None and session.client_id != client_id:
+        raise HTTPException(status_code=403, detail="Session does not belong to this client")
+    return session
+
+async def portal_session(request: Request, client_id: str) -> PortalSession:
+    """Dependency for /client/{client_id}/... routes: the bearer token must belong to that client"""
+    return authorize_portal(portal_token(request), client_id)
+
+async def portal_stream_session(request: Request, client_id: str,
+                                stream_token: Optional[str] = None) -> PortalSession:
+    """Same for EventSource, which cannot send headers: it brings a stream token as `?stream_token=`"""
+    if stream_token is None:
+        return authorize_portal(portal_token(request), client_id)
+    return authorize_portal(stream_token, client_id, STREAM_PURPOSE)
+
+def portal_cache_headers(validators: ReadValidators) -> ReadValidators:
+    # Respuestas por sesión: nunca en cachés compartidas, y la del navegador separada por token
+    validators.headers["Vary"] = "Authorization"
+    return validators
+
 @api_router.post("/client/login")
 async def client_login(login_data: ClientLogin):
-    """Simple client authentication using email and phone"""
+    """Authenticate a client by email and phone and issue a signed portal session token"""
     try:
-        # Find client by email and phone (using phone as simple password)
-        client = await db.clients.find_one({
-            "email": login_data.email,
-            "phone": login_data.phone
-        })
-        
-        if not client:
+        # Búsqueda por el índice único de email; el teléfono se compara aquí en tiempo constante
+        client = await db.clients.find_one(
+            {"email": login_data.email}, {"_id": 0, "id": 1, "first_name": 1, "last_name": 1, "phone": 1}
+        )
+        if not client or not hmac.compare_digest(str(client.get("phone", "")).encode(), login_data.phone.encode()):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        # Return basic client info for session (in real app, use JWT tokens)
+        token, session = portal_sessions.issue(client["id"])
         return {
             "message": "Login successful",
             "client_id": client["id"],
-            "client_name": f"{client['first_name']} {client['last_name']}"
+            "client_name": f"{client['first_name']} {client['last_name']}",
+            "token": token,
+            "token_type": "bearer",
+            "expires_at": datetime.fromtimestamp(session.expires_at, timezone.utc),
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/client/dashboard/{client_id}", response_model=ClientDashboard)
-async def get_client_dashboard(client_id: str):
+@api_router.post("/client/logout")
+async def client_logout(request: Request):
+    """Revoke the portal session the request's token belongs to"""
+    session = authorize_portal(portal_token(request))
+    await portal_sessions.revoke_session(session)
+    return {"message": "Logout successful"}
+
+@api_router.get("/client/dashboard/{client_id}", response_model=ClientDashboard,
+                dependencies=[Depends(portal_session)])
+async def get_client_dashboard(request: Request, client_id: str):
     """Get client's personalized dashboard"""
     try:
-        # Get client info
-        client = await db.clients.find_one({"id": client_id})
+        validators = portal_cache_headers(await read_validators(
+            request, "clients", "cases", "case_updates", "appointments", "documents"
+        ))
+        if validators.matches(request):
+            return validators.not_modified()
+        # The five reads are independent: run them concurrently
+        client, active_cases, recent_updates, upcoming_appointments, total_documents = await asyncio.gather(
+            db.clients.find_one({"id": client_id}, projection_for(PortalClient)),
+            db.cases.find({
+                "client_id": client_id,
+                "status": {"$in": ["active", "pending"]}
+            }, projection_for(PortalCase)).sort("created_at", -1).to_list(100),
+            db.case_updates.find({
+                "client_id": client_id,
+                "is_visible_to_client": True
+            }, projection_for(PortalCaseUpdate)).sort("created_at", -1).limit(10).to_list(10),
+            db.appointments.find({
+                "client_id": client_id,
+                **date_range("appointment_date", gte=start_of_today()),
+                "is_completed": False
+            }, projection_for(PortalAppointment)).sort("appointment_date", 1).limit(5).to_list(5),
+            db.documents.count_documents({"client_id": client_id}),
+        )
         if not client:
             raise HTTPException(status_code=404, detail="Client not found")
         
-        # Get client's active cases
-        active_cases = await db.cases.find({
-            "client_id": client_id,
-            "status": {"$in": ["active", "pending"]}
-        }).sort("created_at", -1).to_list(100)
-        
-        # Get recent updates for client (only visible ones)
-        recent_updates = await db.case_updates.find({
-            "client_id": client_id,
-            "is_visible_to_client": True
-        }).sort("created_at", -1).limit(10).to_list(10)
-        
-        # Get upcoming appointments
-        today = datetime.now(timezone.utc).date().isoformat()
-        upcoming_appointments = await db.appointments.find({
-            "client_id": client_id,
-            "appointment_date": {"$gte": today},
-            "is_completed": False
-        }).sort("appointment_date", 1).limit(5).to_list(5)
-        
-        # Get document count
-        total_documents = await db.documents.count_documents({"client_id": client_id})
-        
-        return ClientDashboard(
-            client_info=Client(**client),
-            active_cases=[Case(**case) for case in active_cases],
-            recent_updates=[CaseUpdate(**update) for update in recent_updates],
-            upcoming_appointments=[Appointment(**appointment) for appointment in upcoming_appointments],
-            total_documents=total_documents
-        )
+        for doc in active_cases + upcoming_appointments:
+            format_days(doc)
+        return TrustedJSONResponse({
+            "client_info": client,
+            "active_cases": active_cases,
+            "recent_updates": recent_updates,
+            "upcoming_appointments": upcoming_appointments,
+            "total_documents": total_documents,
+        }, headers=validators.headers)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/client/{client_id}/case-timeline/{case_id}")
-async def get_case_timeline(client_id: str, case_id: str):
+@api_router.get("/client/{client_id}/case-timeline/{case_id}", dependencies=[Depends(portal_session)])
+async def get_case_timeline(request: Request, client_id: str, case_id: str):
     """Get timeline of updates for a specific case (client view)"""
     try:
-        # Verify the case belongs to this client
-        case = await db.cases.find_one({"id": case_id, "client_id": client_id})
+        validators = portal_cache_headers(await read_validators(
+            request, "cases", "case_updates", "appointments", "documents"
+        ))
+        if validators.matches(request):
+            return validators.not_modified()
+        case, updates, appointments, documents = await asyncio.gather(
+            # Verify the case belongs to this client
+            db.cases.find_one({"id": case_id, "client_id": client_id}, {"_id": 0}),
+            # Get case updates (only visible to client)
+            db.case_updates.find({
+                "case_id": case_id,
+                "client_id": client_id,
+                "is_visible_to_client": True
+            }, {"_id": 0}).sort("created_at", -1).to_list(100),
+            db.appointments.find({
+                "case_id": case_id,
+                "client_id": client_id
+            }, {"_id": 0}).sort("appointment_date", -1).to_list(100),
+            db.documents.find({
+                "case_id": case_id,
+                "client_id": client_id
+            }, {"_id": 0}).sort("uploaded_at", -1).to_list(100),
+        )
         if not case:
             raise HTTPException(status_code=404, detail="Case not found or access denied")
         
-        # Get case updates (only visible to client)
-        updates = await db.case_updates.find({
-            "case_id": case_id,
-            "client_id": client_id,
-            "is_visible_to_client": True
-        }).sort("created_at", -1).to_list(100)
-        
-        # Get case appointments
-        appointments = await db.appointments.find({
-            "case_id": case_id,
-            "client_id": client_id
-        }).sort("appointment_date", -1).to_list(100)
-        
-        # Get case documents
-        documents = await db.documents.find({
-            "case_id": case_id,
-            "client_id": client_id
-        }).sort("uploaded_at", -1).to_list(100)
-        
-        return {
-            "case": Case(**case),
-            "updates": [CaseUpdate(**update) for update in updates],
-            "appointments": [Appointment(**appointment) for appointment in appointments],
-            "documents": [Document(**doc) for doc in documents]
+        for doc in [case] + appointments:
+            format_days(doc)
+        return TrustedJSONResponse({
+            "case": case,
+            "updates": updates,
+            "appointments": appointments,
+            "documents": documents
+        }, headers=validators.headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/client/{client_id}/documents/{document_id}/download", dependencies=[Depends(portal_session)])
+async def download_client_document(request: Request, client_id: str, document_id: str, attachment: bool = False):
+    """Serve one of the client's own documents (client view)"""
+    try:
+        response = await serve_document(request, {"id": document_id, "client_id": client_id}, attachment)
+        response.headers["Vary"] = "Authorization"
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/client/{client_id}/events/token")
+async def issue_stream_token(session: PortalSession = Depends(portal_session)):
+    """Short-lived token for opening the event stream, so the session token never goes in a URL"""
+    token, expires_in = portal_sessions.issue_stream(session)
+    return {"stream_token": token, "expires_in": expires_in}
+
+@api_router.get("/client/{client_id}/events", dependencies=[Depends(portal_stream_session)])
+async def stream_client_events(client_id: str):
+    """Server-sent events announcing new case updates and appointment changes for the client"""
+    try:
+        # El token ya acredita al cliente: borrar un cliente revoca sus sesiones
+        subscription = portal_broker.subscribe(client_id)
+    except ConnectionLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # The background task also releases the slot if the client leaves before the first event
+    return StreamingResponse(
+        portal_events.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(subscription.close),
+    )
+
+# Bulk import
+IMPORT_MODELS = {
+    "clients": (ClientCreate, Client),
+    "cases": (CaseCreate, Case),
+    "appointments": (AppointmentCreate, Appointment),
+}
+
+def _csv_chunks_to_records(pending: str):
+    """Split off the complete CSV records in `pending`.
+
+    A record is complete at a newline outside quotes, so quoted fields with
+    embedded newlines survive chunk boundaries. Returns `(complete, rest)`.
+    """
+    in_quotes = False
+    cut = 0
+    for i, ch in enumerate(pending):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif ch == "\n" and not in_quotes:
+            cut = i + 1
+    return pending[:cut], pending[cut:]
+
+async def iter_csv_rows(request: Request):
+    """Yield CSV rows as dicts while the request body is still streaming in"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    header = None
+    pending = ""
+
+    def parse(text):
+        nonlocal header
+        for values in csv.reader(io.StringIO(text)):
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            # Empty cells fall back to model defaults
+            yield {k: v for k, v in zip(header, values) if v != ""}
+
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        complete, pending = _csv_chunks_to_records(pending)
+        for row in parse(complete):
+            yield row
+    for row in parse(pending + decoder.decode(b"", final=True)):
+        yield row
+
+async def iter_json_rows(request: Request):
+    try:
+        rows = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array")
+    for row in rows:
+        yield row if isinstance(row, dict) else {}
+
+def _format_validation_error(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+async def import_batch(resource: str, batch: List[tuple], report: ImportReport):
+    """Validate and insert one batch; failures are recorded per row"""
+    create_model, model = IMPORT_MODELS[resource]
+    valid = []
+    for row_number, row in batch:
+        try:
+            valid.append((row_number, model(**create_model(**row).dict())))
+        except ValidationError as e:
+            report.errors.append(ImportRowError(row=row_number, errors=_format_validation_error(e)))
+
+    if resource != "clients" and valid:
+        client_ids = list({obj.client_id for _, obj in valid})
+        existing = {
+            doc["id"] async for doc in db.clients.find({"id": {"$in": client_ids}}, {"_id": 0, "id": 1})
         }
+        checked = []
+        for row_number, obj in valid:
+            if obj.client_id in existing:
+                checked.append((row_number, obj))
+            else:
+                report.errors.append(ImportRowError(row=row_number, errors=["client_id: Client not found"]))
+        valid = checked
+
+    if not valid:
+        return
+    documents = []
+    for _, obj in valid:
+        data = prepare_for_mongo(obj.dict())
+        if resource == "clients":
+            data.update(build_search_fields(data))
+        elif resource == "cases" and data.get("total_hours"):
+            # Igual que create_case: las horas importadas abren el libro de horas del caso
+            data["billed_amount"] = entry_amount(data["total_hours"], data.get("hourly_rate"))
+        documents.append(data)
+    inserted = documents
+    try:
+        result = await db[resource].insert_many(documents, ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        report.inserted += e.details.get("nInserted", 0)
+        failed = set()
+        for write_error in e.details.get("writeErrors", []):
+            failed.add(write_error["index"])
+            row_number = valid[write_error["index"]][0]
+            report.errors.append(ImportRowError(row=row_number, errors=[write_error.get("errmsg", "Write failed")]))
+        inserted = [doc for index, doc in enumerate(documents) if index not in failed]
+    finally:
+        await bump_versions(db, resource)
+    if resource == "cases" and await time_ledger.open_cases(db, inserted):
+        await bump_versions(db, TIME_ENTRIES)
+
+@api_router.post("/import/{resource}", response_model=ImportReport)
+async def bulk_import(request: Request, resource: str):
+    """Bulk import clients, cases or appointments from a JSON array or CSV body.
+
+    Rows are validated and inserted in batches of IMPORT_BATCH_SIZE with
+    unordered writes; invalid rows are reported instead of failing the
+    whole request. Send CSV with `Content-Type: text/csv` (header row
+    required); anything else is read as a JSON array.
+    """
+    try:
+        if resource not in IMPORT_MODELS:
+            raise HTTPException(status_code=404, detail="Unknown import resource")
+
+        content_type = request.headers.get("content-type", "")
+        rows = iter_csv_rows(request) if content_type.startswith("text/csv") else iter_json_rows(request)
+
+        report = ImportReport(received=0, inserted=0, failed=0, errors=[])
+        batch = []
+        async for row in rows:
+            report.received += 1
+            batch.append((report.received, row))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                await import_batch(resource, batch, report)
+                batch = []
+        await import_batch(resource, batch, report)
+
+        report.failed = len(report.errors)
+        report.errors.sort(key=lambda e: e.row)
+        dashboard_stats_cache.invalidate()
+        return report
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Exports
+@api_router.get("/export/clients")
+async def export_clients(
+    status: Optional[str] = None,
+    format: ExportFormat = ExportFormat.NDJSON,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE)
+):
+    """Stream all clients as NDJSON or CSV"""
+    filter_query = {}
+    if status:
+        filter_query["status"] = status
+    return export_response(db.clients, filter_query, list(Client.model_fields), "clients", format, batch_size)
+
+@api_router.get("/export/cases")
+async def export_cases(
+    client_id: Optional[str] = None,
+    status: Optional[str] = None,
+    format: ExportFormat = ExportFormat.NDJSON,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE)
+):
+    """Stream all cases as NDJSON or CSV"""
+    filter_query = {}
+    if client_id:
+        filter_query["client_id"] = client_id
+    if status:
+        filter_query["status"] = status
+    return export_response(db.cases, filter_query, list(Case.model_fields), "cases", format, batch_size)
+
+@api_router.get("/export/documents")
+async def export_documents(
+    client_id: Optional[str] = None,
+    case_id: Optional[str] = None,
+    format: ExportFormat = ExportFormat.NDJSON,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE)
+):
+    """Stream document metadata as NDJSON or CSV"""
+    filter_query = {}
+    if client_id:
+        filter_query["client_id"] = client_id
+    if case_id:
+        filter_query["case_id"] = case_id
+    return export_response(db.documents, filter_query, list(Document.model_fields), "documents", format, batch_size)
+
+# Analytics (reads only the precomputed rollups)
+ANALYTICS_DIMENSIONS = {"case_type": "case_type", "status": "status", "client": "client_id", "month": "month"}
+ANALYTICS_SORTS = {
+    "revenue": [("revenue", -1), ("key", 1)],
+    "cases": [("cases", -1), ("key", 1)],
+    "billed_hours": [("billed_hours", -1), ("key", 1)],
+    "key": [("key", 1)],
+}
+
+@api_router.get("/analytics/summary", response_model=AnalyticsSummary)
+async def get_analytics_summary(request: Request):
+    """Firm-wide totals with the breakdown by status and by case type"""
+    try:
+        validators = await read_validators(request, ROLLUPS_COLLECTION)
+        if validators.matches(request):
+            return validators.not_modified()
+        rows = await db[ROLLUPS_COLLECTION].find(
+            {"dimension": {"$in": ["status", "case_type"]}}, projection_for(AnalyticsRollup)
+        ).sort([("dimension", 1), ("key", 1)]).to_list(None)
+        by_status = [row for row in rows if row["dimension"] == "status"]
+        totals = {field: sum(row[field] for row in by_status) for field in AnalyticsTotals.model_fields}
+        totals = {field: round(value, 2) if isinstance(value, float) else value for field, value in totals.items()}
+        return validators.apply(validated_response(AnalyticsSummary, {
+            "totals": totals,
+            "by_status": by_status,
+            "by_case_type": [row for row in rows if row["dimension"] == "case_type"],
+            "refreshed_at": max((row["refreshed_at"] for row in rows), default=None),
+        }))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/analytics/{dimension}", response_model=List[AnalyticsRollup])
+async def get_analytics(request: Request, dimension: str, sort: str = "revenue",
+                        start: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}$"),
+                        end: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}$"),
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """Revenue, billed hours and case counts by case_type, status, client or month; `from`/`to` are months"""
+    try:
+        if dimension not in ANALYTICS_DIMENSIONS:
+            raise HTTPException(status_code=404, detail=f"Unknown dimension. Available: {list(ANALYTICS_DIMENSIONS)}")
+        if sort not in ANALYTICS_SORTS:
+            raise HTTPException(status_code=400, detail=f"sort must be one of {list(ANALYTICS_SORTS)}")
+        validators = await read_validators(request, ROLLUPS_COLLECTION)
+        if validators.matches(request):
+            return validators.not_modified()
+        filter_query: Dict[str, Any] = {"dimension": ANALYTICS_DIMENSIONS[dimension]}
+        if dimension == "month" and (start or end):
+            filter_query["key"] = {**({"$gte": start} if start else {}), **({"$lte": end} if end else {})}
+        rows = await db[ROLLUPS_COLLECTION].find(filter_query, projection_for(AnalyticsRollup)).sort(
+            ANALYTICS_SORTS[sort]
+        ).limit(limit).to_list(limit)
+        return validators.apply(validated_response(List[AnalyticsRollup], rows))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Background jobs
+job_runner = JobRunner(db.jobs, max_concurrency=int(os.environ.get('JOB_CONCURRENCY', '2')))
+
+async def job_migrate_dashboard(ctx: JobContext):
+    """Copy, dry-run or verify collections between databases"""
+    params = ctx.params
+    done = {}
+
+    async def on_progress(name, migrated, elapsed):
+        done[name] = migrated
+        await ctx.progress(sum(done.values()), message=f"{name}: {migrated}")
+
+    summary = await migration_engine.run(
+        client[params.get("source_db", "dashboard_etica")],
+        client[params.get("target_db", "legaldesk")],
+        mode=params.get("mode", "migrate"),
+        batch_size=int(params.get("batch_size", migration_engine.DEFAULT_BATCH_SIZE)),
+        resume=bool(params.get("resume", True)),
+        on_progress=on_progress,
+    )
+    if summary["mode"] == "migrate":
+        dashboard_stats_cache.invalidate()
+    return summary
+
+async def job_backfill_client_search(ctx: JobContext):
+    """Rebuild search keys for every client"""
+    total = await db.clients.estimated_document_count()
+    updated = await backfill_search_fields(
+        db.clients,
+        int(ctx.params.get("batch_size", 1000)),
+        on_progress=lambda n: ctx.progress(n, total),
+    )
+    if updated:
+        await bump_versions(db, "clients")
+    return {"updated": updated}
+
+async def job_backfill_dates(ctx: JobContext):
+    """Convert dates stored as ISO text to native BSON dates"""
+    summary = await backfill_dates(
+        db,
+        int(ctx.params.get("batch_size", 1000)),
+        on_progress=lambda name, n: ctx.progress(n, message=name),
+    )
+    # Las filas convertidas empiezan a entrar en filtros por fecha: invalidar ETags
+    await bump_versions(db, *(name for name, counts in summary.items() if counts["converted"]))
+    dashboard_stats_cache.invalidate()
+    return summary
+
+async def job_backfill_calendar(ctx: JobContext):
+    """Compute starts_at / ends_at for appointments created before the calendar index"""
+    total = await db.appointments.count_documents({"starts_at": None})
+    result = await backfill_windows(
+        db.appointments,
+        int(ctx.params.get("batch_size", 1000)),
+        on_progress=lambda n: ctx.progress(n, total),
+    )
+    # Las citas con ventana recién calculada empiezan a salir en /api/calendar
+    if result["updated"]:
+        await bump_versions(db, "appointments")
+    return result
+
+# Collections and filter keys a bulk-delete job may use
+BULK_DELETE_FILTERS = {
+    "clients": {"status"},
+    "cases": {"client_id", "status"},
+    "documents": {"client_id", "case_id"},
+    "appointments": {"client_id", "case_id", "is_completed"},
+    "case_updates": {"client_id", "case_id"},
+}
+
+def validate_bulk_delete(params: Dict[str, Any]):
+    collection = params.get("collection")
+    if collection not in BULK_DELETE_FILTERS:
+        raise ValueError(f"collection must be one of {sorted(BULK_DELETE_FILTERS)}")
+    filter_query = params.get("filter") or {}
+    if not filter_query:
+        raise ValueError("filter must not be empty")
+    unknown = set(filter_query) - BULK_DELETE_FILTERS[collection]
+    if unknown:
+        raise ValueError(f"unsupported filter keys: {sorted(unknown)}")
+
+async def job_bulk_delete(ctx: JobContext):
+    """Delete matching records in batches by id; clients and cases cascade to their dependents"""
+    collection_name = ctx.params["collection"]
+    filter_query = ctx.params["filter"]
+    batch_size = int(ctx.params.get("batch_size", 1000))
+    collection = db[collection_name]
+
+    total = await collection.count_documents(filter_query)
+    deleted = 0
+    dependents = {}
+    if collection_name == "documents":
+        deleted = await delete_documents(
+            db, uploads_dir, filter_query, batch_size, on_progress=lambda n: ctx.progress(n, total)
+        )
+    else:
+        while True:
+            batch = await collection.find(filter_query, {"_id": 0, "id": 1}).limit(batch_size).to_list(batch_size)
+            if not batch:
+                break
+            if collection_name in DEPENDENTS:
+                for doc in batch:
+                    parent, counts = await cascade_delete(db, uploads_dir, collection_name, doc["id"])
+                    deleted += 1 if parent else 0
+                    for name, count in counts.items():
+                        dependents[name] = dependents.get(name, 0) + count
+            else:
+                result = await collection.delete_many({"id": {"$in": [doc["id"] for doc in batch]}})
+                deleted += result.deleted_count
+            await ctx.progress(deleted, total)
+    await bump_versions(db, collection_name, *dependents)
+    dashboard_stats_cache.invalidate()
+    return {"deleted": deleted, "dependents": dependents}
+
+async def job_sweep_orphans(ctx: JobContext):
+    """Reclaim records, blobs and files left behind by earlier deletes"""
+    stages = len(orphan_sweeper.PARENT_KEYS) + 2
+    done = 0
+
+    async def on_progress(message):
+        nonlocal done
+        done += 1
+        await ctx.progress(done, stages, message=message, force=True)
+
+    summary = await orphan_sweeper.sweep(
+        db,
+        uploads_dir,
+        dry_run=bool(ctx.params.get("dry_run", False)),
+        batch_size=int(ctx.params.get("batch_size", orphan_sweeper.BATCH_SIZE)),
+        grace_seconds=int(ctx.params.get("grace_seconds", orphan_sweeper.GRACE_SECONDS)),
+        on_progress=on_progress,
+    )
+    if not summary["dry_run"]:
+        dashboard_stats_cache.invalidate()
+    return summary
+
+async def job_refresh_analytics(ctx: JobContext):
+    """Fold changed cases into the analytics rollups; `{"rebuild": true}` recomputes them all"""
+    if ctx.params.get("rebuild"):
+        result = await case_analytics.rebuild(db)
+    else:
+        result = await case_analytics.refresh(db, int(ctx.params.get("batch_size", 1000)))
+    await bump_versions(db, ROLLUPS_COLLECTION)
+    return result
+
+async def job_reconcile_time(ctx: JobContext):
+    """Recompute case and lawyer hour totals from the time-entry ledger; `{"dry_run": true}` only reports"""
+    dry_run = bool(ctx.params.get("dry_run", False))
+    result = await time_ledger.reconcile(db, dry_run=dry_run, batch_size=int(ctx.params.get("batch_size", 1000)))
+    if not dry_run:
+        await bump_versions(db, "cases", TIME_ENTRIES)
+    return result
+
+job_runner.register("migrate-dashboard", job_migrate_dashboard)
+job_runner.register("backfill-client-search", job_backfill_client_search)
+job_runner.register("backfill-dates", job_backfill_dates)
+job_runner.register("backfill-calendar", job_backfill_calendar)
+job_runner.register("bulk-delete", job_bulk_delete)
+job_runner.register("sweep-orphans", job_sweep_orphans)
+job_runner.register("refresh-analytics", job_refresh_analytics)
+job_runner.register("reconcile-time", job_reconcile_time)
+
+JOB_VALIDATORS = {
+    "bulk-delete": validate_bulk_delete,
+}
+
+@api_router.get("/admin/jobs", response_model=List[Job])
+async def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    """List recent background jobs"""
+    try:
+        return await job_runner.list(limit=limit, status=status)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/admin/jobs/{kind}", response_model=Job, status_code=202)
+async def submit_job(kind: str, params: Dict[str, Any] = Body(default={})):
+    """Queue a background job; poll GET /admin/jobs/{id} for progress"""
+    try:
+        if kind not in job_runner.kinds:
+            raise HTTPException(status_code=404, detail=f"Unknown job kind. Available: {job_runner.kinds}")
+        if kind in JOB_VALIDATORS:
+            try:
+                JOB_VALIDATORS[kind](params)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        return await job_runner.submit(kind, params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/admin/jobs/{job_id}", response_model=Job)
+async def get_job(job_id: str):
+    """Get a background job's status, progress and result"""
+    try:
+        job = await job_runner.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/admin/jobs/{job_id}/cancel", response_model=Job)
+async def cancel_job(job_id: str):
+    """Cancel a queued or running background job"""
+    try:
+        job = await job_runner.cancel(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Admin: migrar datos de dashboard_etica a legaldesk
-@api_router.post("/admin/migrate-dashboard-to-legaldesk")
-async def admin_migrate_dashboard_to_legaldesk(source_db: str = "dashboard_etica", target_db: str = "legaldesk"):
-    try:
-        aux_client = AsyncIOMotorClient(os.environ['MONGO_URL'])
-        src = aux_client[source_db]
-        tgt = aux_client[target_db]
-        collections = ["clients", "cases", "documents", "appointments", "case_updates"]
-        results = {}
-
-        async def migrate_collection(src_col, tgt_col):
-            migrated = 0
-            async for doc in src_col.find({}):
-                filter_doc = {"id": doc["id"]} if "id" in doc else {"_id": doc.get("_id")}
-                await tgt_col.replace_one(filter_doc, doc, upsert=True)
-                migrated += 1
-            return migrated
-
-        for name in collections:
-            src_col = src[name]
-            tgt_col = tgt[name]
-            source_count = await src_col.count_documents({})
-            migrated = await migrate_collection(src_col, tgt_col)
-            target_count = await tgt_col.count_documents({})
-            results[name] = {
-                "source_count": source_count,
-                "migrated": migrated,
-                "target_count": target_count,
-            }
-
-        aux_client.close()
-        return {
-            "status": "ok",
+@api_router.post("/admin/migrate-dashboard-to-legaldesk", response_model=Job, status_code=202)
+async def admin_migrate_dashboard_to_legaldesk(
+    source_db: str = "dashboard_etica",
+    target_db: str = "legaldesk",
+    mode: str = Query("migrate", pattern="^(migrate|dry-run|verify)$"),
+    batch_size: int = Query(migration_engine.DEFAULT_BATCH_SIZE, ge=1, le=10000),
+    resume: bool = True,
+):
+    """Queue a migrate, dry-run or verify job between databases"""
+    try:
+        return await job_runner.submit("migrate-dashboard", {
             "source_db": source_db,
             "target_db": target_db,
-            "collections": results,
-        }
+            "mode": mode,
+            "batch_size": batch_size,
+            "resume": resume,
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is up and serving; touches no dependency"""
+    return FastJSONResponse({"status": "ok", "uptime_s": round(readiness.uptime(), 1)})
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: Mongo ping and uploads disk, cached for READY_CACHE_SECONDS; 503 when not ready"""
+    ready, body = await readiness.status()
+    return FastJSONResponse(body, status_code=200 if ready else 503, headers={"Cache-Control": "no-store"})
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus text exposition of this process's request, upload and Mongo metrics"""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Include the router in the main app
-app.include_router(api_router)
+app.include_router(api_router, default_response_class=FastJSONResponse)
 
+# Antes que CORS, para que los 413 también lleven sus cabeceras
+app.add_middleware(UploadSizeLimitMiddleware)
 cors_origins = os.environ.get('CORS_ORIGINS', '*').split(',')
 cors_origin_regex = os.environ.get('CORS_ORIGIN_REGEX')
 
@@ -844,6 +2577,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Configure logging
 logging.basicConfig(
@@ -852,3 +2586,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class RedactStreamTokens(logging.Filter):
+    """Mask `stream_token=` in access log lines: the token is short-lived, but still a credential"""
+
+    PATTERN = re.compile(r"(stream_token=)[^&\s]*")
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.args, tuple):
+            record.args = tuple(
+                self.PATTERN.sub(r"\1***", arg) if isinstance(arg, str) else arg for arg in record.args
+            )
+        return True
+
+logging.getLogger("uvicorn.access").addFilter(RedactStreamTokens())
+
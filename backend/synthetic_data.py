@@ -0,0 +1,236 @@
+"""Deterministic synthetic law-firm dataset for benchmarks and load tests.
+
+`size` is the number of clients; the rest follows ratios taken from the
+production data shape:
+
+  cases          0-4 per client (mean 2): 45% active, 20% pending, 30% closed, 5% on hold
+  case_updates   1-9 per case (mean 5), 15% hidden from the client
+  appointments   0-3 per case (mean 1.5), from a year ago to three months ahead
+  documents      0-6 per case (mean 3), 20 KB - 5 MB of metadata only (no files)
+
+so 1k clients is roughly 23k documents in total and 1M clients about 23M.
+Rows are written in the same shape the API writes them (native dates,
+search keys, appointment windows) and the same `seed` always yields the same
+data. Seeding is skipped when the database already holds that dataset.
+
+    MONGO_URL=... BENCH_SIZE=100000 python synthetic_data.py
+"""
+import os
+import time
+import uuid
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from appointment_calendar import appointment_window
+from client_search import build_search_fields
+from ensure_indexes import ensure_all
+from temporal import parse_day
+
+GENERATOR_VERSION = 1
+META_COLLECTION = "bench_meta"
+COLLECTIONS = ("clients", "cases", "case_updates", "appointments", "documents")
+
+FIRST_NAMES = ["María", "José", "Juan", "Ana", "Lucía", "Sofía", "Martín", "Andrés", "Ramón", "Inés",
+               "Carmen", "Jesús", "Raúl", "Begoña", "Íñigo", "Pilar", "Álvaro", "Nuria", "Óscar", "Elena",
+               "Francisco", "Antonio", "Manuel", "Isabel", "Dolores", "Javier", "Cristina", "Sergio", "Rocío", "Ángel"]
+LAST_NAMES = ["García", "Martínez", "López", "Sánchez", "Pérez", "Gómez", "Fernández", "Rodríguez", "Díaz",
+              "Muñoz", "Álvarez", "Romero", "Núñez", "Ibáñez", "Castaño", "Peña", "Ortiz", "Rubio", "Jiménez",
+              "Ruiz", "Hernández", "Moreno", "Navarro", "Domínguez", "Vázquez", "Ramos", "Gil", "Serrano"]
+CITIES = [("Madrid", "Madrid", "28"), ("Barcelona", "Barcelona", "08"), ("Valencia", "Valencia", "46"),
+          ("Sevilla", "Sevilla", "41"), ("Zaragoza", "Zaragoza", "50"), ("Málaga", "Málaga", "29"),
+          ("Bilbao", "Bizkaia", "48"), ("A Coruña", "A Coruña", "15"), ("Valladolid", "Valladolid", "47")]
+STREETS = ["Calle Mayor", "Avenida de la Constitución", "Calle Real", "Paseo de Gracia", "Calle Alcalá",
+           "Gran Vía", "Calle San Fernando", "Plaza de España", "Calle Larios", "Rúa Nova"]
+OCCUPATIONS = ["Abogada", "Ingeniero", "Autónomo", "Profesora", "Médico", "Comercial", "Jubilado", None, None]
+CASE_TYPES = [("civil", 30), ("family", 25), ("corporate", 12), ("criminal", 10), ("real_estate", 15),
+              ("immigration", 8)]
+CASE_STATUSES = [("active", 45), ("pending", 20), ("closed", 30), ("on_hold", 5)]
+CLIENT_STATUSES = [("active", 70), ("inactive", 20), ("potential", 10)]
+CASE_TITLES = {
+    "civil": ["Reclamación de cantidad", "Responsabilidad civil", "Incumplimiento de contrato"],
+    "family": ["Divorcio de mutuo acuerdo", "Custodia compartida", "Pensión de alimentos"],
+    "corporate": ["Constitución de sociedad", "Conflicto societario", "Concurso de acreedores"],
+    "criminal": ["Defensa penal", "Acusación particular", "Recurso de apelación"],
+    "real_estate": ["Desahucio por impago", "Compraventa de vivienda", "Reclamación a la comunidad"],
+    "immigration": ["Arraigo social", "Renovación de residencia", "Nacionalidad por residencia"],
+}
+COURTS = ["Juzgado de Primera Instancia n.º 3", "Juzgado de lo Social n.º 1", "Audiencia Provincial",
+          "Juzgado de lo Mercantil n.º 2", "Juzgado de Instrucción n.º 5", None]
+UPDATE_TYPES = [("progress", 40), ("hearing", 15), ("document", 25), ("status_change", 10), ("general", 10)]
+UPDATE_TITLES = ["Presentada la demanda", "Señalada la vista", "Recibida notificación del juzgado",
+                 "Aportada documentación", "Reunión con la parte contraria", "Sentencia recibida"]
+APPOINTMENT_TITLES = ["Primera consulta", "Revisión del expediente", "Preparación de la vista",
+                      "Firma de documentos", "Seguimiento del caso"]
+DOCUMENTS = [("Demanda.pdf", "application/pdf", "legal"), ("DNI.jpg", "image/jpeg", "identity"),
+             ("Contrato.pdf", "application/pdf", "contract"), ("Escritura.pdf", "application/pdf", "property"),
+             ("Nómina.pdf", "application/pdf", "financial"),
+             ("Poder notarial.docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+              "legal")]
+LOREM = ("Se informa al cliente del estado del procedimiento y de los próximos pasos acordados con el despacho. "
+         "Queda pendiente la aportación de documentación adicional.")
+
+
+def _weighted(rng: random.Random, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _phone(rng: random.Random) -> str:
+    return f"6{rng.randint(10000000, 99999999)}"
+
+
+def synthetic_client(rng: random.Random, i: int, now: datetime) -> Dict[str, Any]:
+    first = rng.choice(FIRST_NAMES)
+    last = f"{rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+    city, state, postal_prefix = rng.choice(CITIES)
+    created_at = now - timedelta(days=rng.randint(0, 5 * 365), seconds=rng.randint(0, 86399))
+    doc = {
+        "id": _uuid(rng), "first_name": first, "last_name": last,
+        "email": f"{first}.{last.split()[0]}{i}@example.com".lower(), "phone": _phone(rng),
+        "address": f"{rng.choice(STREETS)} {rng.randint(1, 200)}", "city": city, "state": state,
+        "postal_code": f"{postal_prefix}{rng.randint(0, 999):03d}",
+        "date_of_birth": f"{rng.randint(1940, 2004)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "occupation": rng.choice(OCCUPATIONS), "emergency_contact": None, "emergency_phone": None,
+        "status": _weighted(rng, CLIENT_STATUSES), "notes": LOREM if rng.random() < 0.3 else None,
+        "created_at": created_at, "updated_at": created_at,
+    }
+    doc.update(build_search_fields(doc))
+    return doc
+
+
+def synthetic_case(rng: random.Random, client: Dict[str, Any], n: int, now: datetime) -> Dict[str, Any]:
+    case_type = _weighted(rng, CASE_TYPES)
+    status = _weighted(rng, CASE_STATUSES)
+    created_at = client["created_at"] + (now - client["created_at"]) * rng.random()
+    start_date = parse_day(created_at)
+    return {
+        "id": _uuid(rng), "client_id": client["id"], "title": rng.choice(CASE_TITLES[case_type]),
+        "case_number": f"{created_at.year}/{rng.randint(1, 99999):05d}-{n}", "case_type": case_type,
+        "status": status, "description": LOREM,
+        "start_date": start_date,
+        "end_date": parse_day(start_date + timedelta(days=rng.randint(30, 700))) if status == "closed" else None,
+        "next_hearing": parse_day(now + timedelta(days=rng.randint(1, 120))) if status == "active" else None,
+        "court_name": rng.choice(COURTS), "judge_name": None, "opposing_party": None,
+        "case_value": round(rng.uniform(1000, 250000), 2) if rng.random() < 0.5 else None,
+        "hourly_rate": rng.choice([90.0, 120.0, 150.0, 200.0]), "total_hours": round(rng.uniform(0, 80), 1),
+        "notes": None, "created_at": created_at, "updated_at": created_at,
+    }
+
+
+def synthetic_update(rng: random.Random, case: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    return {
+        "id": _uuid(rng), "case_id": case["id"], "client_id": case["client_id"],
+        "title": rng.choice(UPDATE_TITLES), "description": LOREM, "update_type": _weighted(rng, UPDATE_TYPES),
+        "is_visible_to_client": rng.random() >= 0.15,
+        "created_at": case["created_at"] + (now - case["created_at"]) * rng.random(),
+        "created_by": "lawyer" if rng.random() < 0.9 else "system",
+    }
+
+
+def synthetic_appointment(rng: random.Random, case: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    appointment_date = parse_day(now + timedelta(days=rng.randint(-365, 90)))
+    appointment_time = f"{rng.randint(9, 18):02d}:{rng.choice(('00', '30'))}"
+    duration = rng.choice([30, 60, 60, 90])
+    starts_at, ends_at = appointment_window(appointment_date, appointment_time, duration)
+    return {
+        "id": _uuid(rng), "client_id": case["client_id"], "case_id": case["id"],
+        "title": rng.choice(APPOINTMENT_TITLES), "description": None, "appointment_date": appointment_date,
+        "appointment_time": appointment_time, "duration_minutes": duration,
+        "location": rng.choice(["Despacho", "Videollamada", "Juzgado"]),
+        "is_completed": appointment_date < parse_day(now) and rng.random() < 0.9, "notes": None,
+        "created_at": min(now, starts_at - timedelta(days=rng.randint(1, 30))),
+        "starts_at": starts_at, "ends_at": ends_at,
+    }
+
+
+def synthetic_document(rng: random.Random, case: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    original, content_type, category = rng.choice(DOCUMENTS)
+    extension = original.rsplit(".", 1)[-1]
+    filename = f"{_uuid(rng)}.{extension}"
+    return {
+        "id": _uuid(rng), "client_id": case["client_id"], "case_id": case["id"], "filename": filename,
+        "original_filename": original, "file_path": f"uploads/{filename}",
+        "file_size": int(min(5 * 1024 * 1024, rng.lognormvariate(12, 1))), "content_type": content_type,
+        "description": None, "category": category, "sha256": None, "blob_id": None,
+        "uploaded_at": case["created_at"] + (now - case["created_at"]) * rng.random(),
+    }
+
+
+def dataset(size: int, seed: int = 42, now: Optional[datetime] = None):
+    """Yield `(collection, document)` pairs for `size` clients, deterministically"""
+    rng = random.Random(seed)
+    # Fecha de referencia fija por semilla salvo que se indique otra
+    now = now or datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for i in range(size):
+        client = synthetic_client(rng, i, now)
+        yield "clients", client
+        for n in range(rng.randint(0, 4)):
+            case = synthetic_case(rng, client, n, now)
+            yield "cases", case
+            for _ in range(rng.randint(1, 9)):
+                yield "case_updates", synthetic_update(rng, case, now)
+            for _ in range(rng.randint(0, 3)):
+                yield "appointments", synthetic_appointment(rng, case, now)
+            for _ in range(rng.randint(0, 6)):
+                yield "documents", synthetic_document(rng, case, now)
+
+
+async def seed(db, size: int, seed: int = 42, now: Optional[datetime] = None, batch_size: int = 5000,
+               on_progress: Optional[Callable[[int, Dict[str, int]], Any]] = None) -> Dict[str, int]:
+    """Replace the benchmark collections of `db` with the dataset for `size` clients.
+
+    Returns the document count per collection. Does nothing (and returns the
+    recorded counts) when `db` already holds this exact dataset.
+    """
+    key = {"size": size, "seed": seed, "version": GENERATOR_VERSION}
+    meta = await db[META_COLLECTION].find_one({"_id": "dataset"})
+    if meta and all(meta.get(k) == v for k, v in key.items()):
+        return meta["counts"]
+    for name in COLLECTIONS + (META_COLLECTION,):
+        await db[name].drop()
+    # Índices antes de insertar: el coste se reparte y el índice único de id valida la semilla
+    await ensure_all(db, verbose=False)
+    counts = {name: 0 for name in COLLECTIONS}
+    buffers: Dict[str, List[Dict[str, Any]]] = {name: [] for name in COLLECTIONS}
+    clients = 0
+    for name, doc in dataset(size, seed, now):
+        buffers[name].append(doc)
+        if name == "clients":
+            clients += 1
+        if len(buffers[name]) >= batch_size:
+            await db[name].insert_many(buffers[name], ordered=False)
+            counts[name] += len(buffers[name])
+            buffers[name] = []
+            if on_progress and name == "clients":
+                on_progress(clients, counts)
+    for name, rows in buffers.items():
+        if rows:
+            await db[name].insert_many(rows, ordered=False)
+            counts[name] += len(rows)
+    await db[META_COLLECTION].insert_one({"_id": "dataset", **key, "counts": counts})
+    return counts
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+    size = int(os.getenv("BENCH_SIZE", "1000"))
+    db_name = os.getenv("BENCH_DB_NAME", f"legaldesk_bench_{size}")
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    started = time.perf_counter()
+    counts = await seed(client[db_name], size, int(os.getenv("BENCH_SEED", "42")),
+                        on_progress=lambda done, _: print(f"  {done}/{size} clients"))
+    print(f"'{db_name}' ready in {time.perf_counter() - started:.1f}s: "
+          + ", ".join(f"{name}={count}" for name, count in counts.items()))
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
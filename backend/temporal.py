@@ -0,0 +1,184 @@
+import os
+import inspect
+from datetime import date, datetime, time, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+# Campos temporales por colección. Se guardan como fechas BSON nativas (UTC).
+DATE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "clients": ("created_at", "updated_at"),
+    "cases": ("start_date", "end_date", "next_hearing", "created_at", "updated_at"),
+    "documents": ("uploaded_at",),
+    "appointments": ("appointment_date", "created_at"),
+    "case_updates": ("created_at",),
+    "time_entries": ("work_date", "created_at"),
+    "document_blobs": ("acquired_at", "created_at"),
+}
+TEMPORAL_FIELDS = frozenset(field for fields in DATE_FIELDS.values() for field in fields)
+# Días de calendario: se guardan a medianoche UTC y la API los sigue exponiendo como "YYYY-MM-DD"
+DAY_FIELDS = frozenset({"start_date", "end_date", "next_hearing", "appointment_date", "work_date"})
+
+# Mientras queden fechas guardadas como texto ISO, los filtros por rango
+# también comparan contra la forma en texto. Desactivar tras el backfill.
+STRING_DATES_COMPAT = os.environ.get("STRING_DATES_COMPAT", "1") not in ("", "0", "false")
+
+_DAY_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Return `value` as an aware UTC datetime, or None if it is not a date.
+
+    Accepts datetimes, dates, ISO 8601 strings and the day formats users
+    typed into the legacy free-form fields (`31/12/2024`).
+    """
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min, tzinfo=timezone.utc)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip()
+    try:
+        return parse_datetime(datetime.fromisoformat(text.replace("Z", "+00:00")))
+    except ValueError:
+        pass
+    for fmt in _DAY_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_day(value: Any) -> Optional[datetime]:
+    """Like `parse_datetime`, truncated to midnight UTC.
+
+    Text carrying an offset keeps the calendar day it was written with.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.strip().replace("Z", "+00:00")).date()
+        except ValueError:
+            pass
+    parsed = parse_datetime(value)
+    return parsed.replace(hour=0, minute=0, second=0, microsecond=0) if parsed else None
+
+
+def start_of_today() -> datetime:
+    return parse_day(datetime.now(timezone.utc))
+
+
+def day_string(value: Any) -> Any:
+    """Render a day as "YYYY-MM-DD"; unparseable legacy text passes through."""
+    day = parse_day(value)
+    return day.strftime("%Y-%m-%d") if day else value
+
+
+def to_mongo_dates(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert known temporal fields of an outgoing document to native datetimes, in place.
+
+    Values that do not parse are kept as they are rather than dropped.
+    """
+    for key, value in data.items():
+        if isinstance(value, datetime):
+            data[key] = parse_datetime(value)
+        elif key in DAY_FIELDS and isinstance(value, str):
+            data[key] = parse_day(value) or value
+    return data
+
+
+def format_days(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Render day fields of a raw document as "YYYY-MM-DD", in place."""
+    for key in DAY_FIELDS.intersection(doc):
+        doc[key] = day_string(doc[key])
+    return doc
+
+
+def _as_text(field: str, value: datetime) -> str:
+    return value.strftime("%Y-%m-%d") if field in DAY_FIELDS else value.isoformat()
+
+
+def date_range(field: str, compat: Optional[bool] = None, **bounds: datetime) -> Dict[str, Any]:
+    """Range filter on a temporal field, e.g. `date_range("created_at", gte=start, lt=end)`.
+
+    With STRING_DATES_COMPAT on (or `compat=True`), rows still holding ISO
+    text match through a second `$or` branch; BSON type bracketing keeps the
+    two branches apart.
+    """
+    native = {f"${op}": value for op, value in bounds.items()}
+    if not (STRING_DATES_COMPAT if compat is None else compat):
+        return {field: native}
+    text = {f"${op}": _as_text(field, value) for op, value in bounds.items()}
+    return {"$or": [{field: native}, {field: text}]}
+
+
+def keyset_filter(sort_field: str, direction: int, sort_value: Any, doc_id: str,
+                  compat: Optional[bool] = None) -> Dict[str, Any]:
+    """Rows after `(sort_value, doc_id)` in `(sort_field, id)` order, for keyset pagination."""
+    op = "$lt" if direction < 0 else "$gt"
+    # null (o el campo ausente) ordena antes que cualquier valor, pero $lt/$gt no lo comparan
+    if sort_value is None:
+        keyset = {"$or": [{sort_field: None, "id": {op: doc_id}}]}
+        if direction > 0:
+            keyset["$or"].append({sort_field: {"$ne": None}})
+        return keyset
+    keyset = {"$or": [
+        {sort_field: {op: sort_value}},
+        {sort_field: sort_value, "id": {op: doc_id}},
+    ]}
+    if direction < 0:
+        keyset["$or"].append({sort_field: None})
+    # While ISO-text dates remain, BSON orders every string before every
+    # date: rows of the other type that sort after the cursor must match too
+    if (STRING_DATES_COMPAT if compat is None else compat) and sort_field in TEMPORAL_FIELDS:
+        if isinstance(sort_value, datetime) and direction < 0:
+            keyset["$or"].append({sort_field: {"$type": "string"}})
+        elif isinstance(sort_value, str) and direction > 0:
+            keyset["$or"].append({sort_field: {"$type": "date"}})
+    return keyset
+
+
+async def _notify(on_progress, *args):
+    if on_progress:
+        result = on_progress(*args)
+        if inspect.isawaitable(result):
+            await result
+
+
+async def backfill_dates(db, batch_size: int = 1000,
+                         on_progress: Optional[Callable[[str, int], Any]] = None) -> Dict[str, Dict[str, int]]:
+    """Convert temporal fields stored as text to native dates with unordered bulk updates.
+
+    Only string values are visited, so the backfill is idempotent and can be
+    re-run after an interruption. Each update is conditional on the old
+    value, so a concurrent write is never overwritten, and bumps the record
+    `version` so its ETag changes. Text that does not parse as a date is left
+    untouched and reported as `skipped`.
+    """
+    summary = {}
+    for name, fields in DATE_FIELDS.items():
+        collection = db[name]
+        converted = skipped = 0
+        for field in fields:
+            ops = []
+            cursor = collection.find({field: {"$type": "string"}}, {"_id": 1, field: 1}).batch_size(batch_size)
+            async for doc in cursor:
+                value = doc[field]
+                parsed = parse_day(value) if field in DAY_FIELDS else parse_datetime(value)
+                if parsed is None:
+                    skipped += 1
+                    continue
+                ops.append(UpdateOne({"_id": doc["_id"], field: value},
+                                     {"$set": {field: parsed}, "$inc": {"version": 1}}))
+                if len(ops) >= batch_size:
+                    result = await collection.bulk_write(ops, ordered=False)
+                    converted += result.modified_count
+                    ops = []
+                    await _notify(on_progress, name, converted)
+            if ops:
+                result = await collection.bulk_write(ops, ordered=False)
+                converted += result.modified_count
+        summary[name] = {"converted": converted, "skipped": skipped}
+        await _notify(on_progress, name, converted)
+    return summary
@@ -0,0 +1,6 @@
+import os
+
+# server.py lee MONGO_URL al importarse; Motor no conecta hasta la primera consulta, y si una prueba
+# se olvida de sustituir la base falla enseguida en vez de esperar 30 s al servidor
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017/?serverSelectionTimeoutMS=200")
+os.environ.setdefault("PORTAL_SESSION_SECRET", "test-secret")
@@ -0,0 +1,248 @@
+"""In-memory stand-ins for MongoDB collections.
+
+`FakeCollection` evaluates the few operators keyset pagination needs, with
+MongoDB's type bracketing; `mongo_db()` wraps mongomock behind Motor's
+async interface for everything else.
+"""
+from datetime import datetime
+
+import mongomock
+
+_MISSING = object()
+# Orden de tipos BSON: null < números < texto < fechas
+_TYPE_RANK = ((type(None), 1), (bool, 8), ((int, float), 2), (str, 3), (datetime, 9))
+_TYPE_NAMES = {"string": str, "date": datetime}
+
+
+def _rank(value):
+    for types, rank in _TYPE_RANK:
+        if isinstance(value, types):
+            return rank
+    raise TypeError(f"unsupported value {value!r}")
+
+
+def _compare(value, op, arg) -> bool:
+    # Como en MongoDB, $lt/$gt solo comparan valores del mismo tipo
+    if value is _MISSING or _rank(value) != _rank(arg):
+        return False
+    return {"$lt": value < arg, "$lte": value <= arg, "$gt": value > arg, "$gte": value >= arg}[op]
+
+
+def _matches_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for op, arg in condition.items():
+            if op == "$in":
+                if (None if value is _MISSING else value) not in arg:
+                    return False
+            elif op == "$ne":
+                if (None if value is _MISSING else value) == arg:
+                    return False
+            elif op == "$type":
+                if not isinstance(value, _TYPE_NAMES[arg]):
+                    return False
+            elif not _compare(value, op, arg):
+                return False
+        return True
+    return (None if value is _MISSING else value) == condition
+
+
+def matches(doc: dict, query: dict) -> bool:
+    """Evaluate the subset of the MongoDB query language the handlers under test use"""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, part) for part in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, part) for part in condition):
+                return False
+        elif not _matches_condition(doc.get(key, _MISSING), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection) -> dict:
+    if not projection:
+        return dict(doc)
+    included = [key for key, flag in projection.items() if flag and key != "_id"]
+    if included:
+        return {key: doc[key] for key in included if key in doc}
+    return {key: value for key, value in doc.items() if projection.get(key, 1)}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self._docs.sort(key=lambda doc: (_rank(doc.get(field)), doc.get(field)), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self._docs = self._docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return self._docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+
+class FakeCollection:
+    """In-memory stand-in for the few Motor collection methods the tests exercise"""
+
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.queries = []
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query or {})
+        return FakeCursor([_project(doc, projection) for doc in self.docs if matches(doc, query or {})])
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(update.get("$set", {}))
+                for field, amount in update.get("$inc", {}).items():
+                    doc[field] = (doc.get(field) or 0) + amount
+                return _project(doc, projection)
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(update.get("$set", {}))
+                return
+        if upsert:
+            self.docs.append({**query, **update.get("$set", {})})
+
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+
+class AsyncCursor:
+    """Motor-style cursor over a mongomock cursor or a list of documents"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        docs = list(self._cursor)
+        return docs if length is None else docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._cursor:
+            yield doc
+
+
+def _lower(expression):
+    """Rewrite aggregation operators mongomock lacks into ones it evaluates"""
+    if isinstance(expression, list):
+        return [_lower(item) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if "$lookup" in expression and "localField" in expression["$lookup"]:
+        # Sin la subtubería (solo recorta los documentos unidos): el array queda vacío en los mismos casos
+        return {"$lookup": {key: value for key, value in expression["$lookup"].items() if key != "pipeline"}}
+    if set(expression) == {"$round"}:
+        value, places = expression["$round"]
+        scale = 10 ** places
+        return {"$divide": [{"$floor": {"$add": [{"$multiply": [_lower(value), scale]}, 0.5]}}, scale]}
+    return {key: _lower(value) for key, value in expression.items()}
+
+
+class AsyncCollection:
+    """Motor-style collection over mongomock; index hints are ignored"""
+
+    def __init__(self, collection):
+        self.sync = collection
+
+    def find(self, *args, **kwargs):
+        return AsyncCursor(self.sync.find(*args, **kwargs))
+
+    def aggregate(self, pipeline, **kwargs):
+        pipeline = [_lower(stage) for stage in pipeline]
+        merge = pipeline[-1].get("$merge") if pipeline else None
+        if merge is None:
+            return AsyncCursor(iter(list(self.sync.aggregate(pipeline))))
+        # $merge (whenMatched replace, whenNotMatched insert) emulado al final de la tubería
+        target = self.sync.database[merge["into"]]
+        for doc in self.sync.aggregate(pipeline[:-1]):
+            target.replace_one({"_id": doc["_id"]}, doc, upsert=True)
+        return AsyncCursor(iter([]))
+
+    async def find_one_and_update(self, query, update, projection=None, **kwargs):
+        if isinstance(update, list):
+            return self._pipeline_update(query, update, projection, kwargs.get("return_document"))
+        # mongomock relee el documento por _id y devuelve None si la proyección lo excluye
+        if not projection or projection.get("_id", 1):
+            return self.sync.find_one_and_update(query, update, projection=projection, **kwargs)
+        projection = {key: value for key, value in projection.items() if key != "_id"} or None
+        doc = self.sync.find_one_and_update(query, update, projection=projection, **kwargs)
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
+
+    def _pipeline_update(self, query, stages, projection, return_document):
+        # Actualización con tubería: se evalúa como agregación sobre el documento y se reemplaza
+        before = self.sync.find_one(query)
+        if before is None:
+            return None
+        after = next(self.sync.aggregate([{"$match": {"_id": before["_id"]}}, *[_lower(stage) for stage in stages]]))
+        self.sync.replace_one({"_id": before["_id"]}, after)
+        return _project(after if return_document else before, projection)
+
+    def __getattr__(self, name):
+        method = getattr(self.sync, name)
+
+        async def call(*args, **kwargs):
+            kwargs.pop("hint", None)
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabase:
+    def __init__(self, database):
+        self.sync = database
+
+    def __getitem__(self, name):
+        return AsyncCollection(self.sync[name])
+
+    def __getattr__(self, name):
+        return AsyncCollection(self.sync[name])
+
+
+def mongo_db() -> AsyncDatabase:
+    return AsyncDatabase(mongomock.MongoClient(tz_aware=True).db)
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from appointment_calendar import (
+    CALENDAR_LOCKS_COLLECTION, CALENDAR_TZ, CalendarBusy, appointment_window, calendar_guard, lock_days
+)
+from fakes import mongo_db
+from portal_sessions import SessionManager
+
+
+def slot(day, at, minutes=60):
+    return {"client_id": "c1", "title": "Reunión", "appointment_date": day, "appointment_time": at,
+            "duration_minutes": minutes}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    db = mongo_db()
+    db.clients.sync.insert_one({"id": "c1"})
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "portal_sessions", SessionManager(db, secret=b"k" * 32))
+    return TestClient(server.app), db
+
+
+def test_overlapping_booking_is_refused_with_the_conflict(api):
+    client, db = api
+    first = client.post("/api/appointments", json=slot("2026-10-19", "10:00"))
+    assert first.status_code == 200
+
+    response = client.post("/api/appointments", json=slot("2026-10-19", "10:30"))
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflict"]["id"] == first.json()["id"]
+    # Adyacente no es solape
+    assert client.post("/api/appointments", json=slot("2026-10-19", "11:00")).status_code == 200
+    assert db.appointments.sync.count_documents({}) == 2
+
+
+def test_allow_overlap_books_anyway(api):
+    client, db = api
+    client.post("/api/appointments", json=slot("2026-10-19", "10:00"))
+    response = client.post("/api/appointments?allow_overlap=true", json=slot("2026-10-19", "10:30"))
+    assert response.status_code == 200
+    assert db.appointments.sync.count_documents({}) == 2
+
+
+def test_completed_appointments_do_not_conflict(api):
+    client, db = api
+    first = client.post("/api/appointments", json=slot("2026-10-19", "10:00")).json()
+    db.appointments.sync.update_one({"id": first["id"]}, {"$set": {"is_completed": True}})
+    assert client.post("/api/appointments", json=slot("2026-10-19", "10:30")).status_code == 200
+
+
+def test_moving_an_appointment_checks_the_new_slot(api):
+    client, db = api
+    client.post("/api/appointments", json=slot("2026-10-19", "10:00"))
+    second = client.post("/api/appointments", json=slot("2026-10-19", "12:00")).json()
+
+    # Moverse dentro de su propia franja no choca consigo misma
+    assert client.patch(f"/api/appointments/{second['id']}", json={"appointment_time": "12:15"}).status_code == 200
+    response = client.patch(f"/api/appointments/{second['id']}", json={"appointment_time": "10:30"})
+    assert response.status_code == 409
+    assert client.put(f"/api/appointments/{second['id']}",
+                      json=slot("2026-10-19", "09:30")).status_code == 409
+
+    response = client.patch(f"/api/appointments/{second['id']}?allow_overlap=true", json={"appointment_time": "10:30"})
+    assert response.status_code == 200
+    assert response.json()["starts_at"].startswith("2026-10-19T08:30")
+
+
+def test_bookings_release_their_day_locks(api):
+    client, db = api
+    client.post("/api/appointments", json=slot("2026-10-19", "10:00"))
+    client.post("/api/appointments", json=slot("2026-10-19", "10:30"))
+    assert db[CALENDAR_LOCKS_COLLECTION].sync.count_documents({}) == 0
+
+
+def test_lock_days_cover_every_local_day_of_the_slot():
+    assert lock_days(*appointment_window("2026-10-19", "10:00", 60)) == ["2026-10-19"]
+    assert lock_days(*appointment_window("2026-10-19", "23:30", 60)) == ["2026-10-19", "2026-10-20"]
+    # Terminar a medianoche no toca el día siguiente
+    assert lock_days(*appointment_window("2026-10-19", "23:00", 60)) == ["2026-10-19"]
+    start = datetime(2026, 10, 19, 9, tzinfo=CALENDAR_TZ)
+    assert lock_days(start, start) == ["2026-10-19"]
+
+
+def test_guard_serializes_bookings_on_the_same_day():
+    db = mongo_db()
+    starts_at, ends_at = appointment_window("2026-10-19", "10:00", 60)
+    inside = []
+
+    async def book(name):
+        async with calendar_guard(db[CALENDAR_LOCKS_COLLECTION], starts_at, ends_at):
+            inside.append(name)
+            assert len(inside) == 1
+            await asyncio.sleep(0.05)
+            inside.remove(name)
+
+    async def main():
+        await asyncio.gather(book("a"), book("b"), book("c"))
+
+    asyncio.run(main())
+    assert db[CALENDAR_LOCKS_COLLECTION].sync.count_documents({}) == 0
+
+
+def test_guard_gives_up_on_a_held_day_and_takes_over_an_expired_one():
+    db = mongo_db()
+    locks = db[CALENDAR_LOCKS_COLLECTION]
+    starts_at, ends_at = appointment_window("2026-10-19", "10:00", 60)
+    now = datetime.now(timezone.utc)
+    locks.sync.insert_one({"_id": "2026-10-19", "holder": "other", "expires_at": now + timedelta(minutes=1)})
+
+    async def book():
+        async with calendar_guard(locks, starts_at, ends_at, wait_seconds=0.05):
+            return locks.sync.find_one({"_id": "2026-10-19"})["holder"]
+
+    with pytest.raises(CalendarBusy):
+        asyncio.run(book())
+    assert locks.sync.find_one({"_id": "2026-10-19"})["holder"] == "other"
+
+    # El proceso que lo retenía murió: pasado el plazo el día vuelve a estar libre
+    locks.sync.update_one({"_id": "2026-10-19"}, {"$set": {"expires_at": now - timedelta(seconds=1)}})
+    assert asyncio.run(book()) != "other"
+    assert locks.sync.count_documents({}) == 0
+
+
+def test_busy_calendar_answers_503(api, monkeypatch):
+    client, db = api
+    guard = server.calendar_guard
+    monkeypatch.setattr(server, "calendar_guard", lambda locks, start, end: guard(locks, start, end, wait_seconds=0.05))
+    db[CALENDAR_LOCKS_COLLECTION].sync.insert_one({
+        "_id": "2026-10-19", "holder": "other", "expires_at": datetime.now(timezone.utc) + timedelta(minutes=1),
+    })
+
+    response = client.post("/api/appointments", json=slot("2026-10-19", "10:00"))
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert db.appointments.sync.count_documents({}) == 0
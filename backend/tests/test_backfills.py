@@ -0,0 +1,47 @@
+import asyncio
+from datetime import datetime, timezone
+
+from client_search import backfill_search_fields, build_search_fields
+from fakes import mongo_db
+from temporal import backfill_dates
+
+
+def test_date_backfill_bumps_the_version_of_converted_records():
+    db = mongo_db()
+    db.cases.sync.insert_many([
+        {"id": "k1", "version": 3, "start_date": "2026-01-05", "created_at": "2026-01-05T10:00:00+00:00"},
+        {"id": "k2", "version": 1, "start_date": datetime(2026, 1, 6, tzinfo=timezone.utc)},
+        {"id": "k3", "version": 0, "start_date": "pronto"},
+    ])
+
+    summary = asyncio.run(backfill_dates(db, batch_size=1))
+    assert summary["cases"] == {"converted": 2, "skipped": 1}
+    versions = {doc["id"]: doc["version"] for doc in db.cases.sync.find()}
+    # Una subida por campo convertido; lo que ya era fecha o no se entiende no cambia
+    assert versions == {"k1": 5, "k2": 1, "k3": 0}
+    assert db.cases.sync.find_one({"id": "k1"})["start_date"] == datetime(2026, 1, 5, tzinfo=timezone.utc)
+
+    assert asyncio.run(backfill_dates(db))["cases"] == {"converted": 0, "skipped": 1}
+    assert db.cases.sync.find_one({"id": "k1"})["version"] == 5
+
+
+def test_search_backfill_rewrites_only_stale_keys_and_bumps_their_version():
+    db = mongo_db()
+    current = {"id": "c1", "version": 2, "first_name": "Ana", "last_name": "Núñez", "email": "ana@x.es"}
+    current.update(build_search_fields(current))
+    db.clients.sync.insert_many([
+        current,
+        {"id": "c2", "version": 0, "first_name": "Luis", "last_name": "Peña", "email": "luis@x.es"},
+        {"id": "c3", "version": 4, "first_name": "Eva", "last_name": "Gil", "search_tokens": ["old"],
+         "search_grams": ["old"]},
+    ])
+    progress = []
+
+    assert asyncio.run(backfill_search_fields(db.clients, batch_size=1, on_progress=progress.append)) == 2
+    assert progress == [1, 2, 3]
+    versions = {doc["id"]: doc["version"] for doc in db.clients.sync.find()}
+    assert versions == {"c1": 2, "c2": 1, "c3": 5}
+    assert "pena" in db.clients.sync.find_one({"id": "c2"})["search_tokens"]
+
+    assert asyncio.run(backfill_search_fields(db.clients)) == 0
+    assert db.clients.sync.find_one({"id": "c3"})["version"] == 5
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from cascade_delete import cascade_delete
+from document_storage import BLOBS_COLLECTION
+from fakes import mongo_db
+from portal_sessions import SessionManager
+from time_ledger import LAWYER_TOTALS, TIME_ENTRIES
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = mongo_db()
+    db.clients.sync.insert_many([{"id": "c1", "status": "active"}, {"id": "c2", "status": "active"}])
+    db.cases.sync.insert_many([
+        {"id": "k1", "client_id": "c1", "status": "active"},
+        {"id": "k2", "client_id": "c1", "status": "closed"},
+        {"id": "k3", "client_id": "c2", "status": "active"},
+    ])
+    db.documents.sync.insert_many([
+        {"id": "d1", "client_id": "c1", "case_id": "k1", "filename": "shared.pdf", "blob_id": "shared"},
+        {"id": "d2", "client_id": "c1", "case_id": None, "filename": "legacy.pdf"},
+        {"id": "d3", "client_id": "c2", "case_id": "k3", "filename": "shared.pdf", "blob_id": "shared"},
+    ])
+    db[BLOBS_COLLECTION].sync.insert_one({"_id": "shared", "ref_count": 2, "filename": "shared.pdf"})
+    for name in ("shared.pdf", "legacy.pdf"):
+        (tmp_path / name).write_bytes(b"x")
+    db.appointments.sync.insert_many([
+        {"id": "a1", "client_id": "c1", "case_id": "k1"},
+        {"id": "a2", "client_id": "c1", "case_id": None},
+        {"id": "a3", "client_id": "c2", "case_id": "k3"},
+    ])
+    db.case_updates.sync.insert_many([
+        {"id": "u1", "client_id": "c1", "case_id": "k1"},
+        {"id": "u2", "client_id": "c1", "case_id": "k2"},
+        {"id": "u3", "client_id": "c2", "case_id": "k3"},
+    ])
+    db[TIME_ENTRIES].sync.insert_many([
+        {"id": "t1", "client_id": "c1", "case_id": "k1", "lawyer": "ana", "hours": 2.0, "amount": 200.0},
+        {"id": "t2", "client_id": "c1", "case_id": "k2", "lawyer": "luis", "hours": 1.0, "amount": 80.0},
+        {"id": "t3", "client_id": "c2", "case_id": "k3", "lawyer": "ana", "hours": 3.0, "amount": 300.0},
+    ])
+    db[LAWYER_TOTALS].sync.insert_many([
+        {"_id": "ana", "hours": 5.0, "billed_amount": 500.0, "entries": 2},
+        {"_id": "luis", "hours": 1.0, "billed_amount": 80.0, "entries": 1},
+    ])
+    return db
+
+
+def _ids(db, collection):
+    return sorted(doc["id"] for doc in db[collection].sync.find())
+
+
+def test_client_cascade_counts_and_removes_its_dependents(db, tmp_path):
+    parent, counts = asyncio.run(cascade_delete(db, tmp_path, "clients", "c1"))
+    assert parent == {"id": "c1", "status": "active"}
+    assert counts == {"documents": 2, "appointments": 2, "case_updates": 2, TIME_ENTRIES: 2, "cases": 2}
+    for collection, remaining in [("clients", ["c2"]), ("cases", ["k3"]), ("documents", ["d3"]),
+                                  ("appointments", ["a3"]), ("case_updates", ["u3"]), (TIME_ENTRIES, ["t3"])]:
+        assert _ids(db, collection) == remaining
+    # El blob compartido sigue en uso por d3; el archivo antiguo se borra
+    assert db[BLOBS_COLLECTION].sync.find_one({"_id": "shared"})["ref_count"] == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["shared.pdf"]
+    totals = {row["_id"]: row for row in db[LAWYER_TOTALS].sync.find()}
+    assert (totals["ana"]["hours"], totals["ana"]["entries"]) == (3.0, 1)
+    assert "luis" not in totals
+
+
+def test_case_cascade_leaves_the_clients_other_records(db, tmp_path):
+    parent, counts = asyncio.run(cascade_delete(db, tmp_path, "cases", "k1", batch_size=1))
+    assert parent == {"id": "k1", "status": "active"}
+    assert counts == {"documents": 1, "appointments": 1, "case_updates": 1, TIME_ENTRIES: 1}
+    assert _ids(db, "documents") == ["d2", "d3"]
+    assert _ids(db, "appointments") == ["a2", "a3"]
+
+
+def test_repeating_an_interrupted_cascade_finishes_it(db, tmp_path):
+    # Un corte tras borrar los dependientes deja al padre: repetir termina sin contar dos veces
+    asyncio.run(cascade_delete(db, tmp_path, "cases", "k1"))
+    db.cases.sync.insert_one({"id": "k1", "client_id": "c1", "status": "active"})
+    parent, counts = asyncio.run(cascade_delete(db, tmp_path, "cases", "k1"))
+    assert parent is not None
+    assert set(counts.values()) == {0}
+    assert db[BLOBS_COLLECTION].sync.find_one({"_id": "shared"})["ref_count"] == 1
+
+
+def test_missing_parent_deletes_nothing(db, tmp_path):
+    parent, counts = asyncio.run(cascade_delete(db, tmp_path, "clients", "nope"))
+    assert parent is None and set(counts.values()) == {0}
+
+
+def test_delete_endpoints_report_the_cascade(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "uploads_dir", tmp_path)
+    monkeypatch.setattr(server, "portal_sessions", SessionManager(db, secret=b"k" * 32))
+    client = TestClient(server.app)
+    response = client.delete("/api/cases/k3")
+    assert response.status_code == 200
+    assert response.json()["deleted"] == {"documents": 1, "appointments": 1, "case_updates": 1, TIME_ENTRIES: 1}
+    response = client.delete("/api/clients/c1")
+    assert response.json()["deleted"]["cases"] == 2
+    assert client.delete("/api/clients/c1").status_code == 404
+    assert db[BLOBS_COLLECTION].sync.find_one({"_id": "shared"}) is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from case_analytics import (
+    DIMENSIONS, FACTS_COLLECTION, ROLLUPS_COLLECTION, STATE_COLLECTION, forget_cases, refresh, rollup_pipeline
+)
+from fakes import mongo_db
+
+LONG_AGO = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def fact(case_id, case_type, status, client_id, month, hours, amount, value=0.0):
+    return {"_id": case_id, "case_type": case_type, "status": status, "client_id": client_id, "month": month,
+            "billed_hours": hours, "billed_amount": amount, "case_value": value, "refreshed_at": LONG_AGO}
+
+
+@pytest.fixture
+def db():
+    db = mongo_db()
+    db.cases.sync.insert_many([{"id": case_id, "updated_at": LONG_AGO} for case_id in ("k1", "k2", "k3")])
+    db[FACTS_COLLECTION].sync.insert_many([
+        fact("k1", "civil", "active", "c1", "2026-01", 10.0, 500.004, 1000.0),
+        fact("k2", "civil", "closed", "c1", "2026-02", 2.5, 125.0),
+        fact("k3", "penal", "active", "c2", "2026-01", 4.0, 300.0),
+    ])
+    return db
+
+
+def rollups(db, dimension):
+    return {row["key"]: row for row in db[ROLLUPS_COLLECTION].sync.find({"dimension": dimension})}
+
+
+def aggregate_all(db):
+    async def main():
+        now = datetime.now(timezone.utc)
+        for dimension in DIMENSIONS:
+            await db[FACTS_COLLECTION].aggregate(rollup_pipeline(dimension, None, now)).to_list(None)
+    asyncio.run(main())
+
+
+def test_rollups_are_merged_per_dimension_and_key(db):
+    aggregate_all(db)
+    civil = rollups(db, "case_type")["civil"]
+    assert civil["_id"] == "case_type:civil"
+    assert (civil["cases"], civil["open_cases"], civil["billed_hours"], civil["revenue"], civil["case_value"]) == \
+        (2, 1, 12.5, 625.0, 1000.0)
+    assert set(rollups(db, "month")) == {"2026-01", "2026-02"}
+    assert rollups(db, "month")["2026-01"]["revenue"] == 800.0
+
+    # Volver a agregar reemplaza las filas en vez de duplicarlas
+    aggregate_all(db)
+    assert db[ROLLUPS_COLLECTION].sync.count_documents({"dimension": "case_type"}) == 2
+
+
+def test_forgetting_cases_reaggregates_and_drops_emptied_groups(db):
+    aggregate_all(db)
+    assert asyncio.run(forget_cases(db, {"client_id": "c2"})) == 1
+    assert set(rollups(db, "case_type")) == {"civil"}
+    assert set(rollups(db, "client_id")) == {"c1"}
+    assert rollups(db, "status")["active"]["cases"] == 1
+    assert rollups(db, "month")["2026-01"]["revenue"] == 500.0
+
+
+def test_refresh_drops_facts_of_cases_deleted_elsewhere(db):
+    aggregate_all(db)
+    db[STATE_COLLECTION].sync.insert_one({"_id": "cases", "watermark": LONG_AGO + timedelta(days=1)})
+    # Un caso borrado por fuera de la API y otro nuevo aún sin updated_at: hay tantos hechos como casos
+    db.cases.sync.delete_one({"id": "k3"})
+    db.cases.sync.insert_one({"id": "k4"})
+
+    result = asyncio.run(refresh(db, batch_size=2))
+    assert result == {"mode": "incremental", "cases": 0, "removed": 1}
+    assert {doc["_id"] for doc in db[FACTS_COLLECTION].sync.find()} == {"k1", "k2"}
+    assert set(rollups(db, "case_type")) == {"civil"}
+    assert rollups(db, "status")["active"]["cases"] == 1
+
+    assert asyncio.run(refresh(db))["removed"] == 0
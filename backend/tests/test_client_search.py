@@ -0,0 +1,120 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from client_search import build_search_fields, build_search_tiers, normalize_text, query_tokens, search_clients
+from fakes import mongo_db
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _client(client_id, first_name, last_name, age_days=0, **fields):
+    doc = {"id": client_id, "first_name": first_name, "last_name": last_name, "email": f"{client_id}@example.com",
+           "phone": "600000000", "address": "Calle Mayor 1", "city": "Madrid", "state": "Madrid",
+           "postal_code": "28001", "created_at": START - timedelta(days=age_days), **fields}
+    return {**doc, **build_search_fields(doc)}
+
+
+class CountingCollection:
+    """Records each tier query before delegating to the wrapped collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return self.collection.find(query, projection)
+
+
+def _search(docs, term, limit=10, candidate_limit=500, filter_query=None):
+    db = mongo_db()
+    db.clients.sync.insert_many(docs)
+    collection = CountingCollection(db.clients)
+    ranked, truncated = asyncio.run(search_clients(collection, filter_query or {}, term, limit, candidate_limit))
+    return [doc["id"] for doc in ranked], truncated, collection.queries
+
+
+def test_normalization_folds_accents_case_and_punctuation():
+    assert normalize_text("  José-María NÚÑEZ ") == "jose maria nunez"
+    assert query_tokens("Ñúñez") == ["nunez"]
+    assert query_tokens("+34 600-00-00") == ["346000000"]
+    fields = build_search_fields({"first_name": "Álvaro", "last_name": "Peña", "email": "a.pena@x.es", "phone": "6 1"})
+    assert fields["search_tokens"] == ["61", "a", "alvaro", "es", "pena", "x"]
+    assert "lva" in fields["search_grams"]
+
+
+@pytest.mark.parametrize("term", ["jose nunez", "JOSÉ NÚÑEZ", "Núñez", "nuñ", "uñe"])
+def test_accented_names_match_unaccented_terms(term):
+    ids, _, _ = _search([_client("c1", "José", "Núñez"), _client("c2", "Ana", "Ruiz")], term)
+    assert ids == ["c1"]
+
+
+def test_tiers_go_from_exact_to_prefix_to_substring():
+    tiers, tokens = build_search_tiers("ana")
+    assert tokens == ["ana"]
+    assert [score for _, score in tiers] == [3, 2, 1]
+    assert tiers[0][0] == {"search_tokens": {"$all": ["ana"]}}
+    # Con solo tokens cortos la consulta completa ya es la de prefijos
+    tiers, _ = build_search_tiers("an")
+    assert [score for _, score in tiers] == [3, 2]
+
+
+def test_exact_matches_rank_before_newer_prefix_and_substring_matches():
+    docs = [
+        _client("sub", "Mariana", "Gil", age_days=0),
+        _client("pre", "Anabel", "Gil", age_days=1),
+        _client("old-exact", "Ana", "Gil", age_days=30),
+        _client("new-exact", "Ana", "Ruiz", age_days=2),
+        _client("none", "Luis", "Gil", age_days=0),
+    ]
+    ids, truncated, _ = _search(docs, "ana")
+    assert ids == ["new-exact", "old-exact", "pre", "sub"]
+    assert truncated is False
+
+
+def test_capped_tier_keeps_earlier_tiers_and_reports_truncation():
+    docs = [_client(f"pre-{i}", "Anabel", "Gil", age_days=i) for i in range(5)]
+    docs.append(_client("exact", "Ana", "Gil", age_days=99))
+    ids, truncated, _ = _search(docs, "ana", limit=3, candidate_limit=2)
+    assert ids == ["exact", "pre-0", "pre-1"]
+    assert truncated is True
+
+
+def test_later_tiers_skip_clients_already_read():
+    # El exacto es el más reciente: sin $nin volvería a ocupar una plaza del nivel de prefijos
+    docs = [_client("exact", "Ana", "Gil", age_days=0), _client("pre-1", "Anabel", "Gil", age_days=1),
+            _client("pre-2", "Anastasia", "Gil", age_days=2)]
+    ids, truncated, queries = _search(docs, "ana", candidate_limit=2)
+    assert ids == ["exact", "pre-1", "pre-2"]
+    assert truncated is True
+    assert queries[1]["$and"][1] == {"id": {"$nin": ["exact"]}}
+
+
+def test_full_page_of_exact_matches_skips_the_weaker_tiers():
+    docs = [_client(f"exact-{i}", "Ana", "Gil", age_days=i) for i in range(3)]
+    docs.append(_client("pre", "Anabel", "Gil"))
+    ids, _, queries = _search(docs, "ana", limit=3)
+    assert ids == ["exact-0", "exact-1", "exact-2"]
+    assert len(queries) == 1
+
+
+def test_status_filter_applies_to_every_tier():
+    docs = [_client("exact", "Ana", "Gil", status="inactive"), _client("pre", "Anabel", "Gil", status="active")]
+    ids, _, queries = _search(docs, "ana", filter_query={"status": "active"})
+    assert ids == ["pre"]
+    assert all("active" in str(query) for query in queries)
+
+
+def test_search_endpoint_reports_the_cap(monkeypatch):
+    db = mongo_db()
+    db.clients.sync.insert_many([_client(f"pre-{i}", "Anabel", "Gil", age_days=i) for i in range(3)])
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "SEARCH_CANDIDATE_LIMIT", 2)
+    response = TestClient(server.app).get("/api/clients", params={"search": "ana", "limit": 5})
+    assert response.status_code == 200
+    assert response.headers["X-Search-Truncated"] == "2"
+    assert [client["id"] for client in response.json()["items"]] == ["pre-0", "pre-1"]
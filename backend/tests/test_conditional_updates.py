@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+from fakes import FakeCollection
+
+
+def _request(if_match=None):
+    headers = [(b"if-match", if_match.encode())] if if_match is not None else []
+    return Request({"type": "http", "method": "PATCH", "path": "/", "headers": headers})
+
+
+def _patch(collection, changes, version=None, expected=None):
+    return asyncio.run(server.patch_record(collection, "c1", changes, version, expected, {"_id": 0}, "Client not found"))
+
+
+@pytest.mark.parametrize("header, version", [
+    (None, None), ("*", None), ('"3"', 3), ('W/"3"', 3), ('"0"', 0), ('"4", "5"', 4),
+])
+def test_if_match_version(header, version):
+    assert server.if_match_version(_request(header)) == version
+
+
+def test_if_match_must_be_a_version():
+    with pytest.raises(HTTPException) as error:
+        server.if_match_version(_request('"33a1f0c9"'))
+    assert error.value.status_code == 412
+
+
+def test_patch_with_current_version_applies_and_bumps_it():
+    clients = FakeCollection([{"id": "c1", "city": "Madrid", "version": 2}])
+    updated = _patch(clients, {"city": "Sevilla"}, version=2)
+    assert updated == {"id": "c1", "city": "Sevilla", "version": 3}
+    assert server.record_validators(updated).headers["ETag"] == '"3"'
+
+
+def test_patch_with_stale_version_is_412_and_writes_nothing():
+    clients = FakeCollection([{"id": "c1", "city": "Madrid", "version": 2}])
+    with pytest.raises(HTTPException) as error:
+        _patch(clients, {"city": "Sevilla"}, version=1)
+    assert error.value.status_code == 412
+    assert clients.docs[0] == {"id": "c1", "city": "Madrid", "version": 2}
+
+
+def test_patch_of_missing_record_is_404_even_with_if_match():
+    clients = FakeCollection([{"id": "other", "version": 0}])
+    for version in (None, 0, 5):
+        with pytest.raises(HTTPException) as error:
+            _patch(clients, {"city": "Sevilla"}, version=version)
+        assert error.value.status_code == 404
+        assert error.value.detail == "Client not found"
+
+
+def test_records_without_version_match_version_zero():
+    clients = FakeCollection([{"id": "c1", "city": "Madrid"}])
+    assert server.record_validators(clients.docs[0]).etag == '"0"'
+    assert _patch(clients, {"city": "Sevilla"}, version=0)["version"] == 1
+
+
+def test_changed_inputs_are_409_not_412():
+    clients = FakeCollection([{"id": "c1", "email": "b@x", "version": 2}])
+    with pytest.raises(HTTPException) as error:
+        _patch(clients, {"search_tokens": ["a"]}, version=2, expected={"email": "a@x"})
+    assert error.value.status_code == 409
+
+
+def test_unconditional_patch_ignores_version():
+    clients = FakeCollection([{"id": "c1", "city": "Madrid", "version": 7}])
+    assert _patch(clients, {"city": "Sevilla"})["version"] == 8
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+import server
+
+CSV = 'first_name,notes\nAna,"dice ""hola""\ny adiós"\nLuis,\n"Eva","a,b\n\nc"\n'
+ROWS = [
+    {"first_name": "Ana", "notes": 'dice "hola"\ny adiós'},
+    {"first_name": "Luis"},
+    {"first_name": "Eva", "notes": "a,b\n\nc"},
+]
+
+
+class StreamedBody:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def _rows(chunks):
+    async def collect():
+        return [row async for row in server.iter_csv_rows(StreamedBody(chunks))]
+    return asyncio.run(collect())
+
+
+def test_split_keeps_quoted_newlines_in_the_rest():
+    complete, rest = server._csv_chunks_to_records('a,b\n1,"x\ny')
+    assert (complete, rest) == ("a,b\n", '1,"x\ny')
+    complete, rest = server._csv_chunks_to_records(rest + '"\n2,z')
+    assert (complete, rest) == ('1,"x\ny"\n', "2,z")
+
+
+def test_split_without_newline_keeps_everything():
+    assert server._csv_chunks_to_records('1,"x') == ("", '1,"x')
+
+
+@pytest.mark.parametrize("cut", range(1, len(CSV.encode())))
+def test_rows_survive_any_chunk_boundary(cut):
+    # Incluye cortes dentro de comillas, entre "" escapadas y a mitad de un carácter UTF-8
+    body = CSV.encode()
+    assert _rows([body[:cut], body[cut:]]) == ROWS
+
+
+def test_rows_from_one_byte_chunks_with_bom():
+    body = CSV.encode("utf-8-sig")
+    assert _rows([body[i:i + 1] for i in range(len(body))]) == ROWS
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+class Counts:
+    """Stand-in for compute_dashboard_stats that counts calls and can pause mid-refresh"""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_clients = 10
+        self.started = None
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        snapshot = {"total_clients": self.total_clients, "active_clients": 4}
+        if self.release is not None:
+            self.started.set()
+            await self.release.wait()
+        return snapshot
+
+
+@pytest.fixture
+def counts(monkeypatch):
+    counts = Counts()
+    monkeypatch.setattr(server, "compute_dashboard_stats", counts)
+    return counts
+
+
+def test_serves_cached_counters_until_max_age(counts):
+    cache = server.DashboardStatsCache(max_age=30)
+
+    async def scenario():
+        first = await cache.get()
+        counts.total_clients = 11
+        second = await cache.get()
+        cache._loaded_at -= 31
+        third = await cache.get()
+        return first["total_clients"], second["total_clients"], third["total_clients"]
+
+    assert asyncio.run(scenario()) == (10, 10, 11)
+    assert counts.calls == 2
+
+
+def test_incr_adjusts_in_place_and_never_goes_negative(counts):
+    cache = server.DashboardStatsCache(max_age=30)
+
+    async def scenario():
+        await cache.get()
+        cache.incr("total_clients")
+        cache.incr("active_clients", -10)
+        return await cache.get()
+
+    stats = asyncio.run(scenario())
+    assert stats["total_clients"] == 11 and stats["active_clients"] == 0
+    assert counts.calls == 1
+
+
+def test_incr_before_first_load_is_a_no_op(counts):
+    cache = server.DashboardStatsCache(max_age=30)
+    cache.incr("total_clients")
+    assert asyncio.run(cache.get())["total_clients"] == 10
+
+
+def test_invalidate_forces_a_refresh(counts):
+    cache = server.DashboardStatsCache(max_age=30)
+
+    async def scenario():
+        await cache.get()
+        counts.total_clients = 12
+        cache.invalidate()
+        return await cache.get()
+
+    assert asyncio.run(scenario())["total_clients"] == 12
+    assert counts.calls == 2
+
+
+def test_concurrent_readers_share_one_refresh(counts):
+    cache = server.DashboardStatsCache(max_age=30)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get() for _ in range(5)))
+
+    assert [stats["total_clients"] for stats in asyncio.run(scenario())] == [10] * 5
+    assert counts.calls == 1
+
+
+@pytest.mark.parametrize("write", [lambda cache: cache.incr("total_clients"), lambda cache: cache.invalidate()])
+def test_write_during_refresh_is_not_lost(counts, write):
+    cache = server.DashboardStatsCache(max_age=30)
+
+    async def scenario():
+        counts.started, counts.release = asyncio.Event(), asyncio.Event()
+        refresh = asyncio.create_task(cache.get())
+        await counts.started.wait()
+        # El alta se confirma después de que el refresco leyera los contadores
+        counts.total_clients = 11
+        write(cache)
+        counts.release.set()
+        during = await refresh
+        counts.release = None
+        after = await cache.get()
+        return during["total_clients"], after["total_clients"]
+
+    assert asyncio.run(scenario()) == (10, 11)
+    assert counts.calls == 2
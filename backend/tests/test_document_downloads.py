@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+from email.utils import formatdate
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from fakes import mongo_db
+from portal_sessions import SessionManager
+
+CONTENT = bytes(range(256)) * 4
+UPLOADED = datetime(2024, 3, 1, 12, 0, tzinfo=timezone.utc)
+ETAG = '"abc123"'
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    db = mongo_db()
+    db.documents.sync.insert_one({
+        "id": "doc1", "client_id": "c1", "filename": "stored.pdf", "original_filename": "contrato.pdf",
+        "content_type": "application/pdf", "file_size": len(CONTENT), "sha256": "abc123", "uploaded_at": UPLOADED,
+    })
+    (tmp_path / "stored.pdf").write_bytes(CONTENT)
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "uploads_dir", tmp_path)
+    monkeypatch.setattr(server, "portal_sessions", SessionManager(db, secret=b"k" * 32))
+    return TestClient(server.app)
+
+
+def _get(client, **headers):
+    return client.get("/api/documents/doc1/download", headers=headers)
+
+
+def test_full_download_carries_document_validators(client):
+    response = _get(client)
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["etag"] == ETAG
+    assert response.headers["last-modified"] == formatdate(UPLOADED.timestamp(), usegmt=True)
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-disposition"].startswith("inline")
+    attachment = client.get("/api/documents/doc1/download", params={"attachment": "true"})
+    assert attachment.headers["content-disposition"].startswith("attachment")
+
+
+def test_range_is_206(client):
+    response = _get(client, Range="bytes=10-19")
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+
+def test_unsatisfiable_range_is_416(client):
+    response = _get(client, Range=f"bytes={len(CONTENT) + 10}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"*/{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("validator", [ETAG, formatdate(UPLOADED.timestamp(), usegmt=True)])
+def test_if_range_with_current_validator_gets_the_range(client, validator):
+    response = _get(client, Range="bytes=0-9", **{"If-Range": validator})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
+
+
+def test_if_range_with_stale_validator_gets_the_whole_file(client):
+    response = _get(client, Range="bytes=0-9", **{"If-Range": '"old"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+@pytest.mark.parametrize("headers", [
+    {"If-None-Match": ETAG},
+    {"If-None-Match": f'"x", W/{ETAG}'},
+    {"If-Modified-Since": formatdate(UPLOADED.timestamp() + 60, usegmt=True)},
+])
+def test_conditional_get_is_304(client, headers):
+    response = _get(client, **headers)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == ETAG
+
+
+def test_modified_since_older_date_is_200(client):
+    assert _get(client, **{"If-Modified-Since": formatdate(UPLOADED.timestamp() - 60, usegmt=True)}).status_code == 200
+
+
+def test_missing_record_or_file_is_404(client, tmp_path):
+    assert client.get("/api/documents/nope/download").status_code == 404
+    (tmp_path / "stored.pdf").unlink()
+    assert _get(client).status_code == 404
+
+
+def test_uploads_are_not_served_statically(client):
+    assert client.get("/uploads/stored.pdf").status_code == 404
+
+
+def test_portal_download_needs_the_clients_session(client):
+    url = "/api/client/c1/documents/doc1/download"
+    assert client.get(url).status_code == 401
+    token, _ = server.portal_sessions.issue("c1")
+    response = client.get(url, headers={"Authorization": f"Bearer {token}", "Range": "bytes=0-3"})
+    assert response.status_code == 206 and response.content == CONTENT[:4]
+    assert response.headers["vary"] == "Authorization"
+    other, _ = server.portal_sessions.issue("c2")
+    assert client.get("/api/client/c2/documents/doc1/download",
+                      headers={"Authorization": f"Bearer {other}"}).status_code == 404
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import migrate_uploads_to_cas
+import server
+from document_storage import BLOBS_COLLECTION, acquire_blob, place_blob, recount_references, release_blob
+from fakes import mongo_db
+from orphan_sweeper import sweep_blobs
+
+CONTENT = b"%PDF-1.4 contrato"
+SHA = hashlib.sha256(CONTENT).hexdigest()
+LONG_AGO = datetime.now(timezone.utc) - timedelta(days=2)
+
+
+@pytest.fixture
+def db():
+    return mongo_db()
+
+
+def _blob(db, blob_id):
+    return db[BLOBS_COLLECTION].sync.find_one({"_id": blob_id})
+
+
+def test_shared_blob_lives_until_its_last_reference(db, tmp_path):
+    blobs = db[BLOBS_COLLECTION]
+
+    async def scenario():
+        for _ in range(2):
+            blob = await acquire_blob(blobs, SHA, f"{SHA}.pdf", len(CONTENT))
+            staged = tmp_path / ".upload"
+            staged.write_bytes(CONTENT)
+            await place_blob(staged, tmp_path / blob["filename"])
+        assert _blob(db, SHA)["ref_count"] == 2
+        assert await release_blob(blobs, SHA, tmp_path) is False
+        assert (tmp_path / f"{SHA}.pdf").exists() and _blob(db, SHA)["ref_count"] == 1
+        assert await release_blob(blobs, SHA, tmp_path) is True
+
+    asyncio.run(scenario())
+    assert _blob(db, SHA) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_acquire_records_native_dates(db):
+    blob = asyncio.run(acquire_blob(db[BLOBS_COLLECTION], SHA, f"{SHA}.pdf", 1))
+    assert isinstance(blob["acquired_at"], datetime) and isinstance(blob["created_at"], datetime)
+
+
+@pytest.fixture
+def content_storage(db, monkeypatch, tmp_path):
+    db.clients.sync.insert_one({"id": "c1"})
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "uploads_dir", tmp_path)
+    monkeypatch.setattr(server, "DOCUMENT_STORAGE", "content")
+    return TestClient(server.app)
+
+
+def _upload(client, content=CONTENT):
+    response = client.post("/api/documents/upload", data={"client_id": "c1"},
+                           files={"file": ("contrato.pdf", content, "application/pdf")})
+    assert response.status_code == 200
+    return response.json()["document"]
+
+
+def test_identical_uploads_share_one_file_until_both_are_deleted(db, content_storage, tmp_path):
+    first, second = _upload(content_storage), _upload(content_storage)
+    assert first["filename"] == second["filename"] == f"{SHA}.pdf"
+    assert _blob(db, SHA)["ref_count"] == 2
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{SHA}.pdf"]
+
+    assert content_storage.delete(f"/api/documents/{first['id']}").status_code == 200
+    assert _blob(db, SHA)["ref_count"] == 1
+    assert (tmp_path / f"{SHA}.pdf").read_bytes() == CONTENT
+
+    assert content_storage.delete(f"/api/documents/{second['id']}").status_code == 200
+    assert _blob(db, SHA) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_upload_releases_its_reference_and_temp_file(db, content_storage, tmp_path, monkeypatch):
+    _upload(content_storage)
+
+    async def failing_place(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(server, "place_blob", failing_place)
+    response = content_storage.post("/api/documents/upload", data={"client_id": "c1"},
+                                    files={"file": ("contrato.pdf", CONTENT, "application/pdf")})
+    assert response.status_code == 500
+    assert _blob(db, SHA)["ref_count"] == 1
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{SHA}.pdf"]
+
+
+def test_recount_fixes_drift_and_zeroes_unreferenced_blobs(db):
+    db[BLOBS_COLLECTION].sync.insert_many([
+        {"_id": "a", "ref_count": 5, "filename": "a"},
+        {"_id": "b", "ref_count": 3, "filename": "b"},
+        {"_id": "c", "ref_count": 0, "filename": "c"},
+    ])
+    db.documents.sync.insert_many([{"id": "d1", "blob_id": "a"}, {"id": "d2", "blob_id": "a"}, {"id": "d3"}])
+    assert asyncio.run(recount_references(db)) == {"a": 2}
+    assert {blob["_id"]: blob["ref_count"] for blob in db[BLOBS_COLLECTION].sync.find()} == {"a": 2, "b": 0, "c": 0}
+
+
+def test_sweeper_reclaims_blobs_without_documents(db, tmp_path):
+    (tmp_path / "zero").write_bytes(b"x")
+    (tmp_path / "used").write_bytes(b"y")
+    db[BLOBS_COLLECTION].sync.insert_many([
+        {"_id": "zero", "ref_count": 0, "filename": "zero", "size": 1, "acquired_at": LONG_AGO},
+        {"_id": "used", "ref_count": 1, "filename": "used", "size": 1, "acquired_at": LONG_AGO},
+    ])
+    db.documents.sync.insert_one({"id": "d1", "blob_id": "used"})
+    result = asyncio.run(sweep_blobs(db, tmp_path, False, 100, datetime.now(timezone.utc)))
+    assert result == {"fixed": 0, "removed": 1, "bytes": 1}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["used"]
+
+
+class _Client:
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name):
+        return self.db
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def migration(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(migrate_uploads_to_cas, "AsyncIOMotorClient", lambda url: _Client(db))
+    monkeypatch.setattr(migrate_uploads_to_cas, "UPLOADS_DIR", tmp_path)
+    monkeypatch.setattr(migrate_uploads_to_cas, "DRY_RUN", False)
+    return lambda: asyncio.run(migrate_uploads_to_cas.main())
+
+
+def test_migration_collapses_duplicates(db, migration, tmp_path):
+    for name in ("one.pdf", "two.pdf"):
+        (tmp_path / name).write_bytes(CONTENT)
+    db.documents.sync.insert_many([{"id": "d1", "filename": "one.pdf"}, {"id": "d2", "filename": "two.pdf"}])
+    migration()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{SHA}.pdf"]
+    assert {doc["blob_id"] for doc in db.documents.sync.find()} == {SHA}
+    assert _blob(db, SHA)["ref_count"] == 2
+
+
+def test_interrupted_migration_keeps_the_original_and_resumes(db, migration, tmp_path, monkeypatch):
+    (tmp_path / "one.pdf").write_bytes(CONTENT)
+    db.documents.sync.insert_one({"id": "d1", "filename": "one.pdf"})
+    point_at_blob = migrate_uploads_to_cas.point_at_blob
+
+    async def crash(*args):
+        raise ConnectionError("lost MongoDB")
+
+    monkeypatch.setattr(migrate_uploads_to_cas, "point_at_blob", crash)
+    with pytest.raises(ConnectionError):
+        migration()
+    assert (tmp_path / "one.pdf").read_bytes() == CONTENT
+    assert "blob_id" not in db.documents.sync.find_one({"id": "d1"})
+
+    monkeypatch.setattr(migrate_uploads_to_cas, "point_at_blob", point_at_blob)
+    migration()
+    doc = db.documents.sync.find_one({"id": "d1"})
+    assert (doc["blob_id"], doc["filename"]) == (SHA, f"{SHA}.pdf")
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"{SHA}.pdf"]
+    # La referencia del intento cortado no queda contada
+    assert _blob(db, SHA)["ref_count"] == 1
+
+
+def test_migration_relinks_documents_whose_file_was_already_moved(db, migration, tmp_path):
+    (tmp_path / f"{SHA}.pdf").write_bytes(CONTENT)
+    db[BLOBS_COLLECTION].sync.insert_one({"_id": SHA, "ref_count": 2, "filename": f"{SHA}.pdf"})
+    db.documents.sync.insert_one({"id": "d1", "filename": "gone.pdf", "sha256": SHA})
+    migration()
+    doc = db.documents.sync.find_one({"id": "d1"})
+    assert (doc["blob_id"], doc["filename"]) == (SHA, f"{SHA}.pdf")
+    assert _blob(db, SHA)["ref_count"] == 1
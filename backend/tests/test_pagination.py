@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+import temporal
+from fakes import FakeCollection
+
+
+def _walk(collection, direction, limit):
+    ids, cursor = [], None
+    while True:
+        docs, cursor = asyncio.run(server.fetch_page(collection, {}, "created_at", direction, limit, cursor))
+        ids += [doc["id"] for doc in docs]
+        if cursor is None:
+            return ids
+
+
+@pytest.fixture
+def mixed_clients(monkeypatch):
+    """Clients whose created_at is half ISO text (not backfilled yet) and half native dates"""
+    monkeypatch.setattr(temporal, "STRING_DATES_COMPAT", True)
+    docs = [
+        {"id": "t1", "created_at": "2024-01-01T09:00:00"},
+        {"id": "t2", "created_at": "2024-01-02T09:00:00"},
+        {"id": "t3", "created_at": "2024-01-02T09:00:00"},
+        {"id": "d1", "created_at": datetime(2024, 1, 3, tzinfo=timezone.utc)},
+        {"id": "d2", "created_at": datetime(2024, 1, 4, tzinfo=timezone.utc)},
+        {"id": "d3", "created_at": datetime(2024, 1, 4, tzinfo=timezone.utc)},
+    ]
+    return FakeCollection(docs)
+
+
+def test_cursor_round_trip_keeps_type():
+    when = datetime(2024, 5, 6, 7, 8, 9, tzinfo=timezone.utc)
+    assert server.decode_cursor(server.encode_cursor(when, "a")) == (when, "a")
+    assert server.decode_cursor(server.encode_cursor("2024-05-06T07:08:09", "b")) == ("2024-05-06T07:08:09", "b")
+    assert server.decode_cursor(server.encode_cursor(None, "c")) == (None, "c")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", server.encode_cursor("x", "y")[:-3]])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 10])
+def test_pages_cross_from_dates_to_text_descending(mixed_clients, limit):
+    # BSON ordena todas las fechas después de todos los textos
+    assert _walk(mixed_clients, -1, limit) == ["d3", "d2", "d1", "t3", "t2", "t1"]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 10])
+def test_pages_cross_from_text_to_dates_ascending(mixed_clients, limit):
+    assert _walk(mixed_clients, 1, limit) == ["t1", "t2", "t3", "d1", "d2", "d3"]
+
+
+def test_without_compat_later_pages_skip_text_dates(mixed_clients, monkeypatch):
+    # Por qué existe la rama $type: sin ella, $lt no cruza de fechas a textos
+    monkeypatch.setattr(temporal, "STRING_DATES_COMPAT", False)
+    assert _walk(mixed_clients, -1, 2) == ["d3", "d2", "d1"]
+
+
+def test_last_page_has_no_cursor(mixed_clients):
+    docs, cursor = asyncio.run(server.fetch_page(mixed_clients, {}, "created_at", -1, 6))
+    assert len(docs) == 6 and cursor is None
+
+
+@pytest.fixture
+def legacy_appointments(monkeypatch):
+    """Appointments where some legacy rows lack the sort field or hold it as null"""
+    monkeypatch.setattr(temporal, "STRING_DATES_COMPAT", False)
+    day = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    docs = [
+        {"id": "n1"},
+        {"id": "n2", "appointment_date": None},
+        {"id": "n3"},
+        {"id": "a1", "appointment_date": day},
+        {"id": "a2", "appointment_date": day.replace(day=2)},
+        {"id": "a3", "appointment_date": day.replace(day=2)},
+    ]
+    return FakeCollection(docs)
+
+
+def _walk_field(collection, field, direction, limit):
+    ids, cursor = [], None
+    while True:
+        docs, cursor = asyncio.run(server.fetch_page(collection, {}, field, direction, limit, cursor))
+        ids += [doc["id"] for doc in docs]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_ascending_pages_continue_past_rows_without_the_sort_field(legacy_appointments, limit):
+    assert _walk_field(legacy_appointments, "appointment_date", 1, limit) == ["n1", "n2", "n3", "a1", "a2", "a3"]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_descending_pages_reach_rows_without_the_sort_field(legacy_appointments, limit):
+    assert _walk_field(legacy_appointments, "appointment_date", -1, limit) == ["a3", "a2", "a1", "n3", "n2", "n1"]
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from fakes import FakeDatabase
+from portal_sessions import STREAM_PURPOSE, InvalidSession, SessionManager
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def sessions(clock):
+    return SessionManager(FakeDatabase(), secret=b"k" * 32, clock=clock)
+
+
+def test_issued_token_authenticates(sessions):
+    token, session = sessions.issue("client-1")
+    assert sessions.authenticate(token) == session
+    assert session.client_id == "client-1"
+
+
+@pytest.mark.parametrize("token", [None, "", "abc", "abc.", ".abc", "ñ.ñ", "abc.\ud800"])
+def test_malformed_tokens_are_rejected(sessions, token):
+    with pytest.raises(InvalidSession):
+        sessions.authenticate(token)
+
+
+def test_tampered_or_foreign_tokens_are_rejected(sessions):
+    token, _ = sessions.issue("client-1")
+    body, _, signature = token.partition(".")
+    other, _ = SessionManager(FakeDatabase(), secret=b"x" * 32).issue("client-1")
+    for forged in [f"{body}.{signature[:-2]}AA", f"{body}.{signature}é", other, f"{other.partition('.')[0]}.{signature}"]:
+        with pytest.raises(InvalidSession):
+            sessions.authenticate(forged)
+
+
+def test_token_expires_after_ttl(sessions, clock):
+    token, _ = sessions.issue("client-1")
+    clock.now += sessions.ttl - 1
+    assert sessions.authenticate(token).client_id == "client-1"
+    clock.now += 1
+    with pytest.raises(InvalidSession, match="expired"):
+        sessions.authenticate(token)
+
+
+def test_logout_revokes_only_that_session(sessions):
+    token, session = sessions.issue("client-1")
+    other, _ = sessions.issue("client-1")
+    asyncio.run(sessions.revoke_session(session))
+    with pytest.raises(InvalidSession, match="revoked"):
+        sessions.authenticate(token)
+    assert sessions.authenticate(other).client_id == "client-1"
+
+
+def test_revoking_a_client_spares_later_logins(sessions, clock):
+    token, _ = sessions.issue("client-1")
+    asyncio.run(sessions.revoke_client("client-1"))
+    with pytest.raises(InvalidSession, match="revoked"):
+        sessions.authenticate(token)
+    clock.now += 1  # iat tiene resolución de segundos
+    later, _ = sessions.issue("client-1")
+    assert sessions.authenticate(later).client_id == "client-1"
+
+
+def test_revocations_reach_other_workers_on_sync(sessions):
+    token, session = sessions.issue("client-1")
+    worker = SessionManager(sessions.db, secret=sessions.secret, clock=sessions.clock)
+    asyncio.run(sessions.revoke_session(session))
+    assert worker.authenticate(token) == session
+    assert asyncio.run(worker.sync()) == 1
+    with pytest.raises(InvalidSession, match="revoked"):
+        worker.authenticate(token)
+
+
+def test_stream_tokens_are_single_purpose(sessions):
+    token, session = sessions.issue("client-1")
+    stream_token, _ = sessions.issue_stream(session, ttl=60)
+    assert sessions.authenticate(stream_token, STREAM_PURPOSE).session_id == session.session_id
+    with pytest.raises(InvalidSession):
+        sessions.authenticate(stream_token)
+    with pytest.raises(InvalidSession):
+        sessions.authenticate(token, STREAM_PURPOSE)
+    asyncio.run(sessions.revoke_session(session))
+    with pytest.raises(InvalidSession, match="revoked"):
+        sessions.authenticate(stream_token, STREAM_PURPOSE)
+
+
+def test_stream_token_expires_and_never_outlives_its_session(sessions, clock):
+    _, session = sessions.issue("client-1")
+    stream_token, expires_in = sessions.issue_stream(session, ttl=60)
+    assert expires_in == 60
+    clock.now += 60
+    with pytest.raises(InvalidSession, match="expired"):
+        sessions.authenticate(stream_token, STREAM_PURPOSE)
+    clock.now = session.expires_at - 5
+    _, expires_in = sessions.issue_stream(session, ttl=600)
+    assert expires_in == 5
+
+
+@pytest.fixture
+def portal(monkeypatch):
+    monkeypatch.setattr(server, "portal_sessions", SessionManager(FakeDatabase(), secret=b"k" * 32))
+    return TestClient(server.app)
+
+
+def test_stream_token_endpoint_requires_the_clients_session(portal):
+    token, _ = server.portal_sessions.issue("client-1")
+    assert portal.post("/api/client/client-1/events/token").status_code == 401
+    assert portal.post("/api/client/client-1/events/token", headers={"Authorization": "Bearer ñ".encode("latin-1")}).status_code == 401
+    response = portal.post("/api/client/client-2/events/token", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+    response = portal.post("/api/client/client-1/events/token", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    stream_token = response.json()["stream_token"]
+    # Un token de flujo no sirve como sesión
+    response = portal.post("/api/client/client-1/events/token", headers={"Authorization": f"Bearer {stream_token}"})
+    assert response.status_code == 401
+
+
+def test_events_reject_session_tokens_in_the_url(portal):
+    token, _ = server.portal_sessions.issue("client-1")
+    assert portal.get(f"/api/client/client-1/events?stream_token={token}").status_code == 401
+    assert portal.get(f"/api/client/client-1/events?access_token={token}").status_code == 401
+
+
+def test_access_log_masks_stream_tokens():
+    import logging
+
+    record = logging.LogRecord("uvicorn.access", logging.INFO, "", 0, '%s - "%s %s HTTP/%s" %d',
+                               ("127.0.0.1", "GET", "/api/client/c/events?stream_token=abc.def&x=1", "1.1", 200), None)
+    server.RedactStreamTokens().filter(record)
+    assert "abc.def" not in record.getMessage()
+    assert "stream_token=***&x=1" in record.getMessage()
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from fakes import mongo_db
+from time_ledger import (
+    LAWYER_TOTALS, OPENING_LAWYER, TIME_ENTRIES, entry_amount, reconcile, record_entry, remove_entry
+)
+
+
+def entry(entry_id, case_id, lawyer, hours, rate=100.0):
+    return {"id": entry_id, "case_id": case_id, "client_id": "c1", "lawyer": lawyer, "hours": hours,
+            "hourly_rate": rate, "amount": entry_amount(hours, rate), "billable": True}
+
+
+def lawyers(db):
+    return {doc["_id"]: (doc["hours"], doc["billed_amount"], doc["entries"])
+            for doc in db[LAWYER_TOTALS].sync.find()}
+
+
+@pytest.fixture
+def db():
+    db = mongo_db()
+    db.cases.sync.insert_many([
+        {"id": "k1", "client_id": "c1", "total_hours": None, "billed_amount": None, "version": 0},
+        {"id": "k2", "client_id": "c1", "total_hours": 0.0, "billed_amount": 0.0},
+    ])
+    return db
+
+
+def test_entries_move_case_and_lawyer_counters(db):
+    async def main():
+        case = await record_entry(db, entry("e1", "k1", "ana", 1.1))
+        await record_entry(db, entry("e2", "k1", "ana", 2.2))
+        await record_entry(db, entry("e3", "k2", "luis", 0.5))
+        return case
+
+    case = asyncio.run(main())
+    # Los contadores a null de casos antiguos arrancan en cero
+    assert (case["total_hours"], case["billed_amount"], case["version"]) == (1.1, 110.0, 1)
+    k1 = db.cases.sync.find_one({"id": "k1"})
+    # Redondeo a céntimos: 1.1 + 2.2 no acumula error de coma flotante
+    assert (k1["total_hours"], k1["billed_amount"], k1["version"]) == (3.3, 330.0, 2)
+    assert db.cases.sync.find_one({"id": "k2"})["version"] == 1
+    # Los de abogado son $inc sin redondeo: reconcile absorbe esa deriva con su tolerancia
+    assert lawyers(db) == {"ana": (pytest.approx(3.3), 330.0, 2), "luis": (0.5, 50.0, 1)}
+
+
+def test_removing_entries_reverts_them_and_drops_idle_lawyers(db):
+    async def main():
+        await record_entry(db, entry("e1", "k1", "ana", 1.5))
+        await record_entry(db, entry("e2", "k1", "luis", 2.0))
+        removed = await remove_entry(db, "e2")
+        assert await remove_entry(db, "e2") is None
+        return removed
+
+    assert asyncio.run(main())["id"] == "e2"
+    k1 = db.cases.sync.find_one({"id": "k1"})
+    assert (k1["total_hours"], k1["billed_amount"], k1["version"]) == (1.5, 150.0, 3)
+    assert lawyers(db) == {"ana": (1.5, 150.0, 1)}
+    assert db[TIME_ENTRIES].sync.count_documents({}) == 1
+
+
+def test_reconcile_repairs_drift_from_the_ledger(db):
+    asyncio.run(record_entry(db, entry("e1", "k1", "ana", 2.0)))
+    # Escrituras que se saltaron la API: una entrada sin contadores y contadores sin entradas
+    db[TIME_ENTRIES].sync.insert_one(entry("e2", "k2", "luis", 1.0))
+    db.cases.sync.update_one({"id": "k1"}, {"$set": {"total_hours": 9.0}})
+    db[LAWYER_TOTALS].sync.insert_one({"_id": "eva", "hours": 4.0, "billed_amount": 400.0, "entries": 1})
+    # Caso anterior al libro: sus horas pasan a una entrada de apertura
+    db.cases.sync.insert_one({"id": "k3", "client_id": "c2", "total_hours": 5.0, "billed_amount": 250.0,
+                              "hourly_rate": 50.0, "start_date": "2025-03-01"})
+
+    preview = asyncio.run(reconcile(db, dry_run=True))
+    # En seco: falta luis y sobra eva; la entrada de apertura aún no existe
+    assert preview == {"dry_run": True, "opening_entries": 1, "cases_checked": 3, "cases_fixed": 2,
+                       "lawyers_fixed": 2}
+    assert db.cases.sync.find_one({"id": "k1"})["total_hours"] == 9.0
+    assert db[TIME_ENTRIES].sync.count_documents({}) == 2
+
+    result = asyncio.run(reconcile(db, batch_size=1))
+    assert result == {"dry_run": False, "opening_entries": 1, "cases_checked": 3, "cases_fixed": 2,
+                      "lawyers_fixed": 3}
+    k1 = db.cases.sync.find_one({"id": "k1"})
+    assert (k1["total_hours"], k1["billed_amount"], k1["version"]) == (2.0, 200.0, 2)
+    assert db.cases.sync.find_one({"id": "k2"})["total_hours"] == 1.0
+    opening = db[TIME_ENTRIES].sync.find_one({"case_id": "k3"})
+    assert (opening["lawyer"], opening["hours"], opening["amount"]) == (OPENING_LAWYER, 5.0, 250.0)
+    assert db.cases.sync.find_one({"id": "k3"})["total_hours"] == 5.0
+    assert lawyers(db) == {"ana": (2.0, 200.0, 1), "luis": (1.0, 100.0, 1), OPENING_LAWYER: (5.0, 250.0, 1)}
+
+    again = asyncio.run(reconcile(db))
+    assert (again["opening_entries"], again["cases_fixed"], again["lawyers_fixed"]) == (0, 0, 0)
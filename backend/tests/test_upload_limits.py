@@ -0,0 +1,75 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from fakes import mongo_db
+
+BOUNDARY = "limit-test"
+
+
+def _multipart(payload: bytes) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"client_id\"\r\n\r\nc1\r\n"
+        f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.pdf\"\r\n"
+        f"Content-Type: application/pdf\r\n\r\n"
+    ).encode() + payload + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    db = mongo_db()
+    db.clients.sync.insert_one({"id": "c1"})
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server, "uploads_dir", tmp_path)
+    monkeypatch.setattr(server, "MAX_UPLOAD_BYTES", 1000)
+    monkeypatch.setattr(server, "UPLOAD_FORM_OVERHEAD", 500)
+    parsed = []
+    original_form = server.Request.form
+
+    def spy_form(request, *args, **kwargs):
+        parsed.append(request.url.path)
+        return original_form(request, *args, **kwargs)
+
+    monkeypatch.setattr(server.Request, "form", spy_form)
+    return TestClient(server.app), db, tmp_path, parsed
+
+
+def _post(client, body, chunked=False):
+    headers = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+    if chunked:
+        content = (body[i:i + 256] for i in range(0, len(body), 256))
+    else:
+        content = body
+    return client.post("/api/documents/upload", content=content, headers=headers)
+
+
+def test_declared_oversized_body_is_refused_before_parsing(app):
+    client, db, uploads, parsed = app
+    response = _post(client, _multipart(b"x" * 5000))
+    assert response.status_code == 413
+    assert parsed == []
+    assert db.documents.sync.count_documents({}) == 0
+
+
+def test_chunked_oversized_body_is_cut_off(app):
+    client, db, uploads, _ = app
+    response = _post(client, _multipart(b"x" * 5000), chunked=True)
+    assert response.status_code == 413
+    assert db.documents.sync.count_documents({}) == 0
+    assert list(uploads.iterdir()) == []
+
+
+def test_file_over_the_cap_within_the_form_margin_is_still_413(app):
+    client, db, uploads, parsed = app
+    response = _post(client, _multipart(b"x" * 1200))
+    assert response.status_code == 413
+    assert parsed == ["/api/documents/upload"]
+    assert list(uploads.iterdir()) == []
+
+
+def test_upload_within_the_cap_is_stored(app):
+    client, db, uploads, _ = app
+    response = _post(client, _multipart(b"x" * 1000), chunked=True)
+    assert response.status_code == 200
+    assert response.json()["document"]["file_size"] == 1000
+    assert len(list(uploads.iterdir())) == 1
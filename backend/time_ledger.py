@@ -0,0 +1,295 @@
+"""Time-entry ledger behind each case's hour and billing totals.
+
+Hours are appended as rows of `time_entries`; nothing rewrites them. Each
+insert or delete moves two sets of counters by the entry's own amounts,
+with single-document atomic updates so concurrent entries never lose hours:
+
+  cases                 total_hours / billed_amount of the entry's case;
+  lawyer_time_totals    hours / billed_amount / entries per lawyer (_id).
+
+The entry is written first and the counters second, so the ledger is the
+source of truth: a crash in between, or a write that bypassed the API,
+leaves drift that `reconcile` repairs from one aggregation over the ledger.
+`reconcile` also turns the `total_hours` of cases created before the ledger
+into opening entries, so their history starts from the old total.
+
+    MONGO_URL=... DRY_RUN=1 python time_ledger.py   # only report drift
+    MONGO_URL=... python time_ledger.py             # fix it
+"""
+import os
+import uuid
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+
+from temporal import parse_day
+
+TIME_ENTRIES = "time_entries"
+LAWYER_TOTALS = "lawyer_time_totals"
+# Autor de las entradas de apertura (horas anteriores al registro)
+OPENING_LAWYER = "unassigned"
+OPENING_DESCRIPTION = "Horas registradas antes del libro de horas"
+DEFAULT_BATCH_SIZE = 1000
+# Diferencia por debajo de la cual un contador se da por cuadrado
+TOLERANCE = 0.005
+
+
+def entry_amount(hours: float, hourly_rate: Optional[float], billable: bool = True) -> float:
+    return round(hours * (hourly_rate or 0), 2) if billable else 0.0
+
+
+def opening_entry(case: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Entry carrying a case's `total_hours` from before the ledger existed"""
+    now = now or datetime.now(timezone.utc)
+    hours = round(float(case["total_hours"]), 2)
+    return {
+        "id": str(uuid.uuid4()),
+        "case_id": case["id"],
+        "client_id": case.get("client_id"),
+        "lawyer": OPENING_LAWYER,
+        "work_date": parse_day(case.get("start_date")) or parse_day(case.get("created_at")) or parse_day(now),
+        "hours": hours,
+        "hourly_rate": case.get("hourly_rate"),
+        "amount": entry_amount(hours, case.get("hourly_rate")),
+        "billable": True,
+        "description": OPENING_DESCRIPTION,
+        "created_at": now,
+    }
+
+
+def _add(field: str, amount: float) -> dict:
+    # $ifNull: los casos antiguos guardan total_hours a null, donde $inc fallaría
+    return {"$round": [{"$add": [{"$ifNull": [f"${field}", 0]}, amount]}, 2]}
+
+
+async def update_case_totals(db, case_id: str, hours: float, amount: float, now: Optional[datetime] = None):
+    """Move a case's counters by `hours` / `amount` (negative to revert); returns the updated case"""
+    return await db.cases.find_one_and_update(
+        {"id": case_id},
+        [{"$set": {
+            "total_hours": _add("total_hours", hours),
+            "billed_amount": _add("billed_amount", amount),
+            "updated_at": now or datetime.now(timezone.utc),
+            # Sube version como cualquier edición: la ETag del caso es su version
+            "version": {"$add": [{"$ifNull": ["$version", 0]}, 1]},
+        }}],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def update_lawyer_totals(db, entries: Iterable[Dict[str, Any]], sign: int = 1):
+    """`$inc` the per-lawyer counters by the given entries (sign=-1 after deleting them)"""
+    totals: Dict[str, List[float]] = {}
+    for entry in entries:
+        total = totals.setdefault(entry.get("lawyer") or OPENING_LAWYER, [0.0, 0.0, 0])
+        total[0] += entry.get("hours") or 0
+        total[1] += entry.get("amount") or 0
+        total[2] += 1
+    if not totals:
+        return
+    now = datetime.now(timezone.utc)
+    ops = [
+        UpdateOne({"_id": lawyer}, {
+            "$inc": {"hours": sign * round(hours, 2), "billed_amount": sign * round(amount, 2), "entries": sign * count},
+            "$set": {"updated_at": now},
+        }, upsert=True)
+        for lawyer, (hours, amount, count) in totals.items()
+    ]
+    if sign < 0:
+        # Un abogado sin entradas desaparece del resumen
+        ops += [DeleteOne({"_id": lawyer, "entries": {"$lte": 0}}) for lawyer in totals]
+    await db[LAWYER_TOTALS].bulk_write(ops, ordered=True)
+
+
+async def open_cases(db, cases: Iterable[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Opening entries for newly inserted cases that arrive with `total_hours`.
+
+    The cases must already carry the matching `billed_amount`; only the
+    ledger rows and the lawyer counters are written. Returns the entries added.
+    """
+    now = datetime.now(timezone.utc)
+    entries = [opening_entry(case, now) for case in cases if case.get("total_hours")]
+    for start in range(0, len(entries), batch_size):
+        await db[TIME_ENTRIES].insert_many([dict(entry) for entry in entries[start:start + batch_size]],
+                                           ordered=False)
+    await update_lawyer_totals(db, entries)
+    return len(entries)
+
+
+async def record_entry(db, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Append an entry and add it to its case and lawyer; returns the updated case"""
+    await db[TIME_ENTRIES].insert_one(dict(entry))
+    case = await update_case_totals(db, entry["case_id"], entry["hours"], entry["amount"])
+    await update_lawyer_totals(db, [entry])
+    return case
+
+
+async def remove_entry(db, entry_id: str) -> Optional[Dict[str, Any]]:
+    """Delete an entry and take it off its counters; returns the deleted entry or None"""
+    entry = await db[TIME_ENTRIES].find_one_and_delete({"id": entry_id}, projection={"_id": 0})
+    if entry:
+        await update_case_totals(db, entry["case_id"], -entry["hours"], -entry["amount"])
+        await update_lawyer_totals(db, [entry], sign=-1)
+    return entry
+
+
+async def delete_time_entries(db, filter_query: dict, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Delete matching entries in batches, taking them off the lawyer totals.
+
+    For cascades and sweeps: the entries' cases are being deleted as well,
+    so their counters are left alone.
+    """
+    deleted = 0
+    fields = {"_id": 0, "id": 1, "lawyer": 1, "hours": 1, "amount": 1}
+    while True:
+        batch = await db[TIME_ENTRIES].find(filter_query, fields).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return deleted
+        result = await db[TIME_ENTRIES].delete_many({"id": {"$in": [entry["id"] for entry in batch]}})
+        await update_lawyer_totals(db, batch, sign=-1)
+        deleted += result.deleted_count
+
+
+async def _cases_without_entries(db, batch_size: int) -> List[Dict[str, Any]]:
+    return await db.cases.aggregate([
+        {"$match": {"total_hours": {"$gt": 0}}},
+        {"$lookup": {"from": TIME_ENTRIES, "localField": "id", "foreignField": "case_id", "as": "_entries",
+                     "pipeline": [{"$limit": 1}, {"$project": {"_id": 1}}]}},
+        {"$match": {"_entries": {"$size": 0}}},
+        {"$project": {"_id": 0, "id": 1, "client_id": 1, "total_hours": 1, "hourly_rate": 1,
+                      "start_date": 1, "created_at": 1}},
+    ], batchSize=batch_size).to_list(None)
+
+
+async def import_opening_entries(db, dry_run: bool = False, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Give every case with hours but no entries an opening entry for those hours"""
+    cases = await _cases_without_entries(db, batch_size)
+    if dry_run or not cases:
+        return len(cases)
+    now = datetime.now(timezone.utc)
+    entries = [opening_entry(case, now) for case in cases]
+    for start in range(0, len(entries), batch_size):
+        await db[TIME_ENTRIES].insert_many(entries[start:start + batch_size], ordered=False)
+    # Los contadores de los casos ya incluyen estas horas; los de abogados los ajusta reconcile
+    return len(entries)
+
+
+async def ledger_totals(db) -> Tuple[Dict[str, List[float]], Dict[str, List[float]]]:
+    """One pass over the ledger: `({case_id: [hours, amount]}, {lawyer: [hours, amount, entries]})`"""
+    by_case: Dict[str, List[float]] = {}
+    by_lawyer: Dict[str, List[float]] = {}
+    async for row in db[TIME_ENTRIES].aggregate([
+        {"$group": {
+            "_id": {"case_id": "$case_id", "lawyer": {"$ifNull": ["$lawyer", OPENING_LAWYER]}},
+            "hours": {"$sum": "$hours"},
+            "amount": {"$sum": "$amount"},
+            "entries": {"$sum": 1},
+        }},
+    ], allowDiskUse=True):
+        case = by_case.setdefault(row["_id"]["case_id"], [0.0, 0.0])
+        case[0] += row["hours"]
+        case[1] += row["amount"]
+        lawyer = by_lawyer.setdefault(row["_id"]["lawyer"], [0.0, 0.0, 0])
+        lawyer[0] += row["hours"]
+        lawyer[1] += row["amount"]
+        lawyer[2] += row["entries"]
+    return by_case, by_lawyer
+
+
+def _drifted(current: Iterable[Any], expected: Iterable[float]) -> bool:
+    return any(abs((value or 0) - target) > TOLERANCE for value, target in zip(current, expected))
+
+
+async def reconcile(db, dry_run: bool = False, batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+    """Recompute case and lawyer counters from the ledger and fix the ones that drifted.
+
+    Each fix is conditional on the counters that were read, so a case or
+    lawyer that received an entry meanwhile is skipped rather than
+    overwritten; re-run to pick it up.
+    """
+    opening = await import_opening_entries(db, dry_run, batch_size)
+    by_case, by_lawyer = await ledger_totals(db)
+    now = datetime.now(timezone.utc)
+
+    cases_checked = cases_fixed = 0
+    ops = []
+
+    async def flush():
+        nonlocal ops, cases_fixed
+        if ops and not dry_run:
+            result = await db.cases.bulk_write(ops, ordered=False)
+            cases_fixed += result.modified_count
+        elif dry_run:
+            cases_fixed += len(ops)
+        ops = []
+
+    fields = {"_id": 0, "id": 1, "total_hours": 1, "billed_amount": 1}
+    async for case in db.cases.find({}, fields).batch_size(batch_size):
+        cases_checked += 1
+        hours, amount = by_case.get(case["id"], (0.0, 0.0))
+        if not _drifted((case.get("total_hours"), case.get("billed_amount")), (hours, amount)):
+            continue
+        if dry_run and case["id"] not in by_case and (case.get("total_hours") or 0) > 0:
+            # En seco no se crean las entradas de apertura: esos casos aún no tienen libro
+            continue
+        ops.append(UpdateOne(
+            {"id": case["id"], "total_hours": case.get("total_hours"), "billed_amount": case.get("billed_amount")},
+            {"$set": {"total_hours": round(hours, 2), "billed_amount": round(amount, 2), "updated_at": now},
+             "$inc": {"version": 1}},
+        ))
+        if len(ops) >= batch_size:
+            await flush()
+    await flush()
+
+    lawyers_fixed = 0
+    lawyer_ops = []
+    stored = {doc["_id"]: doc async for doc in db[LAWYER_TOTALS].find({})}
+    for lawyer, (hours, amount, entries) in by_lawyer.items():
+        doc = stored.pop(lawyer, None)
+        expected = {"hours": round(hours, 2), "billed_amount": round(amount, 2), "entries": entries}
+        if doc is None:
+            lawyer_ops.append(UpdateOne({"_id": lawyer}, {"$set": {**expected, "updated_at": now}}, upsert=True))
+        elif _drifted((doc.get("hours"), doc.get("billed_amount"), doc.get("entries")), expected.values()):
+            current = {field: doc.get(field) for field in expected}
+            lawyer_ops.append(UpdateOne({"_id": lawyer, **current}, {"$set": {**expected, "updated_at": now}}))
+    for lawyer, doc in stored.items():
+        lawyer_ops.append(DeleteOne({"_id": lawyer, "entries": doc.get("entries")}))
+    if lawyer_ops and not dry_run:
+        result = await db[LAWYER_TOTALS].bulk_write(lawyer_ops, ordered=False)
+        lawyers_fixed = result.modified_count + result.upserted_count + result.deleted_count
+    elif dry_run:
+        lawyers_fixed = len(lawyer_ops)
+
+    return {
+        "dry_run": dry_run,
+        "opening_entries": opening,
+        "cases_checked": cases_checked,
+        "cases_fixed": cases_fixed,
+        "lawyers_fixed": lawyers_fixed,
+    }
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from collection_versions import bump_versions
+
+    mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/")
+    db_name = os.getenv("DB_NAME", "legaldesk")
+    dry_run = os.getenv("DRY_RUN", "") not in ("", "0", "false")
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True)
+    db = client[db_name]
+    result = await reconcile(db, dry_run=dry_run)
+    if not dry_run:
+        await bump_versions(db, "cases", TIME_ENTRIES)
+    verb = "would fix" if dry_run else "fixed"
+    print(f"Time ledger on '{db_name}': {result['opening_entries']} opening entries, "
+          f"{verb} {result['cases_fixed']} of {result['cases_checked']} cases and "
+          f"{result['lawyers_fixed']} lawyer totals")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,6 +16,18 @@ const BACKEND_URL = (() => {
 })();
 const API = `${BACKEND_URL}/api`;
 
+// Recorre todas las páginas de un listado paginado por cursor
+const fetchAllPages = async (url) => {
+  const items = [];
+  let cursor = null;
+  do {
+    const { data } = await axios.get(url, { params: { limit: 1000, ...(cursor ? { cursor } : {}) } });
+    items.push(...data.items);
+    cursor = data.next_cursor;
+  } while (cursor);
+  return items;
+};
+
 // Utility helpers (available to all components)
 const formatDate = (dateString) => {
   return new Date(dateString).toLocaleDateString('es-ES', {
@@ -960,13 +972,16 @@ const CaseManagement = ({ cases, clients, onRefresh }) => {
                 </div>
                 
                 <div>
-                  <label className="block text-sm font-medium text-gray-300 mb-1">Horas Totales</label>
+                  <label className="block text-sm font-medium text-gray-300 mb-1">
+                    {editingCase ? 'Horas Totales (libro de horas)' : 'Horas Iniciales'}
+                  </label>
                   <input
                     type="number"
                     step="0.5"
                     value={formData.total_hours}
                     onChange={(e) => setFormData({...formData, total_hours: e.target.value})}
-                    className="w-full px-4 py-2 border border-gray-700 rounded-lg bg-[#191919] text-white placeholder-gray-400 focus:ring-2 focus:ring-blue-500 focus:border-blue-500"
+                    disabled={!!editingCase}
+                    className="w-full px-4 py-2 border border-gray-700 rounded-lg bg-[#191919] text-white placeholder-gray-400 focus:ring-2 focus:ring-blue-500 focus:border-blue-500 disabled:opacity-60"
                   />
                 </div>
               </div>
@@ -1404,7 +1419,7 @@ const DocumentManagement = ({ clients, documents, onRefresh }) => {
                     </td>
                     <td className="px-6 py-4 whitespace-nowrap text-sm font-medium">
                       <a
-                        href={`${BACKEND_URL}/uploads/${document.filename}`}
+                        href={`${API}/documents/${document.id}/download`}
                         target="_blank"
                         rel="noopener noreferrer"
                         className="text-blue-600 hover:text-blue-900 mr-3"
@@ -1460,13 +1475,25 @@ const AppointmentManagement = ({ appointments, clients, onRefresh }) => {
     setShowForm(false);
   };
 
+  const saveAppointment = (allowOverlap) => {
+    const config = allowOverlap ? { params: { allow_overlap: true } } : undefined;
+    return editingAppointment
+      ? axios.put(`${API}/appointments/${editingAppointment.id}`, formData, config)
+      : axios.post(`${API}/appointments`, formData, config);
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      if (editingAppointment) {
-        await axios.put(`${API}/appointments/${editingAppointment.id}`, formData);
-      } else {
-        await axios.post(`${API}/appointments`, formData);
+      try {
+        await saveAppointment(false);
+      } catch (error) {
+        // 409: el horario se solapa con otra cita pendiente
+        const conflict = error.response?.status === 409 && error.response.data?.detail?.conflict;
+        if (!conflict || !window.confirm(`La cita se solapa con "${conflict.title}". ¿Guardar de todos modos?`)) {
+          throw error;
+        }
+        await saveAppointment(true);
       }
       resetForm();
       onRefresh();
@@ -1895,7 +1922,10 @@ const ClientLogin = ({ onLogin }) => {
 };
 
 // Client Dashboard Component
-const ClientDashboard = ({ clientData, onLogout }) => {
+// Cabecera con el token de sesión del portal devuelto por /client/login
+const portalAuth = (session) => ({ headers: { Authorization: `Bearer ${session?.token || ''}` } });
+
+const ClientDashboard = ({ clientData, session, onLogout }) => {
   const [selectedCase, setSelectedCase] = useState(null);
   const [caseTimeline, setCaseTimeline] = useState(null);
   const [loadingTimeline, setLoadingTimeline] = useState(false);
@@ -1903,7 +1933,7 @@ const ClientDashboard = ({ clientData, onLogout }) => {
   const loadCaseTimeline = async (caseId) => {
     setLoadingTimeline(true);
     try {
-      const response = await axios.get(`${API}/client/${clientData.client_info.id}/case-timeline/${caseId}`);
+      const response = await axios.get(`${API}/client/${clientData.client_info.id}/case-timeline/${caseId}`, portalAuth(session));
       setCaseTimeline(response.data);
       setSelectedCase(caseId);
     } catch (error) {
@@ -1913,6 +1943,24 @@ const ClientDashboard = ({ clientData, onLogout }) => {
     }
   };
 
+  // Descarga con la cabecera de sesión: un enlace normal no puede enviarla
+  const downloadDocument = async (doc) => {
+    try {
+      const response = await axios.get(
+        `${API}/client/${clientData.client_info.id}/documents/${doc.id}/download`,
+        { ...portalAuth(session), params: { attachment: true }, responseType: 'blob' }
+      );
+      const url = URL.createObjectURL(response.data);
+      const link = window.document.createElement('a');
+      link.href = url;
+      link.download = doc.original_filename;
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      console.error('Error downloading document:', error);
+    }
+  };
+
   if (selectedCase && caseTimeline) {
     return (
       <div className="min-h-screen p-6" style={{backgroundColor: '#000000'}}>
@@ -1975,6 +2023,19 @@ const ClientDashboard = ({ clientData, onLogout }) => {
               <h3 className="font-semibold text-gray-300 mb-3">Documentos</h3>
               <p className="text-2xl font-bold text-blue-600 mb-2">{caseTimeline.documents.length}</p>
               <p className="text-gray-400 text-sm">documentos disponibles</p>
+              {caseTimeline.documents.length > 0 && (
+                <div className="space-y-1 mt-3">
+                  {caseTimeline.documents.slice(0, 5).map(doc => (
+                    <button
+                      key={doc.id}
+                      onClick={() => downloadDocument(doc)}
+                      className="block text-sm text-blue-500 hover:text-blue-400 truncate"
+                    >
+                      {doc.original_filename}
+                    </button>
+                  ))}
+                </div>
+              )}
             </div>
           </div>
 
@@ -2404,19 +2465,19 @@ function App() {
       setLoading(true);
       const [statsRes, clientsRes, casesRes, documentsRes, appointmentsRes, updatesRes] = await Promise.all([
         axios.get(`${API}/dashboard/stats`),
-        axios.get(`${API}/clients`),
-        axios.get(`${API}/cases`),
-        axios.get(`${API}/documents`),
-        axios.get(`${API}/appointments`),
-        axios.get(`${API}/case-updates`)
+        fetchAllPages(`${API}/clients`),
+        fetchAllPages(`${API}/cases`),
+        fetchAllPages(`${API}/documents`),
+        fetchAllPages(`${API}/appointments`),
+        fetchAllPages(`${API}/case-updates`)
       ]);
       
       setStats(statsRes.data);
-      setClients(clientsRes.data);
-      setCases(casesRes.data);
-      setDocuments(documentsRes.data);
-      setAppointments(appointmentsRes.data);
-      setCaseUpdates(updatesRes.data);
+      setClients(clientsRes);
+      setCases(casesRes);
+      setDocuments(documentsRes);
+      setAppointments(appointmentsRes);
+      setCaseUpdates(updatesRes);
     } catch (error) {
       console.error('Error fetching data:', error);
     } finally {
@@ -2432,7 +2493,7 @@ function App() {
       localStorage.setItem('clientSession', JSON.stringify(loginData));
       
       // Fetch client dashboard data
-      const response = await axios.get(`${API}/client/dashboard/${loginData.client_id}`);
+      const response = await axios.get(`${API}/client/dashboard/${loginData.client_id}`, portalAuth(loginData));
       setClientDashboardData(response.data);
       setIsClientPortal(true);
 
@@ -2446,6 +2507,10 @@ function App() {
   };
 
   const handleClientLogout = () => {
+    // Revocar el token en el servidor; la sesión local se borra igualmente
+    if (clientSession?.token) {
+      axios.post(`${API}/client/logout`, null, portalAuth(clientSession)).catch(() => {});
+    }
     // Limpiar sesión persistida
     localStorage.removeItem('clientSession');
     setClientSession(null);
@@ -2467,11 +2532,21 @@ function App() {
         if (stored) {
           try {
             const sess = JSON.parse(stored);
-            setClientSession(sess);
-            const response = await axios.get(`${API}/client/dashboard/${sess.client_id}`);
-            setClientDashboardData(response.data);
+            // Sesiones guardadas antes de los tokens: volver a iniciar sesión
+            if (sess.token) {
+              setClientSession(sess);
+              const response = await axios.get(`${API}/client/dashboard/${sess.client_id}`, portalAuth(sess));
+              setClientDashboardData(response.data);
+            } else {
+              localStorage.removeItem('clientSession');
+            }
           } catch (error) {
             console.error('Error loading client dashboard:', error);
+            // Token caducado o revocado: pedir credenciales de nuevo
+            if ([401, 403].includes(error.response?.status)) {
+              localStorage.removeItem('clientSession');
+              setClientSession(null);
+            }
           } finally {
             setLoading(false);
           }
@@ -2485,6 +2560,57 @@ function App() {
     init();
   }, []);
 
+  // Actualizaciones en vivo del portal (SSE): recargar el panel cuando el despacho publica algo
+  useEffect(() => {
+    if (!isClientPortal || !clientSession?.client_id || !clientSession?.token) return undefined;
+    const clientId = clientSession.client_id;
+    let source = null;
+    let closed = false;
+    let connected = false;
+    let timer = null;
+    let retry = null;
+    const refresh = () => {
+      clearTimeout(timer);
+      timer = setTimeout(async () => {
+        try {
+          const response = await axios.get(`${API}/client/dashboard/${clientId}`, portalAuth(clientSession));
+          setClientDashboardData(response.data);
+        } catch (error) {
+          console.error('Error refreshing client dashboard:', error);
+        }
+      }, 300);
+    };
+    // EventSource no admite cabeceras: se abre con un token de flujo de vida corta, nunca con el de sesión.
+    // Cuando caduca, el reintento automático del navegador recibe 401 y se pide otro
+    const connect = async () => {
+      try {
+        const response = await axios.post(`${API}/client/${clientId}/events/token`, null, portalAuth(clientSession));
+        if (closed) return;
+        source = new EventSource(`${API}/client/${clientId}/events?stream_token=${encodeURIComponent(response.data.stream_token)}`);
+      } catch (error) {
+        console.error('Error opening live updates:', error);
+        if (![401, 403].includes(error.response?.status)) retry = setTimeout(connect, 5000);
+        return;
+      }
+      // Tras una reconexión pueden haberse perdido eventos
+      source.addEventListener('ready', () => {
+        if (connected) refresh();
+        connected = true;
+      });
+      ['case_update', 'appointment', 'resync'].forEach((name) => source.addEventListener(name, refresh));
+      source.onerror = () => {
+        if (source.readyState === EventSource.CLOSED && !closed) retry = setTimeout(connect, 1000);
+      };
+    };
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(timer);
+      clearTimeout(retry);
+      if (source) source.close();
+    };
+  }, [isClientPortal, clientSession]);
+
   if (loading) {
     return (
       <div className="min-h-screen bg-gray-100 flex items-center justify-center">
@@ -2532,7 +2658,7 @@ function App() {
       );
     }
     
-    return <ClientDashboard clientData={clientDashboardData} onLogout={handleClientLogout} />;
+    return <ClientDashboard clientData={clientDashboardData} session={clientSession} onLogout={handleClientLogout} />;
   }
 
   // Lawyer Admin Interface